@@ -28,6 +28,14 @@ def create_app(config_name='default'):
     login_manager.init_app(app)
     bcrypt.init_app(app)
 
+    # bcrypt runs in a process pool, see app.passwords
+    from app.passwords import password_hasher
+    password_hasher.init_app(app)
+
+    # Query counts and timings per request, when SQL_PROFILER is set
+    from app.profiler import sql_profiler
+    sql_profiler.init_app(app)
+
     # Initialize Auth0 if enabled
     if USE_AUTH0:
         from app.auth0 import auth0, setup_auth0
@@ -0,0 +1,44 @@
+"""
+Server-side cache of serialized API responses.
+
+The public roadmap endpoints only change when the catalog does (imports and
+version restores bump its version), so the JSON body is built once per
+catalog version and served from memory. Each body gets a strong ETag from
+its content hash so clients and CDNs can revalidate with If-None-Match.
+"""
+
+import hashlib
+import threading
+from flask import current_app, request
+from app.catalog import catalog
+
+_lock = threading.Lock()
+_cache = {}
+
+def cached_json_response(key, build):
+    """
+    Return a conditional JSON response for a cacheable payload
+
+    Args:
+        key (str): Cache key identifying the payload
+        build (callable): Returns the data to serialize on a cache miss
+
+    Returns:
+        Response: 200 with the cached body, or 304 if the client's ETag matches
+    """
+    version = catalog.version()
+
+    entry = _cache.get(key)
+    if entry is None or entry[0] != version:
+        body = current_app.json.dumps(build()).encode('utf-8')
+        etag = hashlib.sha256(body).hexdigest()
+        entry = (version, body, etag)
+        with _lock:
+            _cache[key] = entry
+
+    _, body, etag = entry
+    response = current_app.response_class(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = current_app.config.get('API_CACHE_MAX_AGE', 0)
+    return response.make_conditional(request)
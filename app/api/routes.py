@@ -1,12 +1,18 @@
 from flask import jsonify, request, Blueprint
 from app.models import Roadmap, RoadmapNode, UserProgress
+from app.roadmap.progress import get_user_roadmap_stats
 from app.api import api
+from app.catalog import catalog
+from app.api.cache import cached_json_response
+from app.roadmap.links import NODE_LINKS, links_of_type, nodes_linking_to
 from flask_login import current_user, login_required
-import json
 
 @api.route('/roadmaps')
 def get_roadmaps():
-    roadmaps = Roadmap.query.all()
+    return cached_json_response('roadmaps', build_roadmaps_payload)
+
+def build_roadmaps_payload():
+    roadmaps = catalog.all()
     result = []
     
     for roadmap in roadmaps:
@@ -20,12 +26,17 @@ def get_roadmaps():
             'tags': tags
         })
     
-    return jsonify({'roadmaps': result})
+    return {'roadmaps': result}
 
 @api.route('/roadmaps/<string:roadmap_id>')
 def get_roadmap(roadmap_id):
-    roadmap = Roadmap.query.get_or_404(roadmap_id)
-    nodes = RoadmapNode.query.filter_by(roadmap_id=roadmap_id).all()
+    roadmap = catalog.get_or_404(roadmap_id)
+    return cached_json_response(f'roadmap:{roadmap_id}', lambda: build_roadmap_payload(roadmap))
+
+def build_roadmap_payload(roadmap):
+    nodes = RoadmapNode.query.filter_by(roadmap_id=roadmap.id).options(NODE_LINKS).order_by(
+        RoadmapNode.position, RoadmapNode.id
+    ).all()
     
     # Format the roadmap data
     tags = roadmap.tags.split(',') if roadmap.tags else []
@@ -41,14 +52,31 @@ def get_roadmap(roadmap_id):
     
     # Add nodes data
     for node in nodes:
-        links = json.loads(node.links) if node.links else []
         roadmap_data['nodes'][node.id] = {
             'title': node.title,
             'description': node.description,
-            'links': links
+            'links': node.get_links()
         }
     
-    return jsonify(roadmap_data)
+    return roadmap_data
+
+@api.route('/roadmaps/<string:roadmap_id>/resources')
+def get_roadmap_resources(roadmap_id):
+    roadmap = catalog.get_or_404(roadmap_id)
+    link_type = request.args.get('type', 'video')
+    return jsonify({'roadmap_id': roadmap.id, 'type': link_type,
+                    'resources': links_of_type(roadmap.id, link_type)})
+
+@api.route('/resources/nodes')
+def get_nodes_linking_to():
+    domain = request.args.get('domain', '').strip()
+    if not domain:
+        return jsonify({'success': False, 'message': 'domain is required'}), 400
+    nodes = nodes_linking_to(domain, request.args.get('roadmap_id'))
+    return jsonify({
+        'domain': domain,
+        'nodes': [{'id': node.id, 'roadmap_id': node.roadmap_id, 'title': node.title} for node in nodes]
+    })
 
 @api.route('/user/progress')
 @login_required
@@ -65,7 +93,15 @@ def get_user_progress():
             'date_completed': entry.date_completed.isoformat() if entry.date_completed else None
         }
     
-    return jsonify({'progress': result})
+    stats = {}
+    for roadmap_id, entry in get_user_roadmap_stats(current_user.id).items():
+        stats[roadmap_id] = {
+            'completed': entry.completed_count,
+            'total': entry.total_nodes,
+            'percentage': entry.percentage
+        }
+    
+    return jsonify({'progress': result, 'stats': stats})
 
 @api.route('/user/progress/<string:roadmap_id>')
 @login_required
@@ -82,4 +118,11 @@ def get_roadmap_progress(roadmap_id):
             'date_completed': entry.date_completed.isoformat() if entry.date_completed else None
         }
     
-    return jsonify({'roadmap_id': roadmap_id, 'progress': result})
+    entry = get_user_roadmap_stats(current_user.id).get(roadmap_id)
+    stats = {
+        'completed': entry.completed_count if entry else 0,
+        'total': entry.total_nodes if entry else 0,
+        'percentage': entry.percentage if entry else 0
+    }
+    
+    return jsonify({'roadmap_id': roadmap_id, 'progress': result, 'stats': stats})
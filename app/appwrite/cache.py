@@ -0,0 +1,182 @@
+"""
+Read-through cache for Appwrite documents.
+
+AppwriteModel.get and list look here before calling Appwrite. Raw document
+dicts are cached rather than model instances, so every caller gets its own
+object and the values can be stored in Redis. Misses are cached too, for a
+shorter time, so repeated lookups of a missing ID stay local.
+
+List results are keyed by a per-collection generation. create, update and
+delete bump the generation, so cached lists of that collection are never
+read again and expire on their own, while single documents are replaced or
+removed directly.
+
+Backends:
+    NullCache    caching disabled
+    MemoryCache  per-process LRU dict, the default
+    RedisCache   any client with the redis-py get/set/delete/incr API,
+                 shared by all workers
+"""
+
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+# Stored for documents that do not exist
+MISSING = {'$missing': True}
+
+class NullCache:
+    """Cache backend that stores nothing"""
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value, ttl):
+        pass
+
+    def delete(self, key):
+        pass
+
+    def generation(self, name):
+        return 0
+
+    def bump(self, name):
+        pass
+
+    def clear(self):
+        pass
+
+class MemoryCache:
+    """
+    In-process LRU cache with per-entry expiry
+
+    Args:
+        max_entries (int): Entries kept before the least recently used are
+            evicted
+    """
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._generations = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def generation(self, name):
+        with self._lock:
+            return self._generations.get(name, 0)
+
+    def bump(self, name):
+        with self._lock:
+            self._generations[name] = self._generations.get(name, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._generations.clear()
+
+class RedisCache:
+    """
+    Cache backend on a Redis-compatible server
+
+    Eviction is left to the server's maxmemory policy.
+
+    Args:
+        client: A redis.Redis instance or anything with the same get, set,
+            delete and incr methods
+        prefix (str): Prefix of every key written
+    """
+
+    def __init__(self, client, prefix='edgeroute:appwrite:'):
+        self.client = client
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url, **kwargs):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError('APPWRITE_CACHE points at Redis but the redis package is not installed')
+        return cls(redis.Redis.from_url(url), **kwargs)
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        return json.loads(value) if value is not None else None
+
+    def set(self, key, value, ttl):
+        self.client.set(self.prefix + key, json.dumps(value), ex=max(1, int(ttl)))
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+    def generation(self, name):
+        value = self.client.get(self.prefix + 'generation:' + name)
+        return int(value) if value is not None else 0
+
+    def bump(self, name):
+        self.client.incr(self.prefix + 'generation:' + name)
+
+    def clear(self):
+        keys = list(self.client.scan_iter(match=self.prefix + '*'))
+        if keys:
+            self.client.delete(*keys)
+
+def create_cache(setting, max_entries=10000):
+    """
+    Build the backend named by APPWRITE_CACHE
+
+    Args:
+        setting (str): 'memory', 'none' or a redis:// / rediss:// / unix:// URL
+        max_entries (int): Size of the memory cache
+
+    Returns:
+        A cache backend
+    """
+    setting = (setting or 'memory').strip()
+    if setting.lower() in ('none', 'off', 'false', '0'):
+        return NullCache()
+    if setting.lower() == 'memory':
+        return MemoryCache(max_entries)
+    if setting.startswith(('redis://', 'rediss://', 'unix://')):
+        return RedisCache.from_url(setting)
+    raise ValueError(f"Unknown APPWRITE_CACHE backend: {setting}")
+
+def parse_ttls(setting):
+    """Parse 'users=60,roadmaps=3600' into a dict of collection ID -> seconds"""
+    ttls = {}
+    for item in (setting or '').split(','):
+        if '=' in item:
+            collection_id, seconds = item.split('=', 1)
+            ttls[collection_id.strip()] = float(seconds)
+    return ttls
+
+def document_key(database_id, collection_id, document_id):
+    return f'{database_id}:{collection_id}:doc:{document_id}'
+
+def list_key(database_id, collection_id, generation, queries):
+    digest = hashlib.sha1(json.dumps(queries or [], sort_keys=True, default=str).encode()).hexdigest()
+    return f'{database_id}:{collection_id}:list:{generation}:{digest}'
@@ -1,5 +1,4 @@
 import os
-from appwrite.client import Client
 from appwrite.services.databases import Databases
 from appwrite.services.users import Users
 from appwrite.services.account import Account
@@ -7,12 +6,15 @@ from appwrite.services.storage import Storage
 from appwrite.services.teams import Teams
 from appwrite.services.functions import Functions
 from appwrite.id import ID
+from .cache import NullCache, create_cache, parse_ttls
+from .transport import PooledClient, add_server_timing
 
 class AppwriteConfig:
     """Configuration for Appwrite services"""
     
     def __init__(self, app=None):
         self.client = None
+        self.metrics = None
         self.databases = None
         self.users = None
         self.account = None
@@ -20,6 +22,11 @@ class AppwriteConfig:
         self.teams = None
         self.functions = None
         
+        # Document cache, see app.appwrite.cache
+        self.cache = NullCache()
+        self.cache_ttls = {}
+        self.cache_negative_ttl = 30
+        
         # Appwrite configuration
         self.endpoint = os.environ.get('APPWRITE_ENDPOINT', 'https://cloud.appwrite.io/v1')
         self.project_id = os.environ.get('APPWRITE_PROJECT_ID')
@@ -51,8 +58,15 @@ class AppwriteConfig:
         self.api_key = app.config.get('APPWRITE_API_KEY', self.api_key)
         self.database_id = app.config.get('APPWRITE_DATABASE_ID', self.database_id)
         
-        # Initialize Appwrite client
-        self.client = Client()
+        # Initialize Appwrite client, with pooled keep-alive connections
+        self.client = PooledClient(
+            pool_size=app.config.get('APPWRITE_POOL_SIZE', 10),
+            connect_timeout=app.config.get('APPWRITE_CONNECT_TIMEOUT', 3.05),
+            read_timeout=app.config.get('APPWRITE_READ_TIMEOUT', 30),
+            keep_alive=app.config.get('APPWRITE_KEEP_ALIVE', True),
+            gzip_requests=app.config.get('APPWRITE_GZIP_REQUESTS', False)
+        )
+        self.metrics = self.client.metrics
         self.client.set_endpoint(self.endpoint)
         self.client.set_project(self.project_id)
         self.client.set_key(self.api_key)
@@ -65,6 +79,14 @@ class AppwriteConfig:
         self.teams = Teams(self.client)
         self.functions = Functions(self.client)
         
+        # Initialize the document cache
+        self.cache = create_cache(app.config.get('APPWRITE_CACHE'), app.config.get('APPWRITE_CACHE_SIZE', 10000))
+        self.cache_ttls = parse_ttls(app.config.get('APPWRITE_CACHE_TTLS'))
+        self.cache_negative_ttl = app.config.get('APPWRITE_CACHE_NEGATIVE_TTL', self.cache_negative_ttl)
+        
+        # Report each request's Appwrite calls in its Server-Timing header
+        app.after_request(add_server_timing)
+        
         # Add to app context
         app.appwrite = self
         
@@ -0,0 +1,254 @@
+"""
+Concurrent, resumable import of the roadmap JSON files into Appwrite.
+
+The IDs already stored in the roadmaps and roadmap_nodes collections are
+listed up front, so only missing documents are created. Creates run on a
+bounded thread pool while later files are still being parsed; each one is
+retried with exponential backoff on 429, 5xx and connection errors, and a
+409 (created by an earlier, interrupted run) counts as done.
+
+With a checkpoint file, every roadmap whose documents are all stored is
+recorded there, and a rerun after an interruption skips those roadmaps
+entirely. The file is removed once an import finishes without errors.
+"""
+
+import os
+import json
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from appwrite.query import Query
+from appwrite.exception import AppwriteException
+from .models import Roadmap, RoadmapNode
+
+ROADMAP_FIELDS = ('id', 'title', 'description', 'category', 'difficulty', 'tags')
+NODE_FIELDS = ('id', 'roadmap_id', 'title', 'description', 'links')
+
+# Status codes worth retrying; 0 is a connection error raised by the SDK
+RETRY_CODES = {0, 429, 500, 502, 503, 504}
+
+# Page size used to list the existing IDs
+ID_PAGE_SIZE = 1000
+
+class AppwriteImportReport:
+    """Counts and timings of one Appwrite import run"""
+
+    def __init__(self):
+        self.created = 0
+        self.existing = 0
+        self.resumed_roadmaps = 0
+        self.conflicts = 0
+        self.retries = 0
+        self.failed = {}
+        self.started = time.perf_counter()
+        self.seconds = 0.0
+        self._lock = threading.Lock()
+
+    def count(self, name, amount=1):
+        """Add to a counter from any thread"""
+        with self._lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    @property
+    def throughput(self):
+        return self.created / self.seconds if self.seconds else 0.0
+
+    def summary(self):
+        """Return a one-line description of the run"""
+        text = (
+            f"{self.created} documents created, {self.existing} already stored, "
+            f"{self.resumed_roadmaps} roadmaps skipped from the checkpoint; "
+            f"{self.retries} retries, {len(self.failed)} failed; "
+            f"{self.seconds:.1f}s, {self.throughput:.1f} documents/s"
+        )
+        if self.conflicts:
+            text += f", {self.conflicts} duplicate IDs skipped"
+        return text
+
+class Checkpoint:
+    """
+    Roadmap IDs whose documents are all stored, kept in a JSON file
+
+    Args:
+        path (str, optional): File to read and write; None keeps it in memory
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.completed = set()
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                self.completed = set(json.load(f).get('completed', []))
+
+    def __contains__(self, roadmap_id):
+        return roadmap_id in self.completed
+
+    def mark(self, roadmap_id):
+        with self._lock:
+            self.completed.add(roadmap_id)
+            if self.path:
+                # Written to a temporary file first so an interruption never
+                # leaves a truncated checkpoint
+                temporary = self.path + '.tmp'
+                with open(temporary, 'w', encoding='utf-8') as f:
+                    json.dump({'completed': sorted(self.completed)}, f)
+                os.replace(temporary, self.path)
+
+    def remove(self):
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+def existing_ids(model):
+    """Return the set of document IDs stored in a model's collection, bypassing the cache"""
+    return {document.id for document in
+            model.list(queries=[Query.select(['$id'])], page_size=ID_PAGE_SIZE, prefetch=True, cached=False)}
+
+def with_retry(func, report, retries=5, backoff=0.5):
+    """
+    Call func, retrying throttled and failed requests
+
+    Args:
+        func (callable): The request to make
+        report (AppwriteImportReport): Counts the retries
+        retries (int): Retries before the error is raised
+        backoff (float): Seconds before the first retry, doubled each time
+
+    Returns:
+        The result of func
+
+    Raises:
+        AppwriteException: When the request fails with any other status, or
+            still fails after the last retry
+    """
+    for attempt in range(retries + 1):
+        try:
+            return func()
+        except AppwriteException as e:
+            if e.code not in RETRY_CODES or attempt == retries:
+                raise
+            report.count('retries')
+            # Full jitter keeps throttled workers from retrying in lockstep
+            time.sleep(random.uniform(0, backoff * 2 ** attempt))
+
+def create_document(model, data, report, retries=5, backoff=0.5):
+    """
+    Create one document, treating an existing one as success
+
+    Returns:
+        bool: True if the document was created, False if it already existed
+    """
+    database = model.get_database()
+
+    def request():
+        return database.create_document(
+            database_id=model.get_database_id(),
+            collection_id=model.get_collection_id(),
+            document_id=data['id'],
+            data=data
+        )
+
+    try:
+        with_retry(request, report, retries, backoff)
+    except AppwriteException as e:
+        if e.code != 409:
+            raise
+        return False
+    finally:
+        model._invalidate(data['id'])
+    return True
+
+def import_roadmaps_to_appwrite(data_dir=None, workers=None, concurrency=8, checkpoint=None, retries=5, backoff=0.5):
+    """
+    Import roadmaps from JSON files to Appwrite
+
+    Args:
+        data_dir (str, optional): Directory holding the JSON files
+        workers (int, optional): Parser processes, see iter_roadmap_records
+        concurrency (int): Requests in flight at once
+        checkpoint (str, optional): Checkpoint file to resume from and update
+        retries (int): Retries per request on 429, 5xx and connection errors
+        backoff (float): Seconds before the first retry, doubled each time
+
+    Returns:
+        AppwriteImportReport: What was written; failed is empty on success
+    """
+    from app.roadmap.loader import iter_roadmap_records
+
+    report = AppwriteImportReport()
+    done = Checkpoint(checkpoint)
+    lock = threading.Lock()
+
+    print("Listing stored documents...")
+    stored_roadmaps = existing_ids(Roadmap)
+    stored_nodes = existing_ids(RoadmapNode)
+    print(f"{len(stored_roadmaps)} roadmaps and {len(stored_nodes)} nodes already stored")
+
+    # Documents not yet finished per roadmap, and roadmaps with a failure
+    pending = {}
+    broken = set()
+    seen_nodes = set()
+    # Bounds the number of queued creates, so parsing does not run far ahead
+    slots = threading.BoundedSemaphore(concurrency * 4)
+
+    def finish(roadmap_id, document_id, error=None):
+        with lock:
+            if error is not None:
+                report.failed[document_id] = str(error)
+                broken.add(roadmap_id)
+            pending[roadmap_id] -= 1
+            complete = pending[roadmap_id] == 0 and roadmap_id not in broken
+        if complete:
+            done.mark(roadmap_id)
+            print(f"Imported roadmap {roadmap_id}")
+
+    def create(model, data, roadmap_id):
+        try:
+            created = create_document(model, data, report, retries, backoff)
+            report.count('created' if created else 'existing')
+            finish(roadmap_id, data['id'])
+        except Exception as e:
+            print(f"Failed to create {model.get_collection_id()} document {data['id']}: {e}")
+            finish(roadmap_id, data['id'], e)
+        finally:
+            slots.release()
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='appwrite-import') as pool:
+        for parsed in iter_roadmap_records(data_dir, workers):
+            roadmap_id = parsed.id
+            if roadmap_id in done:
+                report.count('resumed_roadmaps')
+                continue
+            if parsed.nodes is None:
+                print(f"No nodes file found for roadmap {roadmap_id}")
+
+            documents = []
+            if roadmap_id in stored_roadmaps:
+                report.count('existing')
+            else:
+                documents.append((Roadmap, {field: parsed.row[field] for field in ROADMAP_FIELDS}))
+            for node in parsed.nodes or ():
+                if node['id'] in seen_nodes:
+                    report.count('conflicts')
+                    continue
+                seen_nodes.add(node['id'])
+                if node['id'] in stored_nodes:
+                    report.count('existing')
+                else:
+                    documents.append((RoadmapNode, {field: node[field] for field in NODE_FIELDS}))
+
+            with lock:
+                # One extra count, released below, so the roadmap cannot be
+                # marked complete while its documents are still queued
+                pending[roadmap_id] = len(documents) + 1
+            for model, data in documents:
+                slots.acquire()
+                pool.submit(create, model, data, roadmap_id)
+            finish(roadmap_id, roadmap_id)
+
+    report.seconds = time.perf_counter() - report.started
+    if not report.failed:
+        done.remove()
+    print(report.summary())
+    return report
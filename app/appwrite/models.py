@@ -1,16 +1,30 @@
 import json
 import datetime
+from concurrent.futures import ThreadPoolExecutor
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
 from appwrite.id import ID
 from appwrite.query import Query
 from appwrite.exception import AppwriteException
 from .config import get_appwrite
+from .cache import MISSING, document_key, list_key
+from .session import current_session
+
+# Threads fetching the next page for AppwriteModel.list(prefetch=True)
+_prefetch_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix='appwrite-prefetch')
 
 class AppwriteModel:
-    """Base class for Appwrite models"""
+    """
+    Base class for Appwrite models
+
+    get and list read through the configured cache for cache_ttl seconds
+    (0 disables caching for the collection, APPWRITE_CACHE_TTLS overrides
+    it); create, update and delete invalidate it.
+    """
     
     collection_id = None
+    cache_ttl = 60
+    page_size = 100
     
     @classmethod
     def get_database(cls):
@@ -29,6 +43,33 @@ class AppwriteModel:
         appwrite = get_appwrite()
         return appwrite.database_id
     
+    @classmethod
+    def get_cache(cls):
+        """Get the document cache backend"""
+        appwrite = get_appwrite()
+        return appwrite.cache
+    
+    @classmethod
+    def get_cache_ttl(cls):
+        """Get the number of seconds documents of this collection are cached"""
+        appwrite = get_appwrite()
+        return appwrite.cache_ttls.get(cls.get_collection_id(), cls.cache_ttl)
+    
+    @classmethod
+    def _document_key(cls, document_id):
+        return document_key(cls.get_database_id(), cls.get_collection_id(), document_id)
+    
+    @classmethod
+    def _invalidate(cls, document_id, document=None):
+        """Drop cached lists of the collection and replace the cached document"""
+        cache = cls.get_cache()
+        cache.bump(f'{cls.get_database_id()}:{cls.get_collection_id()}')
+        ttl = cls.get_cache_ttl()
+        if document is not None and ttl:
+            cache.set(cls._document_key(document_id), document, ttl)
+        else:
+            cache.delete(cls._document_key(document_id))
+    
     @classmethod
     def create(cls, data):
         """Create a new document in the collection"""
@@ -42,15 +83,48 @@ class AppwriteModel:
                 document_id=document_id,
                 data=data
             )
-            return cls(**result)
+            cls._invalidate(result.get('$id', document_id), result)
+            return cls._remember(result.get('$id', document_id), result) or cls._from_document(result)
         except AppwriteException as e:
             print(f"Error creating document: {e}")
             return None
     
     @classmethod
-    def get(cls, document_id):
-        """Get a document by ID"""
+    def _from_document(cls, document):
+        """Build an instance, keeping the document it was built from"""
+        instance = cls(**document)
+        instance._document = document
+        return instance
+    
+    @classmethod
+    def _remember(cls, document_id, document):
+        """Bring the request's identity map up to date after a write, returning its instance"""
+        session = current_session()
+        if session is None:
+            return None
+        found, instance = session.lookup(cls, document_id)
+        if document is None:
+            instance = None
+        elif instance is not None:
+            instance.__init__(**document)
+            instance._document = document
+        else:
+            instance = cls._from_document(document)
+        session.store(cls, document_id, instance)
+        return instance
+    
+    @classmethod
+    def _get_document(cls, document_id):
+        """Get a document by ID through the cache"""
         database = cls.get_database()
+        cache = cls.get_cache()
+        ttl = cls.get_cache_ttl()
+        key = cls._document_key(document_id)
+        
+        if ttl:
+            cached = cache.get(key)
+            if cached is not None:
+                return None if cached == MISSING else cls._from_document(cached)
         
         try:
             result = database.get_document(
@@ -58,32 +132,147 @@ class AppwriteModel:
                 collection_id=cls.get_collection_id(),
                 document_id=document_id
             )
-            return cls(**result)
         except AppwriteException as e:
+            if e.code == 404 and ttl:
+                cache.set(key, MISSING, min(ttl, get_appwrite().cache_negative_ttl))
             print(f"Error getting document: {e}")
             return None
+        
+        if ttl:
+            cache.set(key, result, ttl)
+        return cls._from_document(result)
     
     @classmethod
-    def list(cls, queries=None, limit=25):
-        """List documents in the collection"""
-        database = cls.get_database()
+    def get(cls, document_id):
+        """
+        Get a document by ID
+        
+        During a request each document is fetched once and the same instance
+        is returned afterwards.
+        """
+        session = current_session()
+        if session is None:
+            return cls._get_document(document_id)
+        
+        found, instance = session.lookup(cls, document_id)
+        if found:
+            return instance
+        
+        instance = cls._get_document(document_id)
+        session.store(cls, document_id, instance)
+        return instance
+    
+    @classmethod
+    def _fetch_page(cls, queries, generation, cached=True):
+        """Run one list_documents call, through the cache when enabled"""
+        cache = cls.get_cache()
+        ttl = cls.get_cache_ttl() if cached else 0
+        
+        if ttl:
+            key = list_key(cls.get_database_id(), cls.get_collection_id(), generation, queries)
+            cached = cache.get(key)
+            if cached is not None:
+                return cached
+        
+        result = cls.get_database().list_documents(
+            database_id=cls.get_database_id(),
+            collection_id=cls.get_collection_id(),
+            queries=queries
+        )
+        page = {'total': result.get('total', 0), 'documents': result['documents']}
+        
+        # Stored under the generation read before the request, so a write
+        # made meanwhile keeps this result from being served
+        if ttl:
+            cache.set(key, page, ttl)
+        return page
+    
+    @classmethod
+    def _generation(cls):
+        return cls.get_cache().generation(f'{cls.get_database_id()}:{cls.get_collection_id()}')
+    
+    @classmethod
+    def list(cls, queries=None, limit=None, page_size=None, prefetch=False, cached=True):
+        """
+        Iterate over the documents in the collection
+        
+        Pages are requested lazily with Query.cursorAfter, so only the pages
+        that are consumed are fetched.
+        
+        Args:
+            queries (list, optional): Appwrite queries to filter and order by
+            limit (int, optional): Stop after this many documents
+            page_size (int, optional): Documents per request, defaults to
+                the class's page_size
+            prefetch (bool): Request the next page in a background thread
+                while the current one is consumed
+            cached (bool): Read and store pages in the document cache
+        
+        Yields:
+            AppwriteModel: One instance per document
+        """
+        queries = list(queries or [])
+        page_size = page_size or cls.page_size
+        generation = cls._generation()
+        remaining = limit
+        cursor = None
+        pending = None
+        
+        def fetch(cursor, remaining):
+            page_queries = queries + [Query.limit(min(page_size, remaining) if remaining is not None else page_size)]
+            if cursor is not None:
+                page_queries.append(Query.cursor_after(cursor))
+            return cls._fetch_page(page_queries, generation, cached)
         
         try:
-            result = database.list_documents(
-                database_id=cls.get_database_id(),
-                collection_id=cls.get_collection_id(),
-                queries=queries,
-                limit=limit
-            )
-            
-            documents = []
-            for doc in result['documents']:
-                documents.append(cls(**doc))
-            
-            return documents
+            while remaining is None or remaining > 0:
+                try:
+                    documents = (pending.result() if pending else fetch(cursor, remaining))['documents']
+                except AppwriteException as e:
+                    print(f"Error listing documents: {e}")
+                    return
+                pending = None
+                
+                if remaining is not None:
+                    documents = documents[:remaining]
+                    remaining -= len(documents)
+                last_page = len(documents) < page_size or remaining == 0
+                if documents:
+                    cursor = documents[-1]['$id']
+                if prefetch and not last_page:
+                    pending = _prefetch_pool.submit(fetch, cursor, remaining)
+                
+                for doc in documents:
+                    yield cls._from_document(doc)
+                if last_page:
+                    return
+        finally:
+            if pending is not None:
+                pending.cancel()
+    
+    @classmethod
+    def count(cls, queries=None):
+        """
+        Count the documents matching queries without fetching them
+        
+        Appwrite may cap the total it reports (5000 by default).
+        """
+        try:
+            page = cls._fetch_page(list(queries or []) + [Query.select(['$id']), Query.limit(1)], cls._generation())
+        except AppwriteException as e:
+            print(f"Error counting documents: {e}")
+            return 0
+        return page['total']
+    
+    @classmethod
+    def exists(cls, queries=None):
+        """Check whether any document matches queries"""
+        try:
+            page = cls._fetch_page(list(queries or []) + [Query.select(['$id']), Query.limit(1)], cls._generation())
         except AppwriteException as e:
-            print(f"Error listing documents: {e}")
-            return []
+            print(f"Error checking documents: {e}")
+            return False
+        return bool(page['documents'])
     
     @classmethod
     def update(cls, document_id, data):
@@ -97,7 +286,8 @@ class AppwriteModel:
                 document_id=document_id,
                 data=data
             )
-            return cls(**result)
+            cls._invalidate(document_id, result)
+            return cls._remember(document_id, result) or cls._from_document(result)
         except AppwriteException as e:
             print(f"Error updating document: {e}")
             return None
@@ -113,6 +303,8 @@ class AppwriteModel:
                 collection_id=cls.get_collection_id(),
                 document_id=document_id
             )
+            cls._invalidate(document_id)
+            cls._remember(document_id, None)
             return True
         except AppwriteException as e:
             print(f"Error deleting document: {e}")
@@ -147,20 +339,20 @@ class User(UserMixin, AppwriteModel):
     @classmethod
     def find_by_email(cls, email):
         """Find a user by email"""
-        users = cls.list(queries=[Query.equal('email', email)])
-        return users[0] if users else None
+        return next(cls.list(queries=[Query.equal('email', email)], limit=1), None)
     
     @classmethod
     def find_by_username(cls, username):
         """Find a user by username"""
-        users = cls.list(queries=[Query.equal('username', username)])
-        return users[0] if users else None
+        return next(cls.list(queries=[Query.equal('username', username)], limit=1), None)
 
 
 class Roadmap(AppwriteModel):
     """Roadmap model for Appwrite"""
     
     collection_id = 'roadmaps'
+    # Only changed by the importer
+    cache_ttl = 3600
     
     def __init__(self, **kwargs):
         self.id = kwargs.get('$id')
@@ -175,13 +367,16 @@ class Roadmap(AppwriteModel):
     @classmethod
     def find_by_category(cls, category):
         """Find roadmaps by category"""
-        return cls.list(queries=[Query.equal('category', category)])
+        return list(cls.list(queries=[Query.equal('category', category)]))
 
 
 class RoadmapNode(AppwriteModel):
     """RoadmapNode model for Appwrite"""
     
     collection_id = 'roadmap_nodes'
+    cache_ttl = 3600
+    # Whole roadmaps are read at once; the largest has a few hundred nodes
+    roadmap_page_size = 500
     
     def __init__(self, **kwargs):
         self.id = kwargs.get('$id')
@@ -195,13 +390,15 @@ class RoadmapNode(AppwriteModel):
     @classmethod
     def find_by_roadmap(cls, roadmap_id):
         """Find nodes by roadmap ID"""
-        return cls.list(queries=[Query.equal('roadmap_id', roadmap_id)])
+        return list(cls.list(queries=[Query.equal('roadmap_id', roadmap_id)], page_size=cls.roadmap_page_size))
 
 
 class UserProgress(AppwriteModel):
     """UserProgress model for Appwrite"""
     
     collection_id = 'user_progress'
+    # Written on every progress click, possibly by another worker
+    cache_ttl = 0
     
     def __init__(self, **kwargs):
         self.id = kwargs.get('$id')
@@ -214,17 +411,16 @@ class UserProgress(AppwriteModel):
     @classmethod
     def find_by_user_and_roadmap(cls, user_id, roadmap_id):
         """Find progress by user ID and roadmap ID"""
-        return cls.list(queries=[
+        return list(cls.list(queries=[
             Query.equal('user_id', user_id),
             Query.equal('roadmap_id', roadmap_id)
-        ])
+        ]))
     
     @classmethod
     def find_by_user_roadmap_node(cls, user_id, roadmap_id, node_id):
         """Find progress by user ID, roadmap ID, and node ID"""
-        progress = cls.list(queries=[
+        return next(cls.list(queries=[
             Query.equal('user_id', user_id),
             Query.equal('roadmap_id', roadmap_id),
             Query.equal('node_id', node_id)
-        ])
-        return progress[0] if progress else None
+        ], limit=1), None)
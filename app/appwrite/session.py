@@ -0,0 +1,38 @@
+"""
+Request-scoped identity map for Appwrite models.
+
+During a request every document read through AppwriteModel.get is kept
+here, so later lookups of the same ID, including misses, return the same
+instance without another call. create, update and delete keep it up to
+date.
+
+Outside a request there is no session, and models read directly.
+"""
+
+from flask import g, has_request_context
+
+class AppwriteSession:
+    """Documents read during one request"""
+
+    def __init__(self):
+        # (model class, document ID) -> instance, or None for a missing document
+        self.documents = {}
+
+    def lookup(self, model, document_id):
+        """Return (found, instance) for a document read earlier"""
+        key = (model, document_id)
+        if key in self.documents:
+            return True, self.documents[key]
+        return False, None
+
+    def store(self, model, document_id, instance):
+        self.documents[(model, document_id)] = instance
+
+def current_session():
+    """Return the session of the current request, or None outside requests"""
+    if not has_request_context():
+        return None
+    session = g.get('appwrite_session')
+    if session is None:
+        session = g.appwrite_session = AppwriteSession()
+    return session
@@ -0,0 +1,231 @@
+"""
+Pooled HTTP transport for the Appwrite SDK.
+
+appwrite.client.Client sends every call with requests.request, which opens
+a new session, and with it a new TCP and TLS connection, each time.
+PooledClient sends the same requests through one requests.Session per
+process, so connections to the endpoint are kept alive and reused by all
+threads of a worker. The session is created lazily and again after a fork,
+so gunicorn's --preload does not share sockets between workers.
+
+Every call gets connect and read timeouts and is timed; CallMetrics keeps
+per-operation latencies, and the calls made during a request are reported
+in its Server-Timing header.
+"""
+
+import os
+import re
+import gzip
+import json
+import time
+import threading
+from collections import deque
+from http.cookiejar import DefaultCookiePolicy
+import requests
+from requests.adapters import HTTPAdapter
+from flask import g, has_request_context
+from appwrite.client import Client
+from appwrite.input_file import InputFile
+from appwrite.exception import AppwriteException
+
+# Latencies kept per operation for the percentiles
+SAMPLE_SIZE = 1000
+
+_DOCUMENT_ID_RE = re.compile(r'/documents/[^/]+')
+
+def operation_name(method, path):
+    """Return 'METHOD path' with the document ID replaced by {id}"""
+    return f"{method.upper()} {_DOCUMENT_ID_RE.sub('/documents/{id}', path)}"
+
+class CallMetrics:
+    """Per-operation latency of the calls made by this process"""
+
+    def __init__(self):
+        self._operations = {}
+        self._lock = threading.Lock()
+
+    def record(self, operation, seconds, failed=False):
+        with self._lock:
+            stats = self._operations.get(operation)
+            if stats is None:
+                stats = self._operations[operation] = {
+                    'count': 0, 'errors': 0, 'total': 0.0, 'max': 0.0, 'samples': deque(maxlen=SAMPLE_SIZE)
+                }
+            stats['count'] += 1
+            stats['errors'] += failed
+            stats['total'] += seconds
+            stats['max'] = max(stats['max'], seconds)
+            stats['samples'].append(seconds)
+
+    def snapshot(self):
+        """
+        Return the latencies recorded so far
+
+        Returns:
+            dict: operation -> count, errors, and avg/p50/p95/max in
+                milliseconds; percentiles cover the last SAMPLE_SIZE calls
+        """
+        with self._lock:
+            operations = {name: dict(stats, samples=sorted(stats['samples']))
+                          for name, stats in self._operations.items()}
+
+        def percentile(samples, fraction):
+            return samples[min(len(samples) - 1, int(len(samples) * fraction))] * 1000
+
+        return {
+            name: {
+                'count': stats['count'],
+                'errors': stats['errors'],
+                'avg_ms': round(stats['total'] / stats['count'] * 1000, 2),
+                'p50_ms': round(percentile(stats['samples'], 0.5), 2),
+                'p95_ms': round(percentile(stats['samples'], 0.95), 2),
+                'max_ms': round(stats['max'] * 1000, 2)
+            }
+            for name, stats in operations.items()
+        }
+
+    def reset(self):
+        with self._lock:
+            self._operations.clear()
+
+class PooledClient(Client):
+    """
+    Appwrite client sending its calls through a pooled, keep-alive session
+
+    Args:
+        pool_size (int): Connections kept open to the endpoint
+        connect_timeout (float): Seconds to wait for a connection
+        read_timeout (float): Seconds to wait for a response
+        keep_alive (bool): Reuse connections; False closes each one after
+            its response
+        gzip_requests (bool): Compress JSON request bodies of at least
+            gzip_min_size bytes (responses are always accepted gzipped)
+        gzip_min_size (int): Smallest body worth compressing
+        metrics (CallMetrics, optional): Where call latencies are recorded
+    """
+
+    def __init__(self, pool_size=10, connect_timeout=3.05, read_timeout=30, keep_alive=True,
+                 gzip_requests=False, gzip_min_size=1024, metrics=None):
+        super().__init__()
+        self.pool_size = pool_size
+        self.timeout = (connect_timeout, read_timeout)
+        self.keep_alive = keep_alive
+        self.gzip_requests = gzip_requests
+        self.gzip_min_size = gzip_min_size
+        self.metrics = metrics or CallMetrics()
+        self._session = None
+        self._session_pid = None
+        self._session_lock = threading.Lock()
+
+    def session(self):
+        """Return this process's session, creating it on first use"""
+        if self._session is None or self._session_pid != os.getpid():
+            with self._session_lock:
+                if self._session is None or self._session_pid != os.getpid():
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, pool_block=False)
+                    session.mount('https://', adapter)
+                    session.mount('http://', adapter)
+                    # The session is shared by threads; API-key calls need no cookies
+                    session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+                    self._session, self._session_pid = session, os.getpid()
+        return self._session
+
+    def close(self):
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
+    def call(self, method, path='', headers=None, params=None):
+        # Same request building as Client.call, sent through the session
+        if headers is None:
+            headers = {}
+
+        if params is None:
+            params = {}
+
+        params = {k: v for k, v in params.items() if v is not None}
+
+        data = {}
+        body = {}
+        files = {}
+        stringify = False
+
+        headers = {**self._global_headers, **headers}
+        headers['accept-encoding'] = 'gzip'
+        if not self.keep_alive:
+            headers['connection'] = 'close'
+
+        if method != 'get':
+            data = params
+            params = {}
+
+        if headers['content-type'].startswith('application/json'):
+            body = data
+            data = {}
+
+        if headers['content-type'].startswith('multipart/form-data'):
+            del headers['content-type']
+            stringify = True
+            for key in data.copy():
+                if isinstance(data[key], InputFile):
+                    files[key] = (data[key].filename, data[key].data)
+                    del data[key]
+
+        request = {
+            'method': method,
+            'url': self._endpoint + path,
+            'params': self.flatten(params, stringify=stringify),
+            'data': self.flatten(data),
+            # GET parameters go in the query string; Client.call also sends an
+            # empty JSON body, which is dropped here
+            'json': body if method != 'get' else None,
+            'files': files,
+            'headers': headers,
+            'verify': not self._self_signed,
+            'timeout': self.timeout
+        }
+        if self.gzip_requests and body:
+            encoded = json.dumps(body).encode('utf-8')
+            if len(encoded) >= self.gzip_min_size:
+                headers['content-encoding'] = 'gzip'
+                request['data'] = gzip.compress(encoded)
+                request['json'] = None
+
+        operation = operation_name(method, path)
+        started = time.perf_counter()
+        response = None
+        try:
+            response = self.session().request(**request)
+            response.raise_for_status()
+
+            content_type = response.headers['Content-Type']
+
+            if content_type.startswith('application/json'):
+                return response.json()
+
+            return response._content
+        except Exception as e:
+            if response is not None:
+                content_type = response.headers.get('Content-Type', '')
+                if content_type.startswith('application/json'):
+                    raise AppwriteException(response.json()['message'], response.status_code,
+                                            response.json().get('type'), response.json())
+                else:
+                    raise AppwriteException(response.text, response.status_code)
+            else:
+                raise AppwriteException(e)
+        finally:
+            seconds = time.perf_counter() - started
+            self.metrics.record(operation, seconds, failed=response is None or not response.ok)
+            if has_request_context():
+                g.appwrite_calls = g.get('appwrite_calls', 0) + 1
+                g.appwrite_seconds = g.get('appwrite_seconds', 0.0) + seconds
+
+def add_server_timing(response):
+    """after_request hook reporting the request's Appwrite calls"""
+    calls = g.pop('appwrite_calls', 0)
+    if calls:
+        seconds = g.pop('appwrite_seconds', 0.0)
+        response.headers.add('Server-Timing', f'appwrite;dur={seconds * 1000:.1f};desc="{calls} calls"')
+    return response
@@ -1,10 +1,7 @@
-import os
-import json
 from appwrite.id import ID
 from appwrite.query import Query
 from appwrite.exception import AppwriteException
 from .config import get_appwrite
-from .models import Roadmap, RoadmapNode, User, UserProgress
 
 def setup_appwrite_collections():
     """Set up the Appwrite collections if they don't exist"""
@@ -288,68 +285,3 @@ def setup_appwrite_collections():
     except AppwriteException as e:
         print(f"Error setting up Appwrite collections: {e}")
         return False
-
-def import_roadmaps_to_appwrite():
-    """Import roadmaps from JSON files to Appwrite"""
-    # Get the roadmap data directory
-    roadmap_data_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'roadmap_data')
-    
-    # Load roadmaps.json
-    with open(os.path.join(roadmap_data_dir, 'roadmaps.json'), 'r', encoding='utf-8') as f:
-        roadmaps_data = json.load(f)
-    
-    # Import each roadmap
-    for roadmap_info in roadmaps_data['roadmaps']:
-        roadmap_id = roadmap_info['id']
-        
-        # Check if roadmap already exists
-        existing_roadmap = Roadmap.get(roadmap_id)
-        if existing_roadmap:
-            print(f"Roadmap {roadmap_id} already exists, skipping...")
-            continue
-        
-        # Create roadmap
-        tags_str = ','.join(roadmap_info['tags']) if 'tags' in roadmap_info else ''
-        roadmap_data = {
-            'id': roadmap_id,
-            'title': roadmap_info['title'],
-            'description': roadmap_info['description'],
-            'category': roadmap_info['category'],
-            'difficulty': roadmap_info['difficulty'],
-            'tags': tags_str
-        }
-        
-        roadmap = Roadmap.create(roadmap_data)
-        if not roadmap:
-            print(f"Failed to create roadmap {roadmap_id}")
-            continue
-        
-        print(f"Created roadmap: {roadmap_id}")
-        
-        # Load roadmap nodes
-        try:
-            with open(os.path.join(roadmap_data_dir, f"{roadmap_id}.json"), 'r', encoding='utf-8') as f:
-                nodes_data = json.load(f)
-            
-            # Import each node
-            for node_id, node_data in nodes_data.items():
-                # Create node
-                node_data = {
-                    'id': node_id,
-                    'roadmap_id': roadmap_id,
-                    'title': node_data['title'],
-                    'description': node_data['description'],
-                    'links': json.dumps(node_data.get('links', []))
-                }
-                
-                node = RoadmapNode.create(node_data)
-                if not node:
-                    print(f"Failed to create node {node_id} for roadmap {roadmap_id}")
-                    continue
-            
-            print(f"Imported {len(nodes_data)} nodes for roadmap {roadmap_id}")
-        except FileNotFoundError:
-            print(f"No nodes file found for roadmap {roadmap_id}")
-    
-    print("Roadmap import complete")
-    return True
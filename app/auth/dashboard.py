@@ -0,0 +1,157 @@
+"""
+Data for the learning dashboard.
+
+Roadmaps and node totals come from the catalog cache and completed counts
+from UserRoadmapStats, so building a dashboard takes a fixed number of
+queries no matter how many roadmaps or nodes exist. Results are cached per
+user and keyed on a summary of the user's counters, which every progress
+change updates, so one small query tells whether a cached dashboard is
+still current in any worker.
+"""
+
+import threading
+from collections import OrderedDict, namedtuple
+from sqlalchemy import select, func
+from app import db
+from app.catalog import catalog
+from app.models import RoadmapNode, UserProgress, UserRoadmapStats, RelatedRoadmap
+
+ActivityNode = namedtuple('ActivityNode', ['id', 'title'])
+
+RECENT_ACTIVITY_LIMIT = 10
+RECOMMENDATION_LIMIT = 3
+
+# Roadmaps that haven't been started are only listed if they are this big
+MIN_LISTED_NODES = 10
+
+# Maximum number of users kept in each worker's cache
+CACHE_SIZE = 1000
+
+_lock = threading.Lock()
+_cache = OrderedDict()
+
+def _progress_key(user_id):
+    """Summarize a user's counters; it changes with every progress update"""
+    return tuple(db.session.execute(
+        select(func.count(), func.sum(UserRoadmapStats.completed_count),
+               func.max(UserRoadmapStats.last_activity))
+        .where(UserRoadmapStats.user_id == user_id)
+    ).one())
+
+def get_dashboard_data(user_id):
+    """
+    Get the dashboard data for a user, from cache when it is still current
+
+    Args:
+        user_id (int): The ID of the user
+
+    Returns:
+        dict: roadmap_progress, activity_details, stats and recommended_roadmaps
+    """
+    key = (_progress_key(user_id), catalog.version())
+
+    with _lock:
+        cached = _cache.get(user_id)
+        if cached and cached[0] == key:
+            _cache.move_to_end(user_id)
+            return cached[1]
+
+    data = build_dashboard_data(user_id)
+
+    with _lock:
+        _cache[user_id] = (key, data)
+        _cache.move_to_end(user_id)
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+
+    return data
+
+def build_dashboard_data(user_id):
+    """Compute the dashboard data for a user without caching"""
+    roadmaps = catalog.all()
+    node_counts = catalog.node_counts()
+
+    # Completed topics per roadmap, from the materialized counters
+    completed_counts = dict(db.session.execute(
+        select(UserRoadmapStats.roadmap_id, UserRoadmapStats.completed_count)
+        .where(UserRoadmapStats.user_id == user_id)
+    ).all())
+
+    roadmap_progress = []
+    for roadmap in roadmaps:
+        total_nodes = node_counts.get(roadmap.id, 0)
+        completed_nodes = completed_counts.get(roadmap.id, 0)
+        percentage = int(completed_nodes / total_nodes * 100) if total_nodes > 0 else 0
+
+        # Only include roadmaps that have been started or have at least 10 nodes
+        if completed_nodes > 0 or total_nodes >= MIN_LISTED_NODES:
+            roadmap_progress.append({
+                'roadmap': roadmap,
+                'total_nodes': total_nodes,
+                'completed_nodes': completed_nodes,
+                'percentage': percentage
+            })
+
+    # Sort by progress percentage (descending)
+    roadmap_progress.sort(key=lambda x: x['percentage'], reverse=True)
+
+    # Recent activity, joined to the node titles in the same query
+    recent_activity = db.session.execute(
+        select(UserProgress.roadmap_id, UserProgress.date_completed, RoadmapNode.id, RoadmapNode.title)
+        .join(RoadmapNode, RoadmapNode.id == UserProgress.node_id)
+        .where(UserProgress.user_id == user_id,
+               UserProgress.completed == True,
+               UserProgress.date_completed.isnot(None))
+        .order_by(UserProgress.date_completed.desc())
+        .limit(RECENT_ACTIVITY_LIMIT)
+    ).all()
+
+    activity_details = []
+    for roadmap_id, date_completed, node_id, node_title in recent_activity:
+        roadmap = catalog.get(roadmap_id)
+        if roadmap:
+            activity_details.append({
+                'roadmap': roadmap,
+                'node': ActivityNode(node_id, node_title),
+                'date_completed': date_completed
+            })
+
+    total_completed = sum(r['completed_nodes'] for r in roadmap_progress)
+    total_available = sum(r['total_nodes'] for r in roadmap_progress)
+    stats = {
+        'roadmaps_started': len([r for r in roadmap_progress if r['completed_nodes'] > 0]),
+        'total_completed': total_completed,
+        'total_available': total_available,
+        'overall_percentage': int(total_completed / max(total_available, 1) * 100)
+    }
+
+    # Recommend the closest neighbours of the started roadmaps
+    started_ids = [r['roadmap'].id for r in roadmap_progress if r['completed_nodes'] > 0]
+    recommended_roadmaps = []
+    if started_ids:
+        neighbours = db.session.execute(
+            select(RelatedRoadmap.related_id)
+            .where(RelatedRoadmap.roadmap_id.in_(started_ids))
+            .group_by(RelatedRoadmap.related_id)
+            .order_by(func.sum(RelatedRoadmap.score).desc(), RelatedRoadmap.related_id)
+        ).scalars().all()
+        for related_id in neighbours:
+            roadmap = catalog.get(related_id)
+            if roadmap and related_id not in started_ids:
+                recommended_roadmaps.append(roadmap)
+            if len(recommended_roadmaps) >= RECOMMENDATION_LIMIT:
+                break
+
+    # If we don't have enough recommendations, add some popular roadmaps
+    for roadmap in roadmaps:
+        if len(recommended_roadmaps) >= RECOMMENDATION_LIMIT:
+            break
+        if roadmap.id not in started_ids and roadmap not in recommended_roadmaps:
+            recommended_roadmaps.append(roadmap)
+
+    return {
+        'roadmap_progress': roadmap_progress,
+        'activity_details': activity_details,
+        'stats': stats,
+        'recommended_roadmaps': recommended_roadmaps
+    }
@@ -3,7 +3,7 @@ from flask_login import login_user, current_user, logout_user, login_required
 from app import db, bcrypt
 from app.models import User
 from app.forms import RegistrationForm, LoginForm, UpdateAccountForm
-from app.auth import auth
+from app.auth import auth, user_cache
 import os
 from PIL import Image
 
@@ -29,6 +29,8 @@ def login():
     if form.validate_on_submit():
         user = User.query.filter_by(email=form.email.data).first()
         if user and user.check_password(form.password.data):
+            # Saves the new hash if check_password rehashed it
+            db.session.commit()
             login_user(user, remember=form.remember.data)
             next_page = request.args.get('next')
             return redirect(next_page) if next_page else redirect(url_for('main.index'))
@@ -51,7 +53,8 @@ def logout():
 @auth.route("/profile", methods=['GET', 'POST'])
 @login_required
 def profile():
-    from app.models import Roadmap, RoadmapNode, UserProgress
+    from app.models import RoadmapNode, UserProgress, UserRoadmapStats
+    from app.catalog import catalog
     from sqlalchemy import func
 
     form = UpdateAccountForm()
@@ -62,46 +65,42 @@ def profile():
         current_user.username = form.username.data
         current_user.email = form.email.data
         db.session.commit()
+        user_cache.refresh(current_user.id)
         flash('Your account has been updated!', 'success')
         return redirect(url_for('auth.profile'))
     elif request.method == 'GET':
         form.username.data = current_user.username
         form.email.data = current_user.email
 
-    # Get progress summary data
-    # 1. Count roadmaps with at least one completed topic
-    roadmaps_in_progress = db.session.query(UserProgress.roadmap_id) \
-        .filter(UserProgress.user_id == current_user.id) \
-        .group_by(UserProgress.roadmap_id) \
-        .count()
-
-    # 2. Count completed topics
-    completed_topics = UserProgress.query \
-        .filter(UserProgress.user_id == current_user.id, UserProgress.completed == True) \
-        .count()
-
-    # 3. Count total topics across all roadmaps
-    total_topics = RoadmapNode.query.count()
-
-    # Get user's recent activity (last 5 completed topics)
-    recent_activity = UserProgress.query \
-        .filter(UserProgress.user_id == current_user.id, UserProgress.completed == True) \
+    # Get progress summary data from the per-roadmap counters
+    roadmaps_in_progress, completed_topics = db.session.query(
+        func.count(UserRoadmapStats.roadmap_id),
+        func.coalesce(func.sum(UserRoadmapStats.completed_count), 0)
+    ).filter(UserRoadmapStats.user_id == current_user.id).one()
+
+    # Count total topics across all roadmaps
+    total_topics = sum(catalog.node_counts().values())
+
+    # Get user's recent activity (last 5 completed topics), joined to the
+    # nodes in the same query; roadmaps come from the catalog
+    recent_activity = db.session.query(UserProgress.roadmap_id, UserProgress.date_completed, RoadmapNode) \
+        .join(RoadmapNode, RoadmapNode.id == UserProgress.node_id) \
+        .filter(UserProgress.user_id == current_user.id,
+                UserProgress.completed == True,
+                UserProgress.date_completed.isnot(None)) \
         .order_by(UserProgress.date_completed.desc()) \
         .limit(5) \
         .all()
 
-    # Get roadmap and node info for recent activity
     activity_details = []
-    for progress in recent_activity:
-        if progress.date_completed:  # Only include items with a completion date
-            roadmap = Roadmap.query.get(progress.roadmap_id)
-            node = RoadmapNode.query.get(progress.node_id)
-            if roadmap and node:
-                activity_details.append({
-                    'roadmap': roadmap,
-                    'node': node,
-                    'date_completed': progress.date_completed
-                })
+    for roadmap_id, date_completed, node in recent_activity:
+        roadmap = catalog.get(roadmap_id)
+        if roadmap:
+            activity_details.append({
+                'roadmap': roadmap,
+                'node': node,
+                'date_completed': date_completed
+            })
 
     image_file = url_for('static', filename='profile_pics/' + current_user.avatar)
     return render_template('auth/profile.html', title='Profile',
@@ -136,110 +135,13 @@ def save_picture(form_picture):
 @login_required
 def dashboard():
     """Show a dashboard of user's progress across all roadmaps"""
-    from app.models import Roadmap, RoadmapNode, UserProgress
-    from sqlalchemy import func, case
-    from sqlalchemy.sql import text
-
-    # Get all roadmaps with progress information
-    roadmaps_with_progress = db.session.query(
-        Roadmap,
-        func.count(RoadmapNode.id).label('total_nodes'),
-        func.sum(case((UserProgress.completed == True, 1), else_=0)).label('completed_nodes')
-    ).outerjoin(
-        RoadmapNode, RoadmapNode.roadmap_id == Roadmap.id
-    ).outerjoin(
-        UserProgress, (UserProgress.node_id == RoadmapNode.id) &
-                      (UserProgress.user_id == current_user.id)
-    ).group_by(
-        Roadmap.id
-    ).all()
-
-    # Calculate progress percentage for each roadmap
-    roadmap_progress = []
-    for roadmap, total_nodes, completed_nodes in roadmaps_with_progress:
-        if total_nodes > 0:
-            percentage = int((completed_nodes or 0) / total_nodes * 100)
-        else:
-            percentage = 0
-
-        # Only include roadmaps that have been started or have at least 10 nodes
-        if completed_nodes > 0 or total_nodes >= 10:
-            roadmap_progress.append({
-                'roadmap': roadmap,
-                'total_nodes': total_nodes,
-                'completed_nodes': completed_nodes or 0,
-                'percentage': percentage
-            })
+    from app.auth.dashboard import get_dashboard_data
 
-    # Sort by progress percentage (descending)
-    roadmap_progress.sort(key=lambda x: x['percentage'], reverse=True)
-
-    # Get recent activity (last 10 completed topics)
-    recent_activity = UserProgress.query \
-        .filter(UserProgress.user_id == current_user.id, UserProgress.completed == True) \
-        .order_by(UserProgress.date_completed.desc()) \
-        .limit(10) \
-        .all()
-
-    # Get roadmap and node info for recent activity
-    activity_details = []
-    for progress in recent_activity:
-        if progress.date_completed:  # Only include items with a completion date
-            roadmap = Roadmap.query.get(progress.roadmap_id)
-            node = RoadmapNode.query.get(progress.node_id)
-            if roadmap and node:
-                activity_details.append({
-                    'roadmap': roadmap,
-                    'node': node,
-                    'date_completed': progress.date_completed
-                })
-
-    # Get overall statistics
-    stats = {
-        'roadmaps_started': len([r for r in roadmap_progress if r['completed_nodes'] > 0]),
-        'total_completed': sum(r['completed_nodes'] for r in roadmap_progress),
-        'total_available': sum(r['total_nodes'] for r in roadmap_progress),
-        'overall_percentage': int(sum(r['completed_nodes'] for r in roadmap_progress) /
-                               max(sum(r['total_nodes'] for r in roadmap_progress), 1) * 100)
-    }
-
-    # Get recommended roadmaps (roadmaps with similar tags to completed ones)
-    # This is a simplified recommendation system
-    completed_roadmap_ids = [r['roadmap'].id for r in roadmap_progress if r['completed_nodes'] > 0]
-
-    recommended_roadmaps = []
-    if completed_roadmap_ids:
-        # Get tags from completed roadmaps
-        completed_roadmaps = Roadmap.query.filter(Roadmap.id.in_(completed_roadmap_ids)).all()
-        all_tags = []
-        for r in completed_roadmaps:
-            if r.tags:
-                all_tags.extend([tag.strip() for tag in r.tags.split(',')])
-
-        # Find roadmaps with similar tags that haven't been started
-        if all_tags:
-            for tag in set(all_tags):
-                similar_roadmaps = Roadmap.query.filter(
-                    Roadmap.tags.like(f'%{tag}%'),
-                    ~Roadmap.id.in_(completed_roadmap_ids)
-                ).limit(3).all()
-
-                for roadmap in similar_roadmaps:
-                    if roadmap not in recommended_roadmaps and len(recommended_roadmaps) < 3:
-                        recommended_roadmaps.append(roadmap)
-
-    # If we don't have enough recommendations, add some popular roadmaps
-    if len(recommended_roadmaps) < 3:
-        popular_roadmaps = Roadmap.query.filter(
-            ~Roadmap.id.in_([r.id for r in recommended_roadmaps]),
-            ~Roadmap.id.in_(completed_roadmap_ids)
-        ).limit(3 - len(recommended_roadmaps)).all()
-
-        recommended_roadmaps.extend(popular_roadmaps)
+    data = get_dashboard_data(current_user.id)
 
     return render_template('auth/dashboard.html',
                           title='My Learning Dashboard',
-                          roadmap_progress=roadmap_progress,
-                          activity_details=activity_details,
-                          stats=stats,
-                          recommended_roadmaps=recommended_roadmaps)
+                          roadmap_progress=data['roadmap_progress'],
+                          activity_details=data['activity_details'],
+                          stats=data['stats'],
+                          recommended_roadmaps=data['recommended_roadmaps'])
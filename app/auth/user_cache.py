@@ -0,0 +1,147 @@
+"""
+Per-worker cache of the logged-in user's identity.
+
+load_user is called on every request that touches current_user. With this
+cache it returns a CachedUser built from the identity fields kept in the
+worker, without a query; anything else (relationships, password checks,
+attribute updates) loads the User row on first use.
+
+A cached entry is only used while it matches the fingerprint stored in the
+user's session: an HMAC of the identity fields and password hash, keyed
+with SECRET_KEY and set at login. When the profile changes the entry is
+refreshed and the session gets the new fingerprint, so a worker still
+holding the old entry sees the mismatch on the user's next request and
+reloads the row. Changes made outside the user's own session are picked
+up within USER_CACHE_TTL seconds.
+"""
+
+import hmac
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from flask import current_app, session, has_request_context
+from flask_login import UserMixin, user_logged_in, user_logged_out
+from app import db
+
+# Session key holding the fingerprint
+SESSION_KEY = '_user_fingerprint'
+
+IDENTITY_FIELDS = ('id', 'username', 'email', 'avatar', 'is_admin', 'date_joined', 'auth0_user_id')
+
+# Maximum number of users kept in each worker's cache
+CACHE_SIZE = 10000
+
+_lock = threading.Lock()
+_cache = OrderedDict()
+
+class CachedUser(UserMixin):
+    """A user's identity fields; other attributes come from the User row"""
+
+    def __init__(self, fields):
+        object.__setattr__(self, '_fields', fields)
+        object.__setattr__(self, '_user', None)
+
+    def _load(self):
+        from app.models import User
+
+        user = object.__getattribute__(self, '_user')
+        if user is None:
+            user = db.session.get(User, self._fields['id'])
+            object.__setattr__(self, '_user', user)
+        return user
+
+    def __getattr__(self, name):
+        # Only called for names not found on the object itself
+        user = object.__getattribute__(self, '_user')
+        if user is None and name in self._fields:
+            return self._fields[name]
+        return getattr(self._load(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self._load(), name, value)
+
+    def get_id(self):
+        return str(self._fields['id'])
+
+def fingerprint(user):
+    """Return the HMAC of a user's identity fields and password hash"""
+    values = [str(getattr(user, field)) for field in IDENTITY_FIELDS] + [user.password or '']
+    key = str(current_app.config['SECRET_KEY']).encode()
+    return hmac.new(key, '\x1f'.join(values).encode(), hashlib.sha256).hexdigest()[:32]
+
+def remember(user):
+    """
+    Cache a user's identity and store its fingerprint in the session
+
+    Args:
+        user (User): The user loaded from the database
+    """
+    ttl = current_app.config.get('USER_CACHE_TTL', 60)
+    value = fingerprint(user)
+    if ttl:
+        fields = {field: getattr(user, field) for field in IDENTITY_FIELDS}
+        with _lock:
+            _cache[user.id] = (time.monotonic() + ttl, value, fields)
+            _cache.move_to_end(user.id)
+            while len(_cache) > CACHE_SIZE:
+                _cache.popitem(last=False)
+    if has_request_context() and session.get(SESSION_KEY) != value:
+        session[SESSION_KEY] = value
+
+def forget(user_id):
+    """Drop a user from this worker's cache"""
+    with _lock:
+        _cache.pop(user_id, None)
+
+def refresh(user_id):
+    """Reload a user after a change to its identity fields"""
+    from app.models import User
+
+    forget(user_id)
+    user = db.session.get(User, user_id)
+    if user is not None:
+        remember(user)
+
+def load(user_id):
+    """
+    Return the user for a session, from the cache when it is current
+
+    Args:
+        user_id (int): The ID stored by Flask-Login
+
+    Returns:
+        CachedUser or User: None if the user does not exist
+    """
+    from app.models import User
+
+    expected = session.get(SESSION_KEY) if has_request_context() else None
+    with _lock:
+        entry = _cache.get(user_id)
+    if entry is not None and expected is not None:
+        expires, value, fields = entry
+        if value == expected and expires > time.monotonic():
+            return CachedUser(fields)
+
+    user = db.session.get(User, user_id)
+    if user is None:
+        forget(user_id)
+        return None
+    remember(user)
+    return user
+
+@user_logged_in.connect
+def _logged_in(sender, user):
+    from app.models import User
+
+    if isinstance(user, User):
+        remember(user)
+
+@user_logged_out.connect
+def _logged_out(sender, user):
+    if user is not None and user.get_id() is not None:
+        try:
+            forget(int(user.get_id()))
+        except ValueError:
+            pass
+    session.pop(SESSION_KEY, None)
@@ -0,0 +1,170 @@
+"""
+In-process cache of the roadmap catalog.
+
+The list of roadmaps only changes on import, version restore or admin edits,
+so each worker keeps a copy in memory instead of scanning the roadmap table
+on every request. A version counter stored in the database is checked once
+per request; bumping it from any worker makes all workers reload.
+"""
+
+import threading
+from collections import namedtuple
+from flask import abort, g, has_request_context
+from sqlalchemy import select, update, insert, func
+from sqlalchemy.exc import IntegrityError
+from app import db
+
+CatalogEntry = namedtuple('CatalogEntry', ['id', 'title', 'description', 'category', 'difficulty', 'tags'])
+
+class VersionCounter:
+    """Named counter in the cache_version table shared by all workers"""
+
+    def __init__(self, name):
+        self.name = name
+
+    def current(self):
+        """Read the counter from the database"""
+        from app.models import CacheVersion
+
+        version = db.session.execute(
+            select(CacheVersion.version).where(CacheVersion.name == self.name)
+        ).scalar()
+        return version or 0
+
+    def bump(self):
+        """
+        Increment the counter
+
+        The change is made in the current session, so it becomes visible to
+        other workers when the caller commits. The row is created by the
+        same statement, so concurrent first bumps cannot both insert it.
+        """
+        from app.models import CacheVersion
+
+        dialect = db.engine.dialect.name
+        if dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        elif dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            dialect_insert = None
+
+        if dialect_insert is not None:
+            db.session.execute(
+                dialect_insert(CacheVersion)
+                .values(name=self.name, version=1)
+                .on_conflict_do_update(
+                    index_elements=[CacheVersion.name],
+                    set_={'version': CacheVersion.version + 1}
+                )
+            )
+            return
+
+        # Other databases: update, or insert in a savepoint and update again
+        # if another worker inserted the row first
+        if self._update() == 0:
+            try:
+                with db.session.begin_nested():
+                    db.session.execute(insert(CacheVersion).values(name=self.name, version=1))
+            except IntegrityError:
+                self._update()
+
+    def _update(self):
+        from app.models import CacheVersion
+
+        return db.session.execute(
+            update(CacheVersion)
+            .where(CacheVersion.name == self.name)
+            .values(version=CacheVersion.version + 1)
+        ).rowcount
+
+class CatalogCache:
+    """Roadmap list and per-id lookups, refreshed when the version changes"""
+
+    def __init__(self):
+        self.counter = VersionCounter('catalog')
+        self._lock = threading.Lock()
+        self._version = None
+        self._roadmaps = []
+        self._by_id = {}
+        self._node_counts = {}
+
+    def current_version(self):
+        """Read the shared catalog version"""
+        return self.counter.current()
+
+    def bump(self):
+        """Mark the catalog as changed for every worker"""
+        self.counter.bump()
+        self.clear()
+
+    def clear(self):
+        """Drop the local copy so the next read reloads it"""
+        if has_request_context():
+            g.pop('catalog_checked', None)
+        with self._lock:
+            self._version = None
+            self._roadmaps = []
+            self._by_id = {}
+            self._node_counts = {}
+
+    def _load(self):
+        from app.models import Roadmap, RoadmapNode
+
+        rows = db.session.execute(
+            select(Roadmap.id, Roadmap.title, Roadmap.description,
+                   Roadmap.category, Roadmap.difficulty, Roadmap.tags)
+        ).all()
+        node_counts = db.session.execute(
+            select(RoadmapNode.roadmap_id, func.count(RoadmapNode.id))
+            .group_by(RoadmapNode.roadmap_id)
+        ).all()
+        return [CatalogEntry(*row) for row in rows], dict(node_counts)
+
+    def _ensure_fresh(self):
+        # The version only needs checking once per request
+        if has_request_context():
+            if g.get('catalog_checked') and self._version is not None:
+                return
+            g.catalog_checked = True
+
+        version = self.current_version()
+        if version == self._version:
+            return
+
+        roadmaps, node_counts = self._load()
+        with self._lock:
+            self._version = version
+            self._roadmaps = roadmaps
+            self._by_id = {roadmap.id: roadmap for roadmap in roadmaps}
+            self._node_counts = node_counts
+
+    def all(self):
+        """Return every roadmap in the catalog"""
+        self._ensure_fresh()
+        return list(self._roadmaps)
+
+    def get(self, roadmap_id):
+        """Return a single roadmap or None"""
+        self._ensure_fresh()
+        return self._by_id.get(roadmap_id)
+
+    def version(self):
+        """Return the catalog version the local copy was loaded at"""
+        self._ensure_fresh()
+        return self._version
+
+    def node_counts(self):
+        """Return a dict of roadmap ID -> number of nodes"""
+        self._ensure_fresh()
+        return dict(self._node_counts)
+
+    def get_or_404(self, roadmap_id):
+        """Return a single roadmap or abort with 404"""
+        roadmap = self.get(roadmap_id)
+        if roadmap is None:
+            abort(404)
+        return roadmap
+
+# Create a singleton instance
+catalog = CatalogCache()
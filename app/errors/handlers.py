@@ -1,4 +1,4 @@
-from flask import render_template
+from flask import render_template, make_response
 from app.errors import errors
 
 @errors.app_errorhandler(404)
@@ -12,3 +12,9 @@ def error_403(error):
 @errors.app_errorhandler(500)
 def error_500(error):
     return render_template('errors/500.html'), 500
+
+@errors.app_errorhandler(503)
+def error_503(error):
+    response = make_response(render_template('errors/503.html', message=error.description), 503)
+    response.headers['Retry-After'] = '5'
+    return response
@@ -57,7 +57,7 @@ class CommentForm(FlaskForm):
     submit = SubmitField('Post')
 
 class ResourceLinkForm(FlaskForm):
-    title = StringField('Title', validators=[DataRequired()])
+    title = StringField('Title', validators=[DataRequired(), Length(max=200)])
     url = StringField('URL', validators=[DataRequired(), URL()])
     type = SelectField('Type', choices=[
         ('article', 'Article'),
@@ -94,6 +94,9 @@ class CustomRoadmapForm(FlaskForm):
     is_public = BooleanField('Make this roadmap public', default=False)
     submit = SubmitField('Save Roadmap')
 
+class CloneRoadmapForm(CustomRoadmapForm):
+    copy_on_write = BooleanField('Keep topics linked to the original until I edit them', default=False)
+
 class CustomRoadmapNodeForm(FlaskForm):
     title = StringField('Title', validators=[DataRequired(), Length(min=3, max=100)])
     description = TextAreaField('Description', validators=[DataRequired()])
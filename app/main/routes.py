@@ -1,11 +1,12 @@
 from flask import render_template, request, Blueprint
-from app.models import Roadmap
+from app.catalog import catalog
+from app.search import search_index
 from app.main import main
 
 @main.route("/")
 @main.route("/home")
 def index():
-    roadmaps = Roadmap.query.all()
+    roadmaps = catalog.all()
     return render_template('main/index.html', roadmaps=roadmaps)
 
 @main.route("/about")
@@ -15,15 +16,23 @@ def about():
 @main.route("/search")
 def search():
     query = request.args.get('q', '')
+    roadmaps = []
+    matches = {}
     if query:
-        roadmaps = Roadmap.query.filter(
-            (Roadmap.title.contains(query)) |
-            (Roadmap.description.contains(query)) |
-            (Roadmap.tags.contains(query))
-        ).all()
-    else:
-        roadmaps = []
-    return render_template('main/search.html', title='Search', roadmaps=roadmaps, query=query)
+        # Group hits by roadmap, keeping the order of the best hit
+        for hit in search_index.search(query):
+            roadmap = catalog.get(hit.roadmap_id)
+            if roadmap is None:
+                continue
+            if roadmap.id not in matches:
+                roadmaps.append(roadmap)
+                matches[roadmap.id] = {'snippet': None, 'nodes': []}
+            if hit.node_id is None:
+                matches[roadmap.id]['snippet'] = hit.snippet
+            elif len(matches[roadmap.id]['nodes']) < 3:
+                matches[roadmap.id]['nodes'].append(hit)
+    return render_template('main/search.html', title='Search', roadmaps=roadmaps,
+                           matches=matches, query=query)
 
 @main.route("/admin-panel-314159")
 def secret_admin():
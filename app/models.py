@@ -1,8 +1,8 @@
 from datetime import datetime
 from flask_login import UserMixin
-from app import db, login_manager, bcrypt
+from app import db, login_manager
+from app.passwords import password_hasher
 from sqlalchemy.ext.hybrid import hybrid_property
-import json
 import uuid
 
 @login_manager.user_loader
@@ -13,7 +13,10 @@ def load_user(user_id):
         from app.appwrite.models import User as AppwriteUser
         return AppwriteUser.get(user_id)
     else:
-        return User.query.get(int(user_id))
+        # Identity fields come from the worker's cache while they match the
+        # session's fingerprint; see app.auth.user_cache
+        from app.auth import user_cache
+        return user_cache.load(int(user_id))
 
 class User(db.Model, UserMixin):
     id = db.Column(db.Integer, primary_key=True)
@@ -36,10 +39,19 @@ class User(db.Model, UserMixin):
 
     @password.setter
     def password(self, plain_text_password):
-        self._password = bcrypt.generate_password_hash(plain_text_password).decode('utf-8')
+        self._password = password_hasher.hash(plain_text_password)
 
     def check_password(self, attempted_password):
-        return bcrypt.check_password_hash(self._password, attempted_password)
+        """
+        Check a password, rehashing it if the configured cost has changed
+
+        A rehash only changes the object; the caller commits it.
+        """
+        if not password_hasher.check(self._password, attempted_password):
+            return False
+        if password_hasher.needs_rehash(self._password):
+            self.password = attempted_password
+        return True
 
     def __repr__(self):
         return f"User('{self.username}', '{self.email}')"
@@ -51,6 +63,7 @@ class Roadmap(db.Model):
     category = db.Column(db.String(50), nullable=False)
     difficulty = db.Column(db.String(50), nullable=False)
     tags = db.Column(db.String(200), nullable=True)
+    content_hash = db.Column(db.String(64), nullable=True)  # Set by app.roadmap.importer
 
     # Relationships
     nodes = db.relationship('RoadmapNode', backref='roadmap', lazy=True, cascade="all, delete-orphan")
@@ -65,19 +78,23 @@ class RoadmapNode(db.Model):
     roadmap_id = db.Column(db.String(50), db.ForeignKey('roadmap.id'), nullable=False)
     title = db.Column(db.String(100), nullable=False)
     description = db.Column(db.Text, nullable=False)
-    links = db.Column(db.Text, nullable=True)  # Stored as JSON
+    position = db.Column(db.Integer, nullable=False, default=0)  # Order in the source JSON file
+    content_hash = db.Column(db.String(64), nullable=True)  # Set by app.roadmap.importer
+
+    __table_args__ = (
+        # Roadmap pages and keyset pagination walk (position, id) within a roadmap
+        db.Index('ix_roadmap_node_roadmap_position', 'roadmap_id', 'position', 'id'),
+    )
 
     # Relationships
     progress = db.relationship('UserProgress', backref='node', lazy=True)
+    resource_links = db.relationship('NodeLink', lazy=True, order_by='NodeLink.position',
+                                     foreign_keys='NodeLink.node_id',
+                                     cascade='all, delete-orphan', passive_deletes=True)
 
     def get_links(self):
-        """Parse and return the links JSON as a Python list"""
-        if not self.links:
-            return []
-        try:
-            return json.loads(self.links)
-        except:
-            return []
+        """Return the node's links as a list of dicts"""
+        return [link.to_dict() for link in self.resource_links]
 
     def __repr__(self):
         return f"RoadmapNode('{self.id}', '{self.title}')"
@@ -90,9 +107,39 @@ class UserProgress(db.Model):
     completed = db.Column(db.Boolean, default=False)
     date_completed = db.Column(db.DateTime, nullable=True)
 
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'node_id', name='uq_user_progress_user_node'),
+        db.Index('ix_user_progress_user_roadmap', 'user_id', 'roadmap_id'),
+        db.Index('ix_user_progress_user_completed', 'user_id', 'completed', 'date_completed'),
+        # Imports and restores look up progress by node across all users
+        db.Index('ix_user_progress_node', 'node_id'),
+    )
+
     def __repr__(self):
         return f"UserProgress(User: {self.user_id}, Node: {self.node_id}, Completed: {self.completed})"
 
+class UserRoadmapStats(db.Model):
+    """Per-user, per-roadmap progress counters maintained by update_progress"""
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    roadmap_id = db.Column(db.String(50), db.ForeignKey('roadmap.id'), primary_key=True)
+    completed_count = db.Column(db.Integer, nullable=False, default=0)
+    total_nodes = db.Column(db.Integer, nullable=False, default=0)
+    last_activity = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        # Imports and restores update every user's counters of one roadmap
+        db.Index('ix_user_roadmap_stats_roadmap', 'roadmap_id'),
+    )
+
+    @property
+    def percentage(self):
+        if not self.total_nodes:
+            return 0
+        return int(self.completed_count / self.total_nodes * 100)
+
+    def __repr__(self):
+        return f"UserRoadmapStats(User: {self.user_id}, Roadmap: {self.roadmap_id}, {self.completed_count}/{self.total_nodes})"
+
 class Comment(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     content = db.Column(db.Text, nullable=False)
@@ -100,6 +147,10 @@ class Comment(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     roadmap_id = db.Column(db.String(50), db.ForeignKey('roadmap.id'), nullable=False)
 
+    __table_args__ = (
+        db.Index('ix_comment_roadmap_date', 'roadmap_id', 'date_posted'),
+    )
+
     def __repr__(self):
         return f"Comment('{self.content}', '{self.date_posted}')"
 
@@ -107,11 +158,16 @@ class RoadmapVersion(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     roadmap_id = db.Column(db.String(50), db.ForeignKey('roadmap.id'), nullable=False)
     version_number = db.Column(db.Integer, nullable=False)
-    data = db.Column(db.Text, nullable=False)  # JSON data of the roadmap and nodes
+    is_keyframe = db.Column(db.Boolean, nullable=False, default=True)
+    payload = db.Column(db.LargeBinary, nullable=False)  # Compressed snapshot or delta, see app.roadmap.version_store
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     created_by = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
     description = db.Column(db.String(200), nullable=True)
 
+    __table_args__ = (
+        db.UniqueConstraint('roadmap_id', 'version_number', name='uq_roadmap_version_roadmap_number'),
+    )
+
     # Relationships
     roadmap = db.relationship('Roadmap', backref='versions')
     creator = db.relationship('User', backref='created_versions')
@@ -119,6 +175,24 @@ class RoadmapVersion(db.Model):
     def __repr__(self):
         return f"RoadmapVersion('{self.roadmap_id}', v{self.version_number}, '{self.created_at}')"
 
+class RelatedRoadmap(db.Model):
+    """Precomputed top-k similar roadmaps, see app.roadmap.related"""
+    roadmap_id = db.Column(db.String(50), db.ForeignKey('roadmap.id'), primary_key=True)
+    rank = db.Column(db.Integer, primary_key=True)
+    related_id = db.Column(db.String(50), db.ForeignKey('roadmap.id'), nullable=False)
+    score = db.Column(db.Float, nullable=False)
+
+    def __repr__(self):
+        return f"RelatedRoadmap('{self.roadmap_id}', #{self.rank}: '{self.related_id}')"
+
+class CacheVersion(db.Model):
+    """Shared version counter used to invalidate per-worker caches"""
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"CacheVersion('{self.name}', {self.version})"
+
 class CustomRoadmap(db.Model):
     id = db.Column(db.String(50), primary_key=True, default=lambda: str(uuid.uuid4()))
     title = db.Column(db.String(100), nullable=False)
@@ -133,6 +207,11 @@ class CustomRoadmap(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     cloned_from = db.Column(db.String(50), db.ForeignKey('roadmap.id'), nullable=True)
 
+    __table_args__ = (
+        db.Index('ix_custom_roadmap_public_user', 'is_public', 'user_id'),
+        db.Index('ix_custom_roadmap_user', 'user_id'),
+    )
+
     # Relationships
     nodes = db.relationship('CustomRoadmapNode', backref='custom_roadmap', lazy=True, cascade="all, delete-orphan")
 
@@ -142,19 +221,96 @@ class CustomRoadmap(db.Model):
 class CustomRoadmapNode(db.Model):
     id = db.Column(db.String(50), primary_key=True, default=lambda: str(uuid.uuid4()))
     roadmap_id = db.Column(db.String(50), db.ForeignKey('custom_roadmap.id'), nullable=False)
-    title = db.Column(db.String(100), nullable=False)
-    description = db.Column(db.Text, nullable=False)
-    links = db.Column(db.Text, nullable=True)  # Stored as JSON
-    position = db.Column(db.Integer, nullable=False, default=0)  # For ordering nodes
+    # Content is NULL while a copy-on-write clone still reads through to source_node
+    _title = db.Column('title', db.String(100), nullable=True)
+    _description = db.Column('description', db.Text, nullable=True)
+    sort_key = db.Column(db.String(64), nullable=False, default='i')  # Fractional order key, see roadmap/ordering.py
+    source_node_id = db.Column(db.String(50), db.ForeignKey('roadmap_node.id', name='fk_custom_roadmap_node_source_node'),
+                               nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_custom_roadmap_node_roadmap_sort', 'roadmap_id', 'sort_key'),
+        db.Index('ix_custom_roadmap_node_source', 'source_node_id'),
+    )
+
+    # Relationships
+    source_node = db.relationship('RoadmapNode')
+    resource_links = db.relationship('NodeLink', lazy=True, order_by='NodeLink.position',
+                                     foreign_keys='NodeLink.custom_node_id',
+                                     cascade='all, delete-orphan', passive_deletes=True)
+
+    def is_linked(self):
+        """Whether the node still shows the content of its source node"""
+        return self._title is None and self.source_node is not None
+
+    def materialize(self):
+        """Copy the source node's content so later edits don't affect it"""
+        if self.is_linked():
+            self._title = self.source_node.title
+            self._description = self.source_node.description
+            self.resource_links = [link.copy() for link in self.source_node.resource_links]
+
+    @hybrid_property
+    def title(self):
+        return self.source_node.title if self.is_linked() else self._title
+
+    @title.setter
+    def title(self, value):
+        self.materialize()
+        self._title = value
+
+    @title.expression
+    def title(cls):
+        return cls._title
+
+    @hybrid_property
+    def description(self):
+        return self.source_node.description if self.is_linked() else self._description
+
+    @description.setter
+    def description(self, value):
+        self.materialize()
+        self._description = value
+
+    @description.expression
+    def description(cls):
+        return cls._description
 
     def get_links(self):
-        """Parse and return the links JSON as a Python list"""
-        if not self.links:
-            return []
-        try:
-            return json.loads(self.links)
-        except:
-            return []
+        """Return the node's links, or its source node's while linked"""
+        if self.is_linked():
+            return self.source_node.get_links()
+        return [link.to_dict() for link in self.resource_links]
+
+    def __repr__(self):
+        return f"CustomRoadmapNode('{self.id}', '{self.title}')"
+
+class NodeLink(db.Model):
+    """A resource link of a roadmap node or of a custom roadmap node"""
+    id = db.Column(db.Integer, primary_key=True)
+    # Exactly one of the owners is set
+    node_id = db.Column(db.String(50), db.ForeignKey('roadmap_node.id', ondelete='CASCADE'), nullable=True)
+    custom_node_id = db.Column(db.String(50), db.ForeignKey('custom_roadmap_node.id', ondelete='CASCADE'), nullable=True)
+    position = db.Column(db.Integer, nullable=False, default=0)  # Order within the node
+    title = db.Column(db.String(200), nullable=False, default='')
+    url = db.Column(db.Text, nullable=False)
+    type = db.Column(db.String(20), nullable=False, default='article')
+    domain = db.Column(db.String(255), nullable=False, default='')  # Lowercase host without www.
+
+    __table_args__ = (
+        db.Index('ix_node_link_node_position', 'node_id', 'position'),
+        db.Index('ix_node_link_custom_node_position', 'custom_node_id', 'position'),
+        db.Index('ix_node_link_type_node', 'type', 'node_id'),
+        db.Index('ix_node_link_domain', 'domain'),
+    )
+
+    def to_dict(self):
+        return {'title': self.title, 'url': self.url, 'type': self.type}
+
+    def copy(self):
+        """Return an unowned copy of the link"""
+        return NodeLink(position=self.position, title=self.title, url=self.url,
+                        type=self.type, domain=self.domain)
 
     def __repr__(self):
-        return f"CustomRoadmapNode('{self.id}', '{self.title}')"
\ No newline at end of file
+        return f"NodeLink('{self.url}', '{self.type}')"
@@ -0,0 +1,155 @@
+"""
+Password hashing off the request thread.
+
+bcrypt costs 100-300 ms of CPU per hash or check. PasswordHasher runs it
+in a small process pool shared by the threads of a worker, so a burst of
+logins or registrations is limited to PASSWORD_HASH_WORKERS cores and
+cannot starve the worker's other requests. At most PASSWORD_HASH_MAX_QUEUE
+calls wait or run at once; beyond that PasswordHasherBusy (a 503) is
+raised instead of queueing more CPU work, as it is when a call takes
+longer than PASSWORD_HASH_TIMEOUT seconds. PASSWORD_HASH_WORKERS=0 hashes
+in the calling thread.
+
+Hashes are compatible with Flask-Bcrypt and use its settings:
+BCRYPT_LOG_ROUNDS (the cost), BCRYPT_HASH_PREFIX and
+BCRYPT_HANDLE_LONG_PASSWORDS. needs_rehash tells whether a stored hash
+was made with another cost, so it can be replaced at the next login.
+"""
+
+import os
+import hmac
+import hashlib
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+import bcrypt
+from werkzeug.exceptions import ServiceUnavailable
+
+def _hash(password, rounds, prefix):
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds, prefix)).decode('utf-8')
+
+def _check(pw_hash, password):
+    return hmac.compare_digest(bcrypt.hashpw(password, pw_hash), pw_hash)
+
+class PasswordHasherBusy(ServiceUnavailable):
+    """Raised when too many hashes are already queued"""
+
+    description = 'Too many sign-ins are being processed right now. Please try again in a moment.'
+
+class PasswordHasher:
+    """bcrypt hashing and checking on a bounded process pool"""
+
+    def __init__(self):
+        self.rounds = 12
+        self.prefix = b'2b'
+        self.handle_long_passwords = False
+        self.workers = 2
+        self.timeout = 30
+        self._slots = threading.BoundedSemaphore(32)
+        self._executor = None
+        self._executor_pid = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.rounds = app.config.get('BCRYPT_LOG_ROUNDS', 12)
+        self.prefix = app.config.get('BCRYPT_HASH_PREFIX', '2b').encode('utf-8')
+        self.handle_long_passwords = app.config.get('BCRYPT_HANDLE_LONG_PASSWORDS', False)
+        self.workers = app.config.get('PASSWORD_HASH_WORKERS', 2)
+        self.timeout = app.config.get('PASSWORD_HASH_TIMEOUT', 30)
+        self._slots = threading.BoundedSemaphore(app.config.get('PASSWORD_HASH_MAX_QUEUE', 32))
+        self.close()
+
+    def close(self):
+        """Stop the pool; the next hash starts a new one"""
+        with self._lock:
+            if self._executor is not None and self._executor_pid == os.getpid():
+                self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _pool(self):
+        """Return this process's pool, starting it on first use and after a fork"""
+        if self._executor is None or self._executor_pid != os.getpid():
+            with self._lock:
+                if self._executor is None or self._executor_pid != os.getpid():
+                    # Forking a threaded worker can copy held locks into the
+                    # children, so they are started from a clean process
+                    methods = multiprocessing.get_all_start_methods()
+                    context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+                    self._executor_pid = os.getpid()
+        return self._executor
+
+    def _discard(self, executor):
+        """Shut down a broken pool; the next call starts a fresh one"""
+        with self._lock:
+            executor.shutdown(wait=False, cancel_futures=True)
+            if self._executor is executor:
+                self._executor = None
+
+    def _run(self, func, *args):
+        if not self.workers:
+            return func(*args)
+        # A broken pool (e.g. a worker killed by the OOM killer) is replaced
+        # and the call retried once; bcrypt never runs in the calling thread
+        for _ in range(2):
+            if not self._slots.acquire(blocking=False):
+                raise PasswordHasherBusy()
+            executor = self._pool()
+            release = True
+            try:
+                future = executor.submit(func, *args)
+                return future.result(timeout=self.timeout)
+            except FutureTimeoutError:
+                # The slot is freed when the work is done, not when the caller gives up
+                release = False
+                future.add_done_callback(lambda _: self._slots.release())
+                raise PasswordHasherBusy()
+            except BrokenProcessPool:
+                self._discard(executor)
+            finally:
+                if release:
+                    self._slots.release()
+        raise PasswordHasherBusy()
+
+    def _password_bytes(self, password):
+        password = password.encode('utf-8') if isinstance(password, str) else password
+        if self.handle_long_passwords:
+            password = hashlib.sha256(password).hexdigest().encode('utf-8')
+        return password
+
+    def hash(self, password):
+        """
+        Hash a password with the configured cost
+
+        Args:
+            password (str): The plain text password
+
+        Returns:
+            str: The bcrypt hash
+
+        Raises:
+            PasswordHasherBusy: When PASSWORD_HASH_MAX_QUEUE calls are pending
+        """
+        return self._run(_hash, self._password_bytes(password), self.rounds, self.prefix)
+
+    def check(self, pw_hash, password):
+        """
+        Check a password against a stored hash
+
+        Raises:
+            PasswordHasherBusy: When PASSWORD_HASH_MAX_QUEUE calls are pending
+        """
+        if not pw_hash:
+            return False
+        pw_hash = pw_hash.encode('utf-8') if isinstance(pw_hash, str) else pw_hash
+        return self._run(_check, pw_hash, self._password_bytes(password))
+
+    def needs_rehash(self, pw_hash):
+        """Return True if a hash was made with a different cost than configured"""
+        try:
+            return int(pw_hash.split('$')[2]) != self.rounds
+        except (AttributeError, IndexError, ValueError):
+            return True
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,180 @@
+"""
+Opt-in SQL profiling per request.
+
+With SQL_PROFILER enabled, every query run while handling a request is
+timed and fingerprinted (literals and IN lists replaced by ?). After the
+request the totals are sent in a Server-Timing header and written as one
+JSON log line; statements repeated at least SQL_PROFILER_REPEAT_THRESHOLD
+times are listed in the log line and logged as a warning, which is how
+N+1 query patterns show up.
+
+query_budget works without the setting and is meant for tests:
+
+    with query_budget(4):
+        client.get('/roadmap/backend')
+
+raises QueryBudgetExceeded if the block runs more than four queries.
+"""
+
+import re
+import json
+import time
+import logging
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from flask import g, request, has_app_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger('edgeroute.sql')
+
+# Repeated statements listed per request
+MAX_REPEATED = 5
+
+_LITERAL_RE = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_IN_LIST_RE = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_SPACE_RE = re.compile(r'\s+')
+
+def fingerprint(statement):
+    """Normalize a SQL statement so executions with different values match"""
+    statement = _LITERAL_RE.sub('?', statement)
+    statement = _IN_LIST_RE.sub('(?)', statement)
+    return _SPACE_RE.sub(' ', statement).strip()
+
+class QueryStats:
+    """Queries recorded for one request or one query_budget block"""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.statements = Counter()
+
+    def add(self, statement, seconds):
+        self.count += 1
+        self.seconds += seconds
+        self.statements[fingerprint(statement)] += 1
+
+    def repeated(self, threshold):
+        """Return (fingerprint, count) pairs seen at least threshold times"""
+        return [(statement, count) for statement, count in self.statements.most_common(MAX_REPEATED)
+                if count >= threshold]
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised by query_budget when a block runs too many queries"""
+
+# Active query_budget blocks of the current thread
+_budgets = threading.local()
+
+def _active_budgets():
+    if not hasattr(_budgets, 'stack'):
+        _budgets.stack = []
+    return _budgets.stack
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # Kept on the execution context, so a statement that fails and never
+    # reaches _after_cursor_execute leaves nothing behind
+    if context is not None:
+        context.query_started = time.perf_counter()
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, 'query_started', None)
+    if started is None:
+        return
+    seconds = time.perf_counter() - started
+
+    for stats in _active_budgets():
+        stats.add(statement, seconds)
+    if has_app_context():
+        stats = g.get('sql_stats')
+        if stats is not None:
+            stats.add(statement, seconds)
+
+_listening = False
+_listen_lock = threading.Lock()
+
+def _listen():
+    """Attach the cursor hooks to every engine, once per process"""
+    global _listening
+    with _listen_lock:
+        if not _listening:
+            event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+            _listening = True
+
+@contextmanager
+def query_budget(max_queries):
+    """
+    Fail if the block runs more than max_queries queries
+
+    Args:
+        max_queries (int): The number of queries allowed
+
+    Yields:
+        QueryStats: The queries recorded so far
+
+    Raises:
+        QueryBudgetExceeded: When the budget is exceeded, listing the most
+            repeated statements
+    """
+    _listen()
+    stats = QueryStats()
+    _active_budgets().append(stats)
+    try:
+        yield stats
+    finally:
+        _active_budgets().remove(stats)
+
+    if stats.count > max_queries:
+        lines = [f"{count}x {statement}" for statement, count in stats.statements.most_common(MAX_REPEATED)]
+        raise QueryBudgetExceeded(
+            f"{stats.count} queries, budget {max_queries}:\n" + '\n'.join(lines)
+        )
+
+class SQLProfiler:
+    """Flask extension reporting each request's queries"""
+
+    def init_app(self, app):
+        if not app.config.get('SQL_PROFILER'):
+            return
+        _listen()
+
+        if not logger.handlers and not logging.getLogger().handlers:
+            logger.addHandler(logging.StreamHandler())
+        if logger.level == logging.NOTSET:
+            logger.setLevel(logging.INFO)
+
+        threshold = app.config.get('SQL_PROFILER_REPEAT_THRESHOLD', 3)
+
+        @app.before_request
+        def start_sql_profile():
+            g.sql_stats = QueryStats()
+            g.sql_started = time.perf_counter()
+
+        @app.after_request
+        def report_sql_profile(response):
+            stats = g.pop('sql_stats', None)
+            if stats is None:
+                return response
+            total_ms = (time.perf_counter() - g.pop('sql_started')) * 1000
+            db_ms = stats.seconds * 1000
+            repeated = stats.repeated(threshold)
+
+            response.headers.add(
+                'Server-Timing', f'db;dur={db_ms:.1f};desc="{stats.count} queries", app;dur={total_ms:.1f}'
+            )
+
+            record = {
+                'method': request.method,
+                'path': request.path,
+                'endpoint': request.endpoint,
+                'status': response.status_code,
+                'queries': stats.count,
+                'db_ms': round(db_ms, 2),
+                'total_ms': round(total_ms, 2),
+                'repeated': [{'count': count, 'statement': statement} for statement, count in repeated]
+            }
+            logger.log(logging.WARNING if repeated else logging.INFO, json.dumps(record))
+            return response
+
+sql_profiler = SQLProfiler()
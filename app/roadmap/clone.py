@@ -0,0 +1,112 @@
+import uuid
+from sqlalchemy import select, update, insert, func, literal, literal_column, cast, String
+from app import db
+from app.models import RoadmapNode, CustomRoadmapNode
+from app.roadmap.ordering import initial_key_expression
+from app.roadmap.links import copy_source_links
+
+# SQLite has no UUID function; this builds a random version 4 UUID string
+SQLITE_UUID4 = (
+    "lower(hex(randomblob(4))) || '-' || lower(hex(randomblob(2))) || '-4' || "
+    "substr(lower(hex(randomblob(2))), 2) || '-' || "
+    "substr('89ab', 1 + (abs(random()) % 4), 1) || substr(lower(hex(randomblob(2))), 2) || '-' || "
+    "lower(hex(randomblob(6)))"
+)
+
+def _uuid_expression():
+    """Return a SQL expression generating a UUID per row, or None if unsupported"""
+    dialect = db.engine.dialect.name
+    if dialect == 'postgresql':
+        return cast(func.gen_random_uuid(), String)
+    if dialect == 'sqlite':
+        return literal_column(SQLITE_UUID4)
+    return None
+
+def clone_nodes(source_roadmap_id, custom_roadmap_id, copy_on_write=False):
+    """
+    Copy a roadmap's nodes into a custom roadmap inside the database
+
+    The nodes are copied with a single INSERT ... SELECT in import order,
+    and their links with a second one. With copy_on_write only the sort key
+    and a reference to the source node are stored; the content and links
+    are read from the source node until the user edits it (see
+    CustomRoadmapNode.materialize). The caller commits.
+
+    Args:
+        source_roadmap_id (str): The roadmap to clone
+        custom_roadmap_id (str): The custom roadmap receiving the nodes
+        copy_on_write (bool, optional): Reference the source nodes instead
+            of copying their content
+
+    Returns:
+        int: Number of nodes cloned
+    """
+    columns = ['id', 'roadmap_id', 'sort_key', 'source_node_id']
+    values = [
+        None,
+        literal(custom_roadmap_id),
+        initial_key_expression(func.row_number().over(order_by=(RoadmapNode.position, RoadmapNode.id)) - 1),
+        RoadmapNode.id
+    ]
+    if not copy_on_write:
+        columns += ['title', 'description']
+        values += [RoadmapNode.title, RoadmapNode.description]
+
+    node_table = CustomRoadmapNode.__table__
+    where = RoadmapNode.roadmap_id == source_roadmap_id
+
+    id_expression = _uuid_expression()
+    if id_expression is not None:
+        values[0] = id_expression
+        count = db.session.execute(
+            insert(node_table).from_select(columns, select(*values).where(where))
+        ).rowcount
+    else:
+        # No UUID function in this database: fetch the rows once and insert
+        # them with a precomputed batch of IDs
+        rows = db.session.execute(select(*values[1:]).where(where)).all()
+        db.session.execute(insert(node_table), [
+            dict(zip(columns, (str(uuid.uuid4()),) + tuple(row))) for row in rows
+        ])
+        count = len(rows)
+
+    if not copy_on_write:
+        copy_source_links(node_table.c.roadmap_id == custom_roadmap_id)
+    return count
+
+def detach_custom_nodes(node_ids):
+    """
+    Give copy-on-write clones their own copy of nodes about to be deleted
+
+    Copies the title, description and links of the source nodes into the
+    clones still reading through to them, then drops the references.
+
+    Args:
+        node_ids (list): IDs of RoadmapNode rows that will be deleted
+    """
+    if not node_ids:
+        return
+
+    node_table = CustomRoadmapNode.__table__
+    source = RoadmapNode.__table__
+
+    def source_value(column):
+        return (
+            select(source.c[column])
+            .where(source.c.id == node_table.c.source_node_id)
+            .scalar_subquery()
+        )
+
+    still_linked = (node_table.c.source_node_id.in_(node_ids), node_table.c.title.is_(None))
+    copy_source_links(*still_linked)
+    db.session.execute(
+        update(node_table)
+        .where(*still_linked)
+        .values(title=source_value('title'),
+                description=source_value('description'))
+    )
+    db.session.execute(
+        update(node_table)
+        .where(node_table.c.source_node_id.in_(node_ids))
+        .values(source_node_id=None)
+    )
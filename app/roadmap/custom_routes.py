@@ -1,10 +1,14 @@
 from flask import render_template, request, jsonify, flash, redirect, url_for, Blueprint, abort
 from flask_login import current_user, login_required
+from sqlalchemy import select
 from app import db
-from app.models import Roadmap, RoadmapNode, CustomRoadmap, CustomRoadmapNode
-from app.forms import CustomRoadmapForm, CustomRoadmapNodeForm, ResourceLinkForm
+from app.models import Roadmap, RoadmapNode, CustomRoadmap, CustomRoadmapNode, NodeLink
+from app.forms import CustomRoadmapForm, CloneRoadmapForm, CustomRoadmapNodeForm, ResourceLinkForm
 from app.roadmap import roadmap
-import json
+from app.roadmap.clone import clone_nodes
+from app.roadmap.ordering import append_key, apply_order, move_node
+from app.roadmap.links import CUSTOM_NODE_LINKS, delete_custom_node_links
+from app.roadmap.loader import link_domain
 import uuid
 
 @roadmap.route("/custom")
@@ -58,7 +62,7 @@ def clone_roadmap(roadmap_id):
     # Get the source roadmap
     source_roadmap = Roadmap.query.get_or_404(roadmap_id)
 
-    form = CustomRoadmapForm()
+    form = CloneRoadmapForm()
 
     if request.method == 'GET':
         # Pre-fill the form with the source roadmap data
@@ -83,19 +87,10 @@ def clone_roadmap(roadmap_id):
         )
 
         db.session.add(custom_roadmap)
+        db.session.flush()
 
-        # Clone the nodes
-        source_nodes = RoadmapNode.query.filter_by(roadmap_id=source_roadmap.id).all()
-        for i, node in enumerate(source_nodes):
-            custom_node = CustomRoadmapNode(
-                id=str(uuid.uuid4()),
-                roadmap_id=custom_roadmap.id,
-                title=node.title,
-                description=node.description,
-                links=node.links,
-                position=i
-            )
-            db.session.add(custom_node)
+        # Copy the nodes inside the database
+        clone_nodes(source_roadmap.id, custom_roadmap.id, copy_on_write=form.copy_on_write.data)
 
         db.session.commit()
 
@@ -116,8 +111,10 @@ def view_custom_roadmap(roadmap_id):
     if not custom_roadmap.is_public and (not current_user.is_authenticated or custom_roadmap.user_id != current_user.id):
         abort(403)
 
-    # Get all nodes ordered by position
-    nodes = CustomRoadmapNode.query.filter_by(roadmap_id=roadmap_id).order_by(CustomRoadmapNode.position).all()
+    # Get all nodes in order
+    nodes = CustomRoadmapNode.query.filter_by(roadmap_id=roadmap_id).options(
+        *CUSTOM_NODE_LINKS
+    ).order_by(CustomRoadmapNode.sort_key).all()
 
     return render_template('roadmap/custom/view.html',
                           title=custom_roadmap.title,
@@ -159,8 +156,10 @@ def edit_custom_roadmap(roadmap_id):
         flash('Your roadmap has been updated!', 'success')
         return redirect(url_for('roadmap.edit_custom_roadmap', roadmap_id=roadmap_id))
 
-    # Get all nodes ordered by position
-    nodes = CustomRoadmapNode.query.filter_by(roadmap_id=roadmap_id).order_by(CustomRoadmapNode.position).all()
+    # Get all nodes in order
+    nodes = CustomRoadmapNode.query.filter_by(roadmap_id=roadmap_id).options(
+        *CUSTOM_NODE_LINKS
+    ).order_by(CustomRoadmapNode.sort_key).all()
 
     return render_template('roadmap/custom/edit.html',
                           title=f'Edit {custom_roadmap.title}',
@@ -178,6 +177,7 @@ def delete_custom_roadmap(roadmap_id):
     if custom_roadmap.user_id != current_user.id:
         abort(403)
 
+    delete_custom_node_links(select(CustomRoadmapNode.id).where(CustomRoadmapNode.roadmap_id == roadmap_id))
     db.session.delete(custom_roadmap)
     db.session.commit()
 
@@ -197,16 +197,13 @@ def add_custom_roadmap_node(roadmap_id):
     form = CustomRoadmapNodeForm()
 
     if form.validate_on_submit():
-        # Get the highest position value
-        highest_position = db.session.query(db.func.max(CustomRoadmapNode.position)).filter_by(roadmap_id=roadmap_id).scalar() or -1
-
-        # Create new node
+        # Create new node after the last one
         node = CustomRoadmapNode(
             id=str(uuid.uuid4()),
             roadmap_id=roadmap_id,
             title=form.title.data,
             description=form.description.data,
-            position=highest_position + 1
+            sort_key=append_key(roadmap_id)
         )
 
         db.session.add(node)
@@ -237,11 +234,17 @@ def edit_custom_roadmap_node(roadmap_id, node_id):
 
     form = CustomRoadmapNodeForm()
 
+    # Index of the node in the roadmap
+    position = CustomRoadmapNode.query.filter(
+        CustomRoadmapNode.roadmap_id == roadmap_id,
+        CustomRoadmapNode.sort_key < node.sort_key
+    ).count()
+
     if request.method == 'GET':
         # Pre-fill the form with the node data
         form.title.data = node.title
         form.description.data = node.description
-        form.position.data = node.position
+        form.position.data = position
 
     if form.validate_on_submit():
         # Update the node
@@ -257,7 +260,8 @@ def edit_custom_roadmap_node(roadmap_id, node_id):
                           title='Edit Node',
                           form=form,
                           roadmap=custom_roadmap,
-                          node=node)
+                          node=node,
+                          position=position)
 
 @roadmap.route("/custom/<string:roadmap_id>/node/<string:node_id>/delete", methods=['POST'])
 @login_required
@@ -274,21 +278,9 @@ def delete_custom_roadmap_node(roadmap_id, node_id):
     if custom_roadmap.user_id != current_user.id:
         abort(403)
 
-    # Get the position of the deleted node
-    deleted_position = node.position
-
-    # Delete the node
+    # The other nodes keep their sort keys, so nothing is renumbered
+    delete_custom_node_links([node.id])
     db.session.delete(node)
-
-    # Update positions of remaining nodes
-    nodes_to_update = CustomRoadmapNode.query.filter(
-        CustomRoadmapNode.roadmap_id == roadmap_id,
-        CustomRoadmapNode.position > deleted_position
-    ).all()
-
-    for node in nodes_to_update:
-        node.position -= 1
-
     db.session.commit()
 
     flash('Node deleted successfully!', 'success')
@@ -312,18 +304,19 @@ def manage_node_links(roadmap_id, node_id):
     form = ResourceLinkForm()
 
     if form.validate_on_submit():
-        # Get existing links
-        links = node.get_links()
-
-        # Add new link
-        links.append({
-            'title': form.title.data,
-            'url': form.url.data,
-            'type': form.type.data
-        })
-
-        # Save links back to node
-        node.links = json.dumps(links)
+        # Give the node its own links before adding one
+        node.materialize()
+        last_position = db.session.query(db.func.max(NodeLink.position)).filter_by(custom_node_id=node.id).scalar()
+
+        # Add the new link after the existing ones
+        db.session.add(NodeLink(
+            custom_node_id=node.id,
+            position=0 if last_position is None else last_position + 1,
+            title=form.title.data,
+            url=form.url.data,
+            type=form.type.data,
+            domain=link_domain(form.url.data)
+        ))
         db.session.commit()
 
         flash('Resource link added successfully!', 'success')
@@ -354,18 +347,20 @@ def delete_node_link(roadmap_id, node_id, link_index):
     if custom_roadmap.user_id != current_user.id:
         abort(403)
 
-    # Get existing links
-    links = node.get_links()
+    # Give the node its own links before removing one
+    node.materialize()
 
-    # Check if the link index is valid
-    if link_index < 0 or link_index >= len(links):
+    # Find the link shown at this index
+    link = None
+    if link_index >= 0:
+        link = NodeLink.query.filter_by(custom_node_id=node.id).order_by(
+            NodeLink.position, NodeLink.id
+        ).offset(link_index).first()
+    if link is None:
         abort(404)
 
-    # Remove the link
-    links.pop(link_index)
-
-    # Save links back to node
-    node.links = json.dumps(links)
+    # Remove only that link
+    db.session.delete(link)
     db.session.commit()
 
     flash('Resource link deleted successfully!', 'success')
@@ -374,24 +369,32 @@ def delete_node_link(roadmap_id, node_id, link_index):
 @roadmap.route("/custom/<string:roadmap_id>/reorder", methods=['POST'])
 @login_required
 def reorder_nodes(roadmap_id):
-    """Reorder nodes in a custom roadmap"""
+    """
+    Reorder nodes in a custom roadmap
+
+    Accepts either a single move, {"node_id": ..., "previous_id": ...}
+    (previous_id null moves the node to the start), which updates one row,
+    or the full order, {"nodes": [...]}, applied with one UPDATE statement.
+    """
     custom_roadmap = CustomRoadmap.query.get_or_404(roadmap_id)
 
     # Check if the user has permission to edit this roadmap
     if custom_roadmap.user_id != current_user.id:
         return jsonify({'success': False, 'message': 'Permission denied'}), 403
 
-    # Get the new order from the request
     try:
-        new_order = request.json.get('nodes', [])
+        data = request.json
 
-        # Update positions
-        for position, node_id in enumerate(new_order):
-            node = CustomRoadmapNode.query.get(node_id)
-            if node and node.roadmap_id == roadmap_id:
-                node.position = position
+        if 'node_id' in data:
+            move_node(roadmap_id, data['node_id'], data.get('previous_id'))
+        else:
+            apply_order(roadmap_id, data.get('nodes', []))
 
         db.session.commit()
         return jsonify({'success': True})
+    except LookupError:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': 'Node not found'}), 404
     except Exception as e:
+        db.session.rollback()
         return jsonify({'success': False, 'message': str(e)}), 400
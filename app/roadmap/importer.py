@@ -0,0 +1,342 @@
+"""
+Bulk, idempotent import of the roadmap JSON files.
+
+Every roadmap and node carries a SHA-256 hash of its content. An import
+reads the parsed files as the loader yields them (see app.roadmap.loader),
+compares the hashes with the stored ones and only writes what changed,
+with executemany core insert/update/delete statements in one transaction
+per roadmap, while the remaining files are still being parsed. The links
+of a changed node are replaced as a whole. Importing unchanged files
+writes nothing.
+
+Node IDs are global, but a few appear in more than one file. A node belongs
+to the roadmap that already stores it if that roadmap still lists it, and
+otherwise to the first roadmap in roadmaps.json that lists it; the other
+copies are skipped and counted as conflicts. When that depends on a file
+that has not been read yet, the node waits, and it is written, like nodes
+dropped from their roadmap's file, in a final pass once every file has
+been read.
+"""
+
+import time
+from sqlalchemy import select, delete, bindparam
+from app import db
+from app.models import Roadmap, RoadmapNode, UserProgress
+from app.catalog import catalog
+from app.search import search_index
+from app.roadmap.related import rebuild_related_roadmaps
+from app.roadmap.clone import detach_custom_nodes
+from app.roadmap.links import insert_node_links, delete_node_links
+from app.roadmap.progress import refresh_roadmap_totals, rebuild_user_roadmap_stats
+from app.roadmap.loader import iter_roadmap_records, NODE_COLUMNS
+
+class ImportReport:
+    """Counts and timings of one import run"""
+
+    def __init__(self):
+        self.roadmaps_created = 0
+        self.roadmaps_updated = 0
+        self.roadmaps_unchanged = 0
+        self.nodes_inserted = 0
+        self.nodes_updated = 0
+        self.nodes_deleted = 0
+        self.nodes_unchanged = 0
+        self.conflicts = 0
+        self.missing_files = []
+        self.errors = {}
+        self.parse_seconds = 0.0
+        self.write_seconds = 0.0
+
+    @property
+    def changed(self):
+        return self.roadmaps_created + self.roadmaps_updated
+
+    def summary(self):
+        """Return a one-line description of the run"""
+        text = (
+            f"{self.roadmaps_created} roadmaps created, {self.roadmaps_updated} updated, "
+            f"{self.roadmaps_unchanged} unchanged; nodes {self.nodes_inserted} inserted, "
+            f"{self.nodes_updated} updated, {self.nodes_deleted} deleted, "
+            f"{self.nodes_unchanged} unchanged"
+        )
+        if self.conflicts:
+            text += f", {self.conflicts} duplicate IDs skipped"
+        if self.errors:
+            text += f"; {len(self.errors)} roadmaps failed"
+        return text + f" (parse {self.parse_seconds:.2f}s, write {self.write_seconds:.2f}s)"
+
+def _columns(node, **extra):
+    """The roadmap_node columns of a parsed node"""
+    return dict({column: node[column] for column in NODE_COLUMNS}, **extra)
+
+def _affected_users(node_ids):
+    return set(db.session.execute(
+        select(UserProgress.user_id).where(UserProgress.node_id.in_(node_ids)).distinct()
+    ).scalars())
+
+def _timed(records, report):
+    """Yield the records, adding the time spent waiting for them to parse_seconds"""
+    records = iter(records)
+    while True:
+        started = time.perf_counter()
+        try:
+            record = next(records)
+        except StopIteration:
+            return
+        finally:
+            report.parse_seconds += time.perf_counter() - started
+        yield record
+
+class _RoadmapSync:
+    """Stored state and pending work of one sync_roadmaps run"""
+
+    def __init__(self, report):
+        self.report = report
+        self.stored_roadmaps = {
+            row.id: row.content_hash
+            for row in db.session.execute(select(Roadmap.id, Roadmap.content_hash))
+        }
+        self.stored_nodes = {
+            row.id: row
+            for row in db.session.execute(
+                select(RoadmapNode.id, RoadmapNode.roadmap_id, RoadmapNode.content_hash)
+            )
+        }
+        self.stored_by_roadmap = {}
+        for node in self.stored_nodes.values():
+            self.stored_by_roadmap.setdefault(node.roadmap_id, set()).add(node.id)
+
+        # Roadmap ID -> IDs of the nodes its file lists, for the files read so far
+        self.listed = {}
+        # Node ID -> ID of the roadmap it belongs to
+        self.claimed = {}
+        # Node ID -> (roadmap ID, node) copies listed before the file of the
+        # roadmap storing the node was read, in file order
+        self.waiting = {}
+        # Roadmap ID -> nodes it took over after its own transaction
+        self.late = {}
+        # Roadmap ID -> stored node IDs its file no longer lists
+        self.orphans = {}
+        self.unchanged = set()
+
+        node_table = RoadmapNode.__table__
+        self.update_roadmap = Roadmap.__table__.update().where(Roadmap.__table__.c.id == bindparam('_id'))
+        self.update_node = node_table.update().where(node_table.c.id == bindparam('_id'))
+
+        self.changed_ids = []
+        self.metadata_changed_ids = []
+        self.totals_changed_ids = set()
+        self.affected_users = set()
+
+    def _owner(self, roadmap_id, node):
+        """Return whether roadmap_id owns the node, or None while that is unknown"""
+        node_id = node['id']
+        stored = self.stored_nodes.get(node_id)
+        if stored is not None and stored.roadmap_id == roadmap_id:
+            self.claimed[node_id] = roadmap_id
+            return True
+        if node_id in self.claimed:
+            self.report.conflicts += 1
+            return False
+        if stored is not None and stored.roadmap_id not in self.listed:
+            # Depends on whether the stored roadmap still lists it
+            self.waiting.setdefault(node_id, []).append((roadmap_id, node))
+            return None
+        self.claimed[node_id] = roadmap_id
+        return True
+
+    def _settle(self, node_id):
+        """Give a waiting node to its stored roadmap or to its first other listing"""
+        copies = self.waiting.pop(node_id)
+        stored_roadmap = self.stored_nodes[node_id].roadmap_id
+        if node_id in self.listed.get(stored_roadmap, ()):
+            self.claimed[node_id] = stored_roadmap
+            self.report.conflicts += len(copies)
+            return
+        (owner, node), rest = copies[0], copies[1:]
+        self.claimed[node_id] = owner
+        self.late.setdefault(owner, []).append(node)
+        self.report.conflicts += len(rest)
+
+    def _write_nodes(self, roadmap_id, inserts=(), updates=(), deletes=()):
+        """Write one roadmap's node changes in the current transaction; return the moved IDs"""
+        node_table = RoadmapNode.__table__
+        moved = [node['id'] for node in updates
+                 if self.stored_nodes[node['id']].roadmap_id != roadmap_id]
+
+        if inserts:
+            db.session.execute(node_table.insert(), [_columns(node) for node in inserts])
+        if updates:
+            db.session.execute(self.update_node, [_columns(node, _id=node['id']) for node in updates])
+            delete_node_links([node['id'] for node in updates])
+        if inserts or updates:
+            insert_node_links({node['id']: node['link_rows'] for node in list(inserts) + list(updates)})
+        if moved:
+            self.affected_users |= _affected_users(moved)
+            db.session.execute(
+                UserProgress.__table__.update()
+                .where(UserProgress.node_id.in_(moved))
+                .values(roadmap_id=roadmap_id)
+            )
+        if deletes:
+            self.affected_users |= _affected_users(deletes)
+            db.session.execute(delete(UserProgress).where(UserProgress.node_id.in_(deletes)))
+            detach_custom_nodes(deletes)
+            delete_node_links(deletes)
+            db.session.execute(delete(RoadmapNode).where(RoadmapNode.id.in_(deletes)))
+        return moved
+
+    def _changed(self, roadmap_id, moved, totals_changed):
+        moved_from = {self.stored_nodes[node_id].roadmap_id for node_id in moved}
+        # The roadmaps that moved nodes came from have lost them, even when
+        # their own files are unchanged
+        self.changed_ids.extend([roadmap_id, *moved_from])
+        self.metadata_changed_ids.extend(moved_from)
+        if totals_changed or moved:
+            self.totals_changed_ids.add(roadmap_id)
+        self.totals_changed_ids |= moved_from
+
+    def add(self, roadmap):
+        """Write the changes of one parsed roadmap that don't wait on other files"""
+        report = self.report
+        if roadmap.nodes is None:
+            report.missing_files.append(roadmap.id)
+
+        self.listed[roadmap.id] = {node['id'] for node in roadmap.nodes or []}
+        for node_id in self.stored_by_roadmap.get(roadmap.id, ()):
+            if node_id in self.waiting:
+                self._settle(node_id)
+
+        inserts, updates = [], []
+        for node in roadmap.nodes or []:
+            if not self._owner(roadmap.id, node):
+                continue
+            stored = self.stored_nodes.get(node['id'])
+            if stored is None:
+                inserts.append(node)
+            elif stored.content_hash != node['content_hash']:
+                updates.append(node)
+            else:
+                report.nodes_unchanged += 1
+
+        # Nodes removed from the file are deleted in the final pass, unless
+        # a later file lists them
+        if roadmap.nodes is not None:
+            orphans = self.stored_by_roadmap.get(roadmap.id, set()) - self.listed[roadmap.id]
+            if orphans:
+                self.orphans[roadmap.id] = orphans
+
+        is_new = roadmap.id not in self.stored_roadmaps
+        roadmap_changed = self.stored_roadmaps.get(roadmap.id) != roadmap.row['content_hash']
+        if not (is_new or roadmap_changed or inserts or updates):
+            self.unchanged.add(roadmap.id)
+            report.roadmaps_unchanged += 1
+            return
+
+        try:
+            if is_new:
+                db.session.execute(Roadmap.__table__.insert(), [roadmap.row])
+            elif roadmap_changed:
+                db.session.execute(self.update_roadmap, [dict(roadmap.row, _id=roadmap.id)])
+            moved = self._write_nodes(roadmap.id, inserts, updates)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            report.errors[roadmap.id] = str(e)
+            # Nothing of this roadmap is settled later either
+            self.orphans.pop(roadmap.id, None)
+            self.late.pop(roadmap.id, None)
+            return
+
+        if is_new:
+            report.roadmaps_created += 1
+        else:
+            report.roadmaps_updated += 1
+        report.nodes_inserted += len(inserts)
+        report.nodes_updated += len(updates)
+
+        if is_new or roadmap_changed:
+            self.metadata_changed_ids.append(roadmap.id)
+        self._changed(roadmap.id, moved, bool(inserts))
+
+    def finish(self):
+        """Write the nodes that waited for every file to be read"""
+        report = self.report
+        for node_id in list(self.waiting):
+            self._settle(node_id)
+
+        for roadmap_id in list(dict.fromkeys([*self.late, *self.orphans])):
+            if roadmap_id in report.errors:
+                continue
+            updates = self.late.get(roadmap_id, [])
+            deletes = [node_id for node_id in self.orphans.get(roadmap_id, ())
+                       if node_id not in self.claimed]
+            if not (updates or deletes):
+                continue
+
+            try:
+                moved = self._write_nodes(roadmap_id, updates=updates, deletes=deletes)
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                report.errors[roadmap_id] = str(e)
+                continue
+
+            if roadmap_id in self.unchanged:
+                self.unchanged.discard(roadmap_id)
+                report.roadmaps_unchanged -= 1
+                report.roadmaps_updated += 1
+            report.nodes_updated += len(updates)
+            report.nodes_deleted += len(deletes)
+            self._changed(roadmap_id, moved, bool(deletes))
+
+    def refresh(self):
+        """Let every worker reload the catalog, and index the new content"""
+        if self.changed_ids:
+            catalog.bump()
+            search_index.index_roadmaps(dict.fromkeys(self.changed_ids))
+            rebuild_related_roadmaps(list(dict.fromkeys(self.metadata_changed_ids)))
+            for roadmap_id in self.totals_changed_ids:
+                refresh_roadmap_totals(roadmap_id)
+            db.session.commit()
+
+        if self.affected_users:
+            rebuild_user_roadmap_stats(list(self.affected_users))
+
+def sync_roadmaps(data_dir=None, parsed=None, workers=None):
+    """
+    Bring the roadmap tables in line with the JSON files
+
+    Each roadmap is written in its own transaction as soon as it has been
+    parsed. Afterwards the catalog, search index, related roadmaps and
+    progress counters are refreshed for the roadmaps that changed, also
+    when a file turns out to be malformed part way through.
+
+    Args:
+        data_dir (str, optional): Directory holding the JSON files
+        parsed (iterable, optional): Already parsed roadmaps, see app.roadmap.loader
+        workers (int, optional): Parser processes, see iter_roadmap_records
+
+    Returns:
+        ImportReport: What was written and how long it took; parse_seconds
+            is the time spent waiting for the parser
+
+    Raises:
+        RoadmapDataError: If a file is malformed; the roadmaps before it
+            are imported, and no node is deleted or moved by the final pass
+    """
+    report = ImportReport()
+    started = time.perf_counter()
+    if parsed is None:
+        parsed = iter_roadmap_records(data_dir, workers)
+
+    sync = _RoadmapSync(report)
+    try:
+        for roadmap in _timed(parsed, report):
+            sync.add(roadmap)
+        sync.finish()
+    finally:
+        sync.refresh()
+        report.write_seconds = time.perf_counter() - started - report.parse_seconds
+
+    return report
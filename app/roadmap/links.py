@@ -0,0 +1,143 @@
+"""
+Resource links of roadmap nodes and custom roadmap nodes.
+
+Links are stored one per row in the node_link table, so adding or removing a
+link writes a single row, a page of nodes loads all of its links with one
+extra query (NODE_LINKS / CUSTOM_NODE_LINKS), and lookups by type or domain
+use indexes instead of parsing JSON.
+"""
+
+from sqlalchemy import select, insert, delete
+from sqlalchemy.orm import selectinload, joinedload
+from sqlalchemy.orm.attributes import set_committed_value
+from app import db
+from app.models import RoadmapNode, CustomRoadmapNode, NodeLink
+from app.roadmap.loader import link_domain
+
+# Query options loading the links of every node in a result with one query
+NODE_LINKS = selectinload(RoadmapNode.resource_links)
+CUSTOM_NODE_LINKS = (
+    selectinload(CustomRoadmapNode.resource_links),
+    joinedload(CustomRoadmapNode.source_node).selectinload(RoadmapNode.resource_links)
+)
+
+LINK_COLUMNS = ('position', 'title', 'url', 'type', 'domain')
+
+def load_links(nodes):
+    """
+    Load the links of already fetched roadmap nodes with one query
+
+    Useful when only part of a query result is displayed, e.g. the first
+    page of a roadmap whose full node list feeds the table of contents.
+
+    Args:
+        nodes (list): RoadmapNode objects
+
+    Returns:
+        list: The same nodes, with resource_links populated
+    """
+    by_node = {node.id: [] for node in nodes}
+    if by_node:
+        links = NodeLink.query.filter(NodeLink.node_id.in_(list(by_node))).order_by(
+            NodeLink.node_id, NodeLink.position
+        )
+        for link in links:
+            by_node[link.node_id].append(link)
+    for node in nodes:
+        set_committed_value(node, 'resource_links', by_node[node.id])
+    return nodes
+
+def insert_node_links(links_by_node):
+    """
+    Insert the links of roadmap nodes with one executemany statement
+
+    Args:
+        links_by_node (dict): Node ID -> rows from loader.link_rows
+    """
+    rows = [
+        dict(row, node_id=node_id)
+        for node_id, node_rows in links_by_node.items()
+        for row in node_rows
+    ]
+    if rows:
+        db.session.execute(insert(NodeLink.__table__), rows)
+
+def delete_node_links(node_ids):
+    """Delete the links of the given roadmap nodes"""
+    if node_ids:
+        db.session.execute(delete(NodeLink.__table__).where(NodeLink.node_id.in_(node_ids)))
+
+def delete_custom_node_links(custom_node_ids):
+    """
+    Delete the links of custom roadmap nodes
+
+    Args:
+        custom_node_ids: A list of IDs or a select of custom_roadmap_node.id
+    """
+    db.session.execute(
+        delete(NodeLink.__table__).where(NodeLink.custom_node_id.in_(custom_node_ids))
+    )
+
+def copy_source_links(*criteria):
+    """
+    Copy the links of source nodes to the custom nodes cloned from them
+
+    Runs a single INSERT ... SELECT joining custom_roadmap_node to the
+    source node's links.
+
+    Args:
+        *criteria: Conditions selecting the custom_roadmap_node rows
+    """
+    custom_nodes = CustomRoadmapNode.__table__
+    links = NodeLink.__table__
+    source_links = (
+        select(custom_nodes.c.id, *[links.c[column] for column in LINK_COLUMNS])
+        .join(links, links.c.node_id == custom_nodes.c.source_node_id)
+        .where(*criteria)
+    )
+    db.session.execute(
+        insert(links).from_select(('custom_node_id',) + LINK_COLUMNS, source_links)
+    )
+
+def links_of_type(roadmap_id, link_type):
+    """
+    Return every link of one type across a roadmap, in node order
+
+    Args:
+        roadmap_id (str): The roadmap
+        link_type (str): e.g. 'video' or 'article'
+
+    Returns:
+        list: Dicts with the link and the node it belongs to
+    """
+    rows = db.session.execute(
+        select(NodeLink.title, NodeLink.url, NodeLink.type, RoadmapNode.id, RoadmapNode.title.label('node_title'))
+        .join(RoadmapNode, RoadmapNode.id == NodeLink.node_id)
+        .where(RoadmapNode.roadmap_id == roadmap_id, NodeLink.type == link_type)
+        .order_by(RoadmapNode.position, RoadmapNode.id, NodeLink.position)
+    )
+    return [
+        {'node_id': row.id, 'node_title': row.node_title,
+         'title': row.title, 'url': row.url, 'type': row.type}
+        for row in rows
+    ]
+
+def nodes_linking_to(domain, roadmap_id=None):
+    """
+    Return the roadmap nodes with a link to a domain
+
+    Args:
+        domain (str): A host such as 'youtube.com' or a URL; a leading www.
+            is ignored and subdomains must be given explicitly
+        roadmap_id (str, optional): Only search this roadmap
+
+    Returns:
+        list: RoadmapNode objects ordered by roadmap and position
+    """
+    host = link_domain(domain if '//' in domain else f'//{domain}')
+    linking = select(NodeLink.node_id).where(NodeLink.domain == host, NodeLink.node_id.is_not(None))
+
+    query = RoadmapNode.query.filter(RoadmapNode.id.in_(linking))
+    if roadmap_id is not None:
+        query = query.filter(RoadmapNode.roadmap_id == roadmap_id)
+    return query.order_by(RoadmapNode.roadmap_id, RoadmapNode.position, RoadmapNode.id).all()
@@ -0,0 +1,247 @@
+"""
+Parallel loading of the roadmap_data JSON files.
+
+Each roadmap file is read, validated and normalized into table rows (with
+content hashes and node_link rows) in a process pool, and the results are yielded in
+roadmaps.json order as they become ready so writers can start on the first
+roadmap while later files are still being parsed. orjson is used when it is
+installed. This module only depends on the standard library so worker
+processes start quickly.
+"""
+
+import os
+import json
+import hashlib
+from urllib.parse import urlsplit
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+ParsedRoadmap = namedtuple('ParsedRoadmap', ['id', 'row', 'nodes'])
+
+ROADMAP_FIELDS = ('title', 'description', 'category', 'difficulty', 'tags')
+NODE_FIELDS = ('roadmap_id', 'title', 'description', 'links', 'position')
+# Columns of roadmap_node; the links are stored in node_link
+NODE_COLUMNS = ('id', 'roadmap_id', 'title', 'description', 'position', 'content_hash')
+
+class RoadmapDataError(ValueError):
+    """Raised when a roadmap file does not match the expected schema"""
+
+def default_data_dir():
+    """Return the roadmap_data directory at the root of the project"""
+    return os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'roadmap_data')
+
+def default_workers(file_count):
+    """Return the pool size used when no worker count is given"""
+    return max(1, min(os.cpu_count() or 1, file_count))
+
+def read_json(path):
+    """Parse a JSON file, with orjson when available"""
+    if orjson is not None:
+        with open(path, 'rb') as f:
+            return orjson.loads(f.read())
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def hash_content(row, fields):
+    """
+    Hash the given fields of a row
+
+    Args:
+        row (dict): Column values
+        fields (tuple): Names of the columns that make up the content
+
+    Returns:
+        str: Hex SHA-256 digest
+    """
+    canonical = json.dumps([row[field] for field in fields], ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+def link_domain(url):
+    """Return the lowercase host of a URL without a leading www."""
+    try:
+        host = (urlsplit(url).hostname or '').lower()
+    except ValueError:
+        return ''
+    return host[4:] if host.startswith('www.') else host
+
+def link_rows(links):
+    """
+    Turn a node's list of links into node_link rows without the owner column
+
+    Args:
+        links (list): Link dicts with title, url and type
+
+    Returns:
+        list: Rows with position, title, url, type and domain
+    """
+    return [
+        {
+            'position': position,
+            'title': link.get('title') or '',
+            'url': link['url'],
+            'type': link.get('type') or 'article',
+            'domain': link_domain(link['url'])
+        }
+        for position, link in enumerate(links)
+    ]
+
+def node_row(roadmap_id, node_id, title, description, links, position):
+    """
+    Build a roadmap_node row with its content hash
+
+    The links are hashed in the form NodeLink.to_dict returns them, so a
+    node rebuilt from the database, e.g. from a version snapshot, hashes
+    the same as the file it was imported from.
+
+    Args:
+        roadmap_id (str): The roadmap the node belongs to
+        node_id (str): The ID of the node
+        title (str): The node's title
+        description (str): The node's description
+        links (list): Link dicts with title, url and type
+        position (int): The node's position in the roadmap
+
+    Returns:
+        dict: The NODE_COLUMNS, the links as JSON and the node_link rows
+            under 'link_rows'
+    """
+    rows = link_rows(links)
+    node = {
+        'id': node_id,
+        'roadmap_id': roadmap_id,
+        'title': title,
+        'description': description,
+        'links': json.dumps([{'title': row['title'], 'url': row['url'], 'type': row['type']} for row in rows]),
+        'position': position
+    }
+    node['content_hash'] = hash_content(node, NODE_FIELDS)
+    node['link_rows'] = rows
+    return node
+
+def _require_text(value, what):
+    if not isinstance(value, str) or not value.strip():
+        raise RoadmapDataError(f"{what} must be a non-empty string")
+    return value
+
+def validate_node(roadmap_id, node_id, node_data):
+    """
+    Check one node from a roadmap file
+
+    Args:
+        roadmap_id (str): The roadmap the node was read from
+        node_id (str): The key of the node in the file
+        node_data (dict): The node's data
+
+    Returns:
+        list: The node's links
+
+    Raises:
+        RoadmapDataError: If a required field is missing or malformed
+    """
+    where = f"{roadmap_id}.json node {node_id!r}"
+    if not isinstance(node_data, dict):
+        raise RoadmapDataError(f"{where} must be an object")
+    _require_text(node_data.get('title'), f"{where} title")
+    if not isinstance(node_data.get('description'), str):
+        raise RoadmapDataError(f"{where} description must be a string")
+
+    links = node_data.get('links', [])
+    if not isinstance(links, list):
+        raise RoadmapDataError(f"{where} links must be a list")
+    for link in links:
+        if not isinstance(link, dict) or not isinstance(link.get('url'), str):
+            raise RoadmapDataError(f"{where} has a link without a url")
+    return links
+
+def parse_roadmap(roadmap_info, nodes_data):
+    """
+    Turn the JSON for one roadmap into table rows with content hashes
+
+    Args:
+        roadmap_info (dict): The roadmap's entry in roadmaps.json
+        nodes_data (dict): Node ID -> node data from the roadmap's own file,
+            or None if the file is missing
+
+    Returns:
+        ParsedRoadmap: The roadmap row and its node rows in file order; each
+            node also carries its node_link rows under 'link_rows'
+
+    Raises:
+        RoadmapDataError: If the roadmap or one of its nodes is malformed
+    """
+    roadmap_id = _require_text(roadmap_info.get('id'), "roadmaps.json entry id")
+    for field in ('title', 'description', 'category', 'difficulty'):
+        _require_text(roadmap_info.get(field), f"roadmaps.json {roadmap_id!r} {field}")
+
+    row = {
+        'id': roadmap_id,
+        'title': roadmap_info['title'],
+        'description': roadmap_info['description'],
+        'category': roadmap_info['category'],
+        'difficulty': roadmap_info['difficulty'],
+        'tags': ','.join(roadmap_info['tags']) if 'tags' in roadmap_info else ''
+    }
+
+    nodes = None
+    if nodes_data is not None:
+        if not isinstance(nodes_data, dict):
+            raise RoadmapDataError(f"{roadmap_id}.json must map node IDs to nodes")
+        nodes = []
+        for position, (node_id, node_data) in enumerate(nodes_data.items()):
+            links = validate_node(roadmap_id, node_id, node_data)
+            nodes.append(node_row(roadmap_id, node_id, node_data['title'], node_data['description'],
+                                  links, position))
+
+    # The roadmap hash covers its own fields and the hashes of its nodes
+    row['content_hash'] = hash_content(
+        dict(row, nodes=[node['content_hash'] for node in nodes] if nodes is not None else None),
+        ROADMAP_FIELDS + ('nodes',)
+    )
+    return ParsedRoadmap(roadmap_id, row, nodes)
+
+def _load_one(task):
+    """Read and parse one roadmap file; runs in a worker process"""
+    roadmap_info, path = task
+    nodes_data = read_json(path) if os.path.exists(path) else None
+    return parse_roadmap(roadmap_info, nodes_data)
+
+def iter_roadmap_records(data_dir=None, workers=None):
+    """
+    Yield every roadmap listed in roadmaps.json, parsed and validated
+
+    Args:
+        data_dir (str, optional): Directory holding the JSON files
+        workers (int, optional): Number of worker processes; 1 parses in
+            this process. Defaults to one per CPU, at most one per file.
+
+    Yields:
+        ParsedRoadmap: Roadmaps in roadmaps.json order
+
+    Raises:
+        RoadmapDataError: If any file is malformed
+    """
+    data_dir = data_dir or default_data_dir()
+    index = read_json(os.path.join(data_dir, 'roadmaps.json'))
+    tasks = [
+        (roadmap_info, os.path.join(data_dir, f"{roadmap_info.get('id')}.json"))
+        for roadmap_info in index['roadmaps']
+    ]
+
+    if workers is None:
+        workers = default_workers(len(tasks))
+    if workers <= 1 or len(tasks) <= 1:
+        for task in tasks:
+            yield _load_one(task)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        yield from pool.map(_load_one, tasks)
+
+def load_roadmap_records(data_dir=None, workers=None):
+    """Return every roadmap from iter_roadmap_records as a list"""
+    return list(iter_roadmap_records(data_dir, workers))
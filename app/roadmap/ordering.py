@@ -0,0 +1,216 @@
+"""
+Ordering keys for custom roadmap nodes.
+
+Nodes are ordered by a string sort_key compared as a fraction in base 36,
+so a node can always be given a key between two neighbours and moving it
+only updates its own row. Keys use lowercase base-36 digits only, which
+sort the same way under any database collation, and never end in '0' so
+there is always room before them.
+
+New nodes get the next evenly spaced key, so only repeated moves into the
+same gap make keys longer; rebalance_roadmap gives a roadmap evenly spaced
+keys again with a single UPDATE ... CASE, and rebalance_long_keys runs it
+for every roadmap that needs it.
+"""
+
+from sqlalchemy import select, update, func, case, cast, literal, String
+from app import db
+from app.models import CustomRoadmapNode
+
+DIGITS = '0123456789abcdefghijklmnopqrstuvwxyz'
+BASE = len(DIGITS)
+
+# Width of the zero-padded index used for fresh keys
+KEY_WIDTH = 6
+
+# Keys longer than this are rebalanced by the periodic job
+REBALANCE_KEY_LENGTH = 16
+
+# Keys longer than this are rebalanced immediately (the column holds 64)
+MAX_KEY_LENGTH = 48
+
+def _midpoint(low, high):
+    """Digits strictly between two fractions; high None stands for 1"""
+    if high is not None:
+        prefix = 0
+        while prefix < len(high) and (low[prefix] if prefix < len(low) else '0') == high[prefix]:
+            prefix += 1
+        if prefix:
+            return high[:prefix] + _midpoint(low[prefix:], high[prefix:])
+
+    low_digit = DIGITS.index(low[0]) if low else 0
+    high_digit = DIGITS.index(high[0]) if high is not None else BASE
+    if high_digit - low_digit > 1:
+        return DIGITS[(low_digit + high_digit) // 2]
+    if high is not None and len(high) > 1:
+        return high[0]
+    return DIGITS[low_digit] + _midpoint(low[1:], None)
+
+def key_between(before, after):
+    """
+    Make a key that sorts between two keys
+
+    Args:
+        before (str): Key of the previous node, or None for the start
+        after (str): Key of the next node, or None for the end
+
+    Returns:
+        str: A new key with before < key < after
+    """
+    if before is not None and after is not None and before >= after:
+        raise ValueError(f"{before!r} is not before {after!r}")
+    return _midpoint(before or '', after)
+
+def initial_key(index):
+    """Return the evenly spaced key for the node at an index"""
+    return f'{index:0{KEY_WIDTH}d}i'
+
+def initial_key_expression(index):
+    """
+    SQL version of initial_key, for INSERT ... SELECT
+
+    Args:
+        index: A SQL integer expression, e.g. row_number() - 1
+    """
+    digits = cast(index, String)
+    padded = func.substr(literal('0' * KEY_WIDTH) + digits, func.length(digits) + 1)
+    return padded + literal('i')
+
+def apply_order(roadmap_id, node_ids):
+    """
+    Give nodes fresh keys in the given order with one UPDATE ... CASE
+
+    Nodes of other roadmaps are ignored. The caller commits.
+
+    Args:
+        roadmap_id (str): The custom roadmap
+        node_ids (list): Node IDs in their new order
+
+    Returns:
+        int: Number of nodes updated
+    """
+    keys = {node_id: initial_key(index) for index, node_id in enumerate(node_ids)}
+    if not keys:
+        return 0
+
+    node_table = CustomRoadmapNode.__table__
+    result = db.session.execute(
+        update(node_table)
+        .where(node_table.c.roadmap_id == roadmap_id, node_table.c.id.in_(list(keys)))
+        .values(sort_key=case(keys, value=node_table.c.id))
+    )
+    return result.rowcount
+
+def rebalance_roadmap(roadmap_id):
+    """Renumber a roadmap's keys evenly, keeping the current order"""
+    node_ids = db.session.execute(
+        select(CustomRoadmapNode.id)
+        .where(CustomRoadmapNode.roadmap_id == roadmap_id)
+        .order_by(CustomRoadmapNode.sort_key, CustomRoadmapNode.id)
+    ).scalars().all()
+    return apply_order(roadmap_id, node_ids)
+
+def rebalance_long_keys(max_length=REBALANCE_KEY_LENGTH):
+    """
+    Rebalance every roadmap that has a key longer than max_length and commit
+
+    Returns:
+        int: Number of roadmaps rebalanced
+    """
+    roadmap_ids = db.session.execute(
+        select(CustomRoadmapNode.roadmap_id)
+        .where(func.length(CustomRoadmapNode.sort_key) > max_length)
+        .distinct()
+    ).scalars().all()
+    for roadmap_id in roadmap_ids:
+        rebalance_roadmap(roadmap_id)
+    db.session.commit()
+    return len(roadmap_ids)
+
+def _neighbour_keys(roadmap_id, node_id, previous_id):
+    """Keys of the node that should precede node_id and of the one after it"""
+    before = None
+    if previous_id is not None:
+        before = db.session.execute(
+            select(CustomRoadmapNode.sort_key)
+            .where(CustomRoadmapNode.id == previous_id, CustomRoadmapNode.roadmap_id == roadmap_id)
+        ).scalar()
+        if before is None:
+            raise LookupError(previous_id)
+
+    following = select(CustomRoadmapNode.sort_key).where(
+        CustomRoadmapNode.roadmap_id == roadmap_id,
+        CustomRoadmapNode.id != node_id
+    )
+    if before is not None:
+        following = following.where(CustomRoadmapNode.sort_key > before)
+    after = db.session.execute(
+        following.order_by(CustomRoadmapNode.sort_key).limit(1)
+    ).scalar()
+    return before, after
+
+def move_node(roadmap_id, node_id, previous_id=None):
+    """
+    Move a node after another one by updating only its key
+
+    Args:
+        roadmap_id (str): The custom roadmap
+        node_id (str): The node being moved
+        previous_id (str, optional): The node it should follow; None moves
+            it to the start
+
+    Returns:
+        str: The node's new key
+
+    Raises:
+        LookupError: If previous_id is not a node of this roadmap
+    """
+    before, after = _neighbour_keys(roadmap_id, node_id, previous_id)
+    key = key_between(before, after)
+
+    if len(key) > MAX_KEY_LENGTH:
+        rebalance_roadmap(roadmap_id)
+        before, after = _neighbour_keys(roadmap_id, node_id, previous_id)
+        key = key_between(before, after)
+
+    node_table = CustomRoadmapNode.__table__
+    db.session.execute(
+        update(node_table)
+        .where(node_table.c.id == node_id, node_table.c.roadmap_id == roadmap_id)
+        .values(sort_key=key)
+    )
+    return key
+
+def _successor(key):
+    """
+    Return an evenly spaced key after key, or None if its integer part is full
+
+    The first KEY_WIDTH digits are read as a base-36 integer and incremented,
+    so appending keeps keys at initial_key's length instead of bisecting
+    towards the end of the range.
+    """
+    number = int(key[:KEY_WIDTH].ljust(KEY_WIDTH, '0'), BASE) + 1
+    if number >= BASE ** KEY_WIDTH:
+        return None
+    digits = ''
+    for _ in range(KEY_WIDTH):
+        number, digit = divmod(number, BASE)
+        digits = DIGITS[digit] + digits
+    return digits + 'i'
+
+def _last_key(roadmap_id):
+    return db.session.execute(
+        select(func.max(CustomRoadmapNode.sort_key)).where(CustomRoadmapNode.roadmap_id == roadmap_id)
+    ).scalar()
+
+def append_key(roadmap_id):
+    """Return a key that places a new node at the end of a roadmap"""
+    last = _last_key(roadmap_id)
+    if last is None:
+        return initial_key(0)
+
+    key = _successor(last) or key_between(last, None)
+    if len(key) > MAX_KEY_LENGTH:
+        rebalance_roadmap(roadmap_id)
+        key = _successor(_last_key(roadmap_id))
+    return key
@@ -0,0 +1,239 @@
+from datetime import datetime, timezone
+from sqlalchemy import select, update, delete, insert, func, case
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.models import RoadmapNode, UserProgress, UserRoadmapStats
+
+def _lock_progress_stats(user_id, roadmap_id):
+    """
+    Create or touch a user's counter row for a roadmap, locking it
+
+    The row stays locked until the session commits, so concurrent progress
+    changes for the same user and roadmap are applied one after the other.
+    Call this before changing UserProgress, then record_progress_change.
+
+    Args:
+        user_id (int): The ID of the user
+        roadmap_id (str): The ID of the roadmap
+    """
+    now = datetime.now(timezone.utc)
+    total_nodes = select(func.count(RoadmapNode.id)).where(
+        RoadmapNode.roadmap_id == roadmap_id
+    ).scalar_subquery()
+
+    dialect_insert = _dialect_insert()
+    if dialect_insert is not None:
+        # One statement, so two first changes for the same roadmap can't
+        # both insert the row
+        statement = dialect_insert(UserRoadmapStats).values(
+            user_id=user_id,
+            roadmap_id=roadmap_id,
+            completed_count=0,
+            total_nodes=total_nodes,
+            last_activity=now
+        )
+        db.session.execute(statement.on_conflict_do_update(
+            index_elements=[UserRoadmapStats.user_id, UserRoadmapStats.roadmap_id],
+            set_={'last_activity': now}
+        ))
+        return
+
+    # Other databases: update, or insert in a savepoint and update again if
+    # another request inserted the row first
+    touched = update(UserRoadmapStats).where(
+        UserRoadmapStats.user_id == user_id, UserRoadmapStats.roadmap_id == roadmap_id
+    ).values(last_activity=now)
+    if db.session.execute(touched).rowcount == 0:
+        try:
+            with db.session.begin_nested():
+                db.session.execute(insert(UserRoadmapStats).values(
+                    user_id=user_id,
+                    roadmap_id=roadmap_id,
+                    completed_count=0,
+                    total_nodes=total_nodes,
+                    last_activity=now
+                ))
+        except IntegrityError:
+            db.session.execute(touched)
+
+def record_progress_change(user_id, roadmap_id):
+    """
+    Recount a user's completed topics of a roadmap into its counter row
+
+    The count is taken from UserProgress in the same statement rather than
+    added as a delta, so a change submitted twice at once cannot be counted
+    twice. The update is made in the current session so it commits together
+    with the UserProgress change that caused it.
+
+    Args:
+        user_id (int): The ID of the user
+        roadmap_id (str): The ID of the roadmap
+    """
+    completed_count = select(func.count(UserProgress.id)).where(
+        UserProgress.user_id == user_id,
+        UserProgress.roadmap_id == roadmap_id,
+        UserProgress.completed == True
+    ).scalar_subquery()
+    db.session.execute(
+        update(UserRoadmapStats)
+        .where(UserRoadmapStats.user_id == user_id, UserRoadmapStats.roadmap_id == roadmap_id)
+        .values(completed_count=completed_count)
+    )
+
+def _dialect_insert():
+    """Return the dialect's insert() with ON CONFLICT support, or None"""
+    dialect = db.engine.dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        dialect_insert = None
+    return dialect_insert
+
+def _upsert_progress(rows):
+    """Insert or update UserProgress rows in one statement where supported"""
+    dialect_insert = _dialect_insert()
+    if dialect_insert is not None:
+        statement = dialect_insert(UserProgress)
+        statement = statement.on_conflict_do_update(
+            index_elements=[UserProgress.user_id, UserProgress.node_id],
+            set_={
+                'roadmap_id': statement.excluded.roadmap_id,
+                'completed': statement.excluded.completed,
+                'date_completed': statement.excluded.date_completed
+            }
+        )
+        db.session.execute(statement, rows)
+        return
+
+    # Other databases: fall back to one lookup per row
+    for row in rows:
+        progress = UserProgress.query.filter_by(user_id=row['user_id'], node_id=row['node_id']).first()
+        if progress:
+            progress.roadmap_id = row['roadmap_id']
+            progress.completed = row['completed']
+            progress.date_completed = row['date_completed']
+        else:
+            db.session.add(UserProgress(**row))
+
+def apply_progress_updates(user_id, roadmap_id, updates):
+    """
+    Apply completion changes for many nodes of one roadmap
+
+    The nodes are validated against the roadmap in a single query, then
+    all rows are written with one upsert while the user's counter row for
+    the roadmap is locked, and the counter is recounted. The caller commits.
+
+    Args:
+        user_id (int): The ID of the user
+        roadmap_id (str): The ID of the roadmap
+        updates (dict): Node ID -> completed flag
+
+    Returns:
+        tuple: (applied, unknown) where applied maps node IDs to their new
+            state and unknown lists node IDs that are not in the roadmap.
+            Nothing is written when unknown is not empty.
+    """
+    if not updates:
+        return {}, []
+
+    node_ids = list(updates)
+    known = set(db.session.scalars(
+        select(RoadmapNode.id).where(RoadmapNode.roadmap_id == roadmap_id, RoadmapNode.id.in_(node_ids))
+    ))
+
+    unknown = [node_id for node_id in node_ids if node_id not in known]
+    if unknown:
+        return {}, unknown
+
+    now = datetime.now(timezone.utc)
+    rows = []
+    for node_id, completed in updates.items():
+        completed = bool(completed)
+        rows.append({
+            'user_id': user_id,
+            'roadmap_id': roadmap_id,
+            'node_id': node_id,
+            'completed': completed,
+            'date_completed': now if completed else None
+        })
+
+    _lock_progress_stats(user_id, roadmap_id)
+    _upsert_progress(rows)
+    record_progress_change(user_id, roadmap_id)
+
+    return {row['node_id']: row['completed'] for row in rows}, []
+
+def refresh_roadmap_totals(roadmap_id):
+    """
+    Update the stored node total for every user of a roadmap
+
+    Args:
+        roadmap_id (str): The ID of the roadmap whose nodes changed
+    """
+    total_nodes = select(func.count(RoadmapNode.id)).where(
+        RoadmapNode.roadmap_id == roadmap_id
+    ).scalar_subquery()
+    db.session.execute(
+        update(UserRoadmapStats)
+        .where(UserRoadmapStats.roadmap_id == roadmap_id)
+        .values(total_nodes=total_nodes)
+    )
+
+def rebuild_user_roadmap_stats(user_ids=None):
+    """
+    Rebuild the counters from UserProgress in bulk
+
+    Args:
+        user_ids (list, optional): Only rebuild these users
+
+    Returns:
+        int: Number of counter rows written
+    """
+    stale = delete(UserRoadmapStats)
+    if user_ids is not None:
+        stale = stale.where(UserRoadmapStats.user_id.in_(user_ids))
+    db.session.execute(stale)
+
+    totals = (
+        select(RoadmapNode.roadmap_id, func.count(RoadmapNode.id).label('total_nodes'))
+        .group_by(RoadmapNode.roadmap_id)
+        .subquery()
+    )
+    aggregate = (
+        select(
+            UserProgress.user_id,
+            UserProgress.roadmap_id,
+            func.sum(case((UserProgress.completed == True, 1), else_=0)),
+            func.coalesce(func.max(totals.c.total_nodes), 0),
+            func.max(UserProgress.date_completed)
+        )
+        .outerjoin(totals, totals.c.roadmap_id == UserProgress.roadmap_id)
+        .group_by(UserProgress.user_id, UserProgress.roadmap_id)
+    )
+    if user_ids is not None:
+        aggregate = aggregate.where(UserProgress.user_id.in_(user_ids))
+
+    result = db.session.execute(
+        insert(UserRoadmapStats).from_select(
+            ['user_id', 'roadmap_id', 'completed_count', 'total_nodes', 'last_activity'],
+            aggregate
+        )
+    )
+    db.session.commit()
+
+    return result.rowcount
+
+def get_user_roadmap_stats(user_id):
+    """
+    Get a user's counters for every roadmap they have progress in
+
+    Args:
+        user_id (int): The ID of the user
+
+    Returns:
+        dict: Roadmap ID -> UserRoadmapStats
+    """
+    stats = UserRoadmapStats.query.filter_by(user_id=user_id).all()
+    return {entry.roadmap_id: entry for entry in stats}
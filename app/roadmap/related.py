@@ -0,0 +1,155 @@
+import re
+import numpy as np
+from sqlalchemy import select, delete
+from app import db
+from app.models import Roadmap, RelatedRoadmap
+
+# Number of neighbours stored per roadmap
+TOP_K = 5
+
+# Weight of tag/category overlap versus description similarity
+TAG_WEIGHT = 0.6
+
+TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+# Whether this worker has checked that the table has been built
+_built = False
+
+def _tag_features(roadmap):
+    features = {f'category:{roadmap.category.strip().lower()}'}
+    if roadmap.tags:
+        features.update(f'tag:{tag.strip().lower()}' for tag in roadmap.tags.split(',') if tag.strip())
+    return features
+
+def _text_terms(roadmap):
+    return TOKEN_RE.findall(f'{roadmap.title} {roadmap.description}'.lower())
+
+def compute_related_roadmaps(roadmaps, k=TOP_K):
+    """
+    Compute the k most similar roadmaps for every roadmap
+
+    Similarity is a weighted sum of the Jaccard index over tags and category
+    and the TF-IDF cosine similarity of titles and descriptions, computed for
+    all pairs in one vectorized pass.
+
+    Args:
+        roadmaps (list): Objects with id, title, description, category and tags
+        k (int, optional): Number of neighbours per roadmap
+
+    Returns:
+        dict: Roadmap ID -> list of (related_id, score), best first
+    """
+    n = len(roadmaps)
+    if n < 2:
+        return {roadmap.id: [] for roadmap in roadmaps}
+
+    # Binary tag/category matrix; Jaccard = |A & B| / |A | B|
+    tag_sets = [_tag_features(roadmap) for roadmap in roadmaps]
+    tag_vocab = {feature: i for i, feature in enumerate(sorted(set().union(*tag_sets)))}
+    tags = np.zeros((n, len(tag_vocab)))
+    for row, features in enumerate(tag_sets):
+        tags[row, [tag_vocab[f] for f in features]] = 1.0
+    overlap = tags @ tags.T
+    sizes = tags.sum(axis=1)
+    union = sizes[:, None] + sizes[None, :] - overlap
+    jaccard = np.divide(overlap, union, out=np.zeros_like(overlap), where=union > 0)
+
+    # TF-IDF vectors, L2 normalized so the dot product is the cosine
+    term_lists = [_text_terms(roadmap) for roadmap in roadmaps]
+    term_vocab = {term: i for i, term in enumerate(sorted(set().union(*term_lists)))}
+    counts = np.zeros((n, len(term_vocab)))
+    for row, terms in enumerate(term_lists):
+        np.add.at(counts[row], [term_vocab[t] for t in terms], 1.0)
+    document_frequency = (counts > 0).sum(axis=0)
+    tfidf = counts * (np.log((1 + n) / (1 + document_frequency)) + 1)
+    norms = np.linalg.norm(tfidf, axis=1, keepdims=True)
+    tfidf = np.divide(tfidf, norms, out=np.zeros_like(tfidf), where=norms > 0)
+    cosine = tfidf @ tfidf.T
+
+    similarity = TAG_WEIGHT * jaccard + (1 - TAG_WEIGHT) * cosine
+    np.fill_diagonal(similarity, -np.inf)
+
+    k = min(k, n - 1)
+    # Stable sort keeps ties in catalog order so rebuilds are deterministic
+    order = np.argsort(-similarity, axis=1, kind='stable')[:, :k]
+
+    result = {}
+    for row, roadmap in enumerate(roadmaps):
+        result[roadmap.id] = [(roadmaps[col].id, float(similarity[row, col])) for col in order[row]]
+    return result
+
+def rebuild_related_roadmaps(roadmap_ids=None):
+    """
+    Recompute the related-roadmaps table
+
+    The similarity matrix is always computed over the whole catalog (it is
+    small), but only rows whose neighbour list changed are rewritten. The
+    changes are made in the current session; the caller commits.
+
+    Args:
+        roadmap_ids (list, optional): Roadmaps that were imported or restored.
+            Their rows are always rewritten; other rows only if they changed.
+
+    Returns:
+        int: Number of roadmaps whose neighbours were rewritten
+    """
+    roadmaps = db.session.execute(
+        select(Roadmap.id, Roadmap.title, Roadmap.description, Roadmap.category, Roadmap.tags)
+        .order_by(Roadmap.id)
+    ).all()
+    computed = compute_related_roadmaps(roadmaps)
+
+    stored = {}
+    for row in db.session.execute(
+        select(RelatedRoadmap.roadmap_id, RelatedRoadmap.related_id)
+        .order_by(RelatedRoadmap.roadmap_id, RelatedRoadmap.rank)
+    ):
+        stored.setdefault(row.roadmap_id, []).append(row.related_id)
+
+    forced = set(roadmap_ids or [])
+    changed = [
+        roadmap_id for roadmap_id, neighbours in computed.items()
+        if roadmap_id in forced or stored.get(roadmap_id) != [related_id for related_id, _ in neighbours]
+    ]
+    removed = [roadmap_id for roadmap_id in stored if roadmap_id not in computed]
+
+    stale = changed + removed
+    if stale:
+        db.session.execute(delete(RelatedRoadmap).where(RelatedRoadmap.roadmap_id.in_(stale)))
+
+    rows = [
+        {'roadmap_id': roadmap_id, 'rank': rank, 'related_id': related_id, 'score': score}
+        for roadmap_id in changed
+        for rank, (related_id, score) in enumerate(computed[roadmap_id])
+    ]
+    if rows:
+        db.session.execute(RelatedRoadmap.__table__.insert(), rows)
+
+    return len(changed)
+
+def get_related_ids(roadmap_id):
+    """
+    Get the precomputed neighbours of a roadmap
+
+    Args:
+        roadmap_id (str): The ID of the roadmap
+
+    Returns:
+        list: Related roadmap IDs, most similar first
+    """
+    return db.session.execute(
+        select(RelatedRoadmap.related_id)
+        .where(RelatedRoadmap.roadmap_id == roadmap_id)
+        .order_by(RelatedRoadmap.rank)
+    ).scalars().all()
+
+def ensure_related_roadmaps():
+    """Build the table once if the database predates it"""
+    global _built
+
+    if _built:
+        return
+    if db.session.execute(select(RelatedRoadmap.roadmap_id).limit(1)).first() is None:
+        if rebuild_related_roadmaps():
+            db.session.commit()
+    _built = True
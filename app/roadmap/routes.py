@@ -1,11 +1,15 @@
-from flask import render_template, request, jsonify, flash, redirect, url_for, Blueprint
+from flask import render_template, request, jsonify, flash, redirect, url_for, Blueprint, abort
 from flask_login import current_user, login_required
 from app import db
 from app.models import Roadmap, RoadmapNode, UserProgress, Comment
 from app.forms import CommentForm
+from app.catalog import catalog
 from app.roadmap import roadmap
-from app.roadmap.utils import load_roadmap_data
-from app.roadmap.version_utils import create_roadmap_version, get_roadmap_versions, get_roadmap_version, restore_roadmap_version
+from app.roadmap.utils import load_roadmap_data, encode_node_cursor, decode_node_cursor
+from app.roadmap.related import get_related_ids, ensure_related_roadmaps
+from app.roadmap.links import NODE_LINKS, load_links
+from app.roadmap.progress import apply_progress_updates
+from app.roadmap.version_utils import create_roadmap_version, get_roadmap_versions, get_roadmap_version, restore_roadmap_version, diff_roadmap_versions
 import json
 import sys
 import os
@@ -21,23 +25,27 @@ import os
 #     class AIRoadmapGenerator: pass
 #     class RoadmapImporter: pass
 
+# Nodes shown on the first page of a roadmap and fetched by each "load more"
+NODES_PER_PAGE = 5
+MAX_NODES_PER_PAGE = 50
+
 @roadmap.route("/list")
 def list_roadmaps():
-    roadmaps = Roadmap.query.all()
+    roadmaps = catalog.all()
     return render_template('roadmap/list.html', title='Roadmaps', roadmaps=roadmaps)
 
 @roadmap.route("/<string:roadmap_id>")
 def view_roadmap(roadmap_id):
     roadmap = Roadmap.query.get_or_404(roadmap_id)
 
-    # Get all nodes for the table of contents
-    all_nodes = RoadmapNode.query.filter_by(roadmap_id=roadmap_id).all()
-
-    # For initial load, only get the first 5 nodes
-    nodes = RoadmapNode.query.filter_by(roadmap_id=roadmap_id).limit(5).all()
-
-    # Get total node count for pagination
-    total_nodes = RoadmapNode.query.filter_by(roadmap_id=roadmap_id).count()
+    # Get all nodes in order for the table of contents; the first page and
+    # the total come from the same result
+    all_nodes = RoadmapNode.query.filter_by(roadmap_id=roadmap_id).order_by(
+        RoadmapNode.position, RoadmapNode.id
+    ).all()
+    nodes = load_links(all_nodes[:NODES_PER_PAGE])
+    total_nodes = len(all_nodes)
+    next_cursor = encode_node_cursor(nodes[-1]) if nodes else None
 
     # Get user progress if logged in
     user_progress = {}
@@ -53,43 +61,13 @@ def view_roadmap(roadmap_id):
     form = CommentForm()
     comments = Comment.query.filter_by(roadmap_id=roadmap_id).order_by(Comment.date_posted.desc()).all()
 
-    # Get related roadmaps based on category and tags
-    related_roadmaps = []
-
-    # First, try to find roadmaps with the same category
-    category_matches = Roadmap.query.filter(
-        Roadmap.category == roadmap.category,
-        Roadmap.id != roadmap_id
-    ).limit(5).all()
-    related_roadmaps.extend(category_matches)
-
-    # If we need more, look for tag matches
-    if len(related_roadmaps) < 5 and roadmap.tags:
-        current_tags = roadmap.tags.split(',')
-        for tag in current_tags:
-            tag = tag.strip()
-            if len(related_roadmaps) >= 5:
-                break
-
-            # Find roadmaps that have this tag but aren't already in our list
-            tag_matches = Roadmap.query.filter(
-                Roadmap.tags.like(f'%{tag}%'),
-                Roadmap.id != roadmap_id
-            ).all()
-
-            for match in tag_matches:
-                if match not in related_roadmaps and len(related_roadmaps) < 5:
-                    related_roadmaps.append(match)
-
-    # If we still need more, just add some popular roadmaps
-    if len(related_roadmaps) < 3:
-        popular_roadmaps = Roadmap.query.filter(
-            Roadmap.id != roadmap_id
-        ).limit(5 - len(related_roadmaps)).all()
-
-        for roadmap in popular_roadmaps:
-            if roadmap not in related_roadmaps:
-                related_roadmaps.append(roadmap)
+    # Get related roadmaps from the precomputed similarity table
+    related_ids = get_related_ids(roadmap_id)
+    if not related_ids:
+        ensure_related_roadmaps()
+        related_ids = get_related_ids(roadmap_id)
+    related_roadmaps = [catalog.get(related_id) for related_id in related_ids]
+    related_roadmaps = [related for related in related_roadmaps if related is not None]
 
     return render_template('roadmap/view.html',
                           title=roadmap.title,
@@ -97,6 +75,7 @@ def view_roadmap(roadmap_id):
                           nodes=nodes,
                           all_nodes=all_nodes,
                           total_nodes=total_nodes,
+                          next_cursor=next_cursor,
                           user_progress=user_progress,
                           form=form,
                           comments=comments,
@@ -121,52 +100,79 @@ def add_comment(roadmap_id):
 @roadmap.route("/<string:roadmap_id>/progress/<string:node_id>", methods=['POST'])
 @login_required
 def update_progress(roadmap_id, node_id):
-    # Check if roadmap and node exist
-    roadmap = Roadmap.query.get_or_404(roadmap_id)
-    node = RoadmapNode.query.get_or_404(node_id)
+    # Check if roadmap exists
+    catalog.get_or_404(roadmap_id)
 
     # Get the completed status from the request
     data = request.get_json()
-    completed = data.get('completed', False)
-
-    # Find existing progress or create new one
-    progress = UserProgress.query.filter_by(
-        user_id=current_user.id,
-        roadmap_id=roadmap_id,
-        node_id=node_id
-    ).first()
-
-    if progress:
-        progress.completed = completed
-        if completed:
-            from datetime import datetime, timezone
-            progress.date_completed = datetime.now(timezone.utc)
-        else:
-            progress.date_completed = None
-    else:
-        from datetime import datetime, timezone
-        progress = UserProgress(
-            user_id=current_user.id,
-            roadmap_id=roadmap_id,
-            node_id=node_id,
-            completed=completed,
-            date_completed=datetime.now(timezone.utc) if completed else None
-        )
-        db.session.add(progress)
+    completed = bool(data.get('completed', False))
+
+    # Apply the change and keep the per-roadmap counters in the same transaction
+    applied, unknown = apply_progress_updates(current_user.id, roadmap_id, {node_id: completed})
+    if unknown:
+        abort(404)
 
     db.session.commit()
 
     return jsonify({'success': True, 'completed': completed})
 
+@roadmap.route("/<string:roadmap_id>/progress", methods=['POST'])
+@login_required
+def update_progress_batch(roadmap_id):
+    """Apply many progress changes for one roadmap in a single transaction"""
+    catalog.get_or_404(roadmap_id)
+
+    # Expect {"updates": [{"node_id": ..., "completed": ...}, ...]}
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not isinstance(data.get('updates'), list):
+        return jsonify({'success': False, 'message': 'Expected {"updates": [...]}'}), 400
+
+    updates = {}
+    for item in data['updates']:
+        if not isinstance(item, dict) or not item.get('node_id'):
+            return jsonify({'success': False, 'message': 'Each update needs a node_id'}), 400
+        # Later entries for the same node win
+        updates[str(item['node_id'])] = bool(item.get('completed', False))
+
+    if not updates:
+        return jsonify({'success': False, 'message': 'No updates given'}), 400
+
+    applied, unknown = apply_progress_updates(current_user.id, roadmap_id, updates)
+    if unknown:
+        return jsonify({'success': False, 'message': 'Unknown nodes', 'unknown': unknown}), 400
+
+    db.session.commit()
+
+    return jsonify({'success': True, 'updated': len(applied), 'completed': applied})
+
 @roadmap.route("/<string:roadmap_id>/load-more", methods=['GET'])
 def load_more_nodes(roadmap_id):
     """Load more nodes for lazy loading"""
-    # Get the offset from the request
-    offset = request.args.get('offset', 0, type=int)
-    limit = request.args.get('limit', 5, type=int)
-
-    # Get the nodes
-    nodes = RoadmapNode.query.filter_by(roadmap_id=roadmap_id).offset(offset).limit(limit).all()
+    limit = min(max(request.args.get('limit', NODES_PER_PAGE, type=int), 1), MAX_NODES_PER_PAGE)
+
+    # Keyset pagination on (position, id): the cursor is the last node the
+    # client has, so every page is a single index range scan
+    query = RoadmapNode.query.filter_by(roadmap_id=roadmap_id).options(NODE_LINKS)
+    cursor = request.args.get('cursor')
+    if cursor:
+        after = decode_node_cursor(cursor)
+        if after is None:
+            return jsonify({'success': False, 'message': 'Invalid cursor'}), 400
+        position, node_id = after
+        query = query.filter(db.or_(
+            RoadmapNode.position > position,
+            db.and_(RoadmapNode.position == position, RoadmapNode.id > node_id)
+        ))
+    query = query.order_by(RoadmapNode.position, RoadmapNode.id)
+
+    if not cursor and 'offset' in request.args:
+        # Older clients page by offset
+        query = query.offset(max(request.args.get('offset', 0, type=int), 0))
+
+    # Fetch one extra row to know whether another page exists
+    nodes = query.limit(limit + 1).all()
+    has_more = len(nodes) > limit
+    nodes = nodes[:limit]
 
     # Get user progress if logged in
     user_progress = {}
@@ -197,7 +203,8 @@ def load_more_nodes(roadmap_id):
     return jsonify({
         'success': True,
         'nodes': nodes_data,
-        'has_more': len(nodes) == limit
+        'has_more': has_more,
+        'next_cursor': encode_node_cursor(nodes[-1]) if nodes else None
     })
 
 @roadmap.route("/import", methods=['GET', 'POST'])
@@ -210,8 +217,10 @@ def import_roadmaps():
     if request.method == 'POST':
         try:
             # Import roadmaps from JSON files
-            imported_count = load_roadmap_data()
-            flash(f'Successfully imported {imported_count} roadmaps!', 'success')
+            report = load_roadmap_data()
+            if report.errors:
+                flash(f'Some roadmaps could not be imported: {", ".join(report.errors)}', 'warning')
+            flash(f'Import finished: {report.summary()}', 'success')
             return redirect(url_for('roadmap.list_roadmaps'))
         except Exception as e:
             flash(f'Error importing roadmaps: {str(e)}', 'danger')
@@ -273,6 +282,63 @@ def view_version(roadmap_id, version_number):
                           version_number=version_number,
                           version_data=version_data)
 
+def _diff_range():
+    """Read the from/to version numbers of a comparison; to may be 'current'"""
+    from_version = request.args.get('from', type=int)
+    to_arg = request.args.get('to', 'current')
+    to_version = None if to_arg == 'current' else request.args.get('to', type=int)
+    if from_version is None or (to_arg != 'current' and to_version is None):
+        return None
+    return from_version, to_version
+
+@roadmap.route("/<string:roadmap_id>/versions/compare")
+@login_required
+def compare_versions(roadmap_id):
+    """Show the differences between two versions of a roadmap"""
+    if not current_user.is_admin:
+        flash('You do not have permission to access this page.', 'danger')
+        return redirect(url_for('main.index'))
+
+    roadmap = Roadmap.query.get_or_404(roadmap_id)
+
+    versions = _diff_range()
+    diff = diff_roadmap_versions(roadmap_id, *versions) if versions else None
+    if diff is None:
+        flash('Version not found.', 'danger')
+        return redirect(url_for('roadmap.roadmap_versions', roadmap_id=roadmap_id))
+
+    from_version, to_version = versions
+    return render_template('roadmap/compare_versions.html',
+                          title=f'Compare versions of {roadmap.title}',
+                          roadmap=roadmap,
+                          from_version=from_version,
+                          to_version=to_version,
+                          diff=diff)
+
+@roadmap.route("/<string:roadmap_id>/versions/diff")
+@login_required
+def version_diff(roadmap_id):
+    """Return the differences between two versions as JSON"""
+    if not current_user.is_admin:
+        return jsonify({'success': False, 'message': 'Admin access required'}), 403
+
+    versions = _diff_range()
+    if versions is None:
+        return jsonify({'success': False, 'message': 'Pass from=<version> and optionally to=<version|current>'}), 400
+
+    diff = diff_roadmap_versions(roadmap_id, *versions)
+    if diff is None:
+        return jsonify({'success': False, 'message': 'Version not found'}), 404
+
+    from_version, to_version = versions
+    return jsonify({
+        'success': True,
+        'roadmap_id': roadmap_id,
+        'from': from_version,
+        'to': to_version if to_version is not None else 'current',
+        'diff': diff
+    })
+
 @roadmap.route("/<string:roadmap_id>/versions/<int:version_number>/restore", methods=['POST'])
 @login_required
 def restore_version(roadmap_id, version_number):
@@ -0,0 +1,169 @@
+"""
+Compact storage for roadmap version snapshots.
+
+A snapshot is the dict returned by get_roadmap_version: the roadmap fields
+and its nodes in order. Versions are stored as zlib-compressed JSON, either
+as a full keyframe or as a delta against the previous version holding only
+the changed roadmap fields, added or changed nodes, deleted node IDs and,
+when nodes were reordered, the new order. A keyframe is written every
+KEYFRAME_INTERVAL versions, or when most nodes changed, so rebuilding any
+version takes one query and at most KEYFRAME_INTERVAL deltas.
+
+The encoding functions only use the standard library so migrations can
+import them.
+"""
+
+import json
+import zlib
+import threading
+from collections import OrderedDict
+
+# Maximum number of deltas between two keyframes
+KEYFRAME_INTERVAL = 20
+
+# Rebuilt snapshots kept per worker; versions never change once written
+CACHE_SIZE = 256
+
+ROADMAP_FIELDS = ('title', 'description', 'category', 'difficulty', 'tags')
+
+def compress(value):
+    """Serialize a JSON-compatible value to compressed bytes"""
+    return zlib.compress(json.dumps(value, separators=(',', ':')).encode('utf-8'))
+
+def decompress(blob):
+    """Inverse of compress"""
+    return json.loads(zlib.decompress(blob).decode('utf-8'))
+
+def make_delta(old, new):
+    """
+    Describe how to turn one snapshot into another
+
+    Args:
+        old (dict): The previous snapshot
+        new (dict): The current snapshot
+
+    Returns:
+        dict: Changed roadmap fields, changed nodes, deleted IDs and order
+    """
+    delta = {}
+
+    roadmap_changes = {
+        field: new['roadmap'][field] for field in ROADMAP_FIELDS
+        if old['roadmap'].get(field) != new['roadmap'].get(field)
+    }
+    if roadmap_changes:
+        delta['roadmap'] = roadmap_changes
+
+    old_nodes = {node['id']: node for node in old['nodes']}
+    new_ids = [node['id'] for node in new['nodes']]
+    new_id_set = set(new_ids)
+
+    changed = {node['id']: node for node in new['nodes'] if old_nodes.get(node['id']) != node}
+    if changed:
+        delta['nodes'] = changed
+
+    deleted = [node_id for node_id in old_nodes if node_id not in new_id_set]
+    if deleted:
+        delta['deleted'] = deleted
+
+    # Only store the order if it isn't the old order with new nodes appended
+    if _default_order([node['id'] for node in old['nodes']], delta) != new_ids:
+        delta['order'] = new_ids
+
+    return delta
+
+def _default_order(old_order, delta):
+    deleted = set(delta.get('deleted', ()))
+    order = [node_id for node_id in old_order if node_id not in deleted]
+    present = set(order)
+    order.extend(node_id for node_id in delta.get('nodes', {}) if node_id not in present)
+    return order
+
+def apply_delta(snapshot, delta):
+    """
+    Apply a delta made by make_delta
+
+    Args:
+        snapshot (dict): The previous snapshot, which is not modified
+        delta (dict): The changes
+
+    Returns:
+        dict: The new snapshot
+    """
+    roadmap = dict(snapshot['roadmap'])
+    roadmap.update(delta.get('roadmap', {}))
+
+    nodes = {node['id']: node for node in snapshot['nodes']}
+    for node_id in delta.get('deleted', ()):
+        nodes.pop(node_id, None)
+    nodes.update(delta.get('nodes', {}))
+
+    order = delta.get('order')
+    if order is None:
+        order = _default_order([node['id'] for node in snapshot['nodes']], delta)
+
+    return {'roadmap': roadmap, 'nodes': [nodes[node_id] for node_id in order]}
+
+def encode_version(previous, snapshot, deltas_since_keyframe):
+    """
+    Choose between a keyframe and a delta and compress the result
+
+    Args:
+        previous (dict): Snapshot of the previous version, or None
+        snapshot (dict): Snapshot of the version being stored
+        deltas_since_keyframe (int): Deltas stored after the last keyframe
+
+    Returns:
+        tuple: (is_keyframe, compressed bytes)
+    """
+    if previous is not None and deltas_since_keyframe < KEYFRAME_INTERVAL:
+        delta = make_delta(previous, snapshot)
+        if len(delta.get('nodes', ())) * 2 <= len(snapshot['nodes']):
+            return False, compress(delta)
+    return True, compress(snapshot)
+
+def decode_chain(rows):
+    """
+    Rebuild a snapshot from a keyframe and the deltas after it
+
+    Args:
+        rows (list): (is_keyframe, compressed bytes) pairs in version order,
+            starting with a keyframe
+
+    Returns:
+        dict: The snapshot of the last row
+    """
+    snapshot = None
+    for is_keyframe, blob in rows:
+        value = decompress(blob)
+        snapshot = value if is_keyframe or snapshot is None else apply_delta(snapshot, value)
+    return snapshot
+
+class LRUCache:
+    """Small thread-safe LRU used for values that never go stale"""
+
+    def __init__(self, size=CACHE_SIZE):
+        self.size = size
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+# Rebuilt snapshots keyed by (roadmap_id, version_number)
+snapshot_cache = LRUCache()
@@ -1,28 +1,45 @@
-import json
+import re
+import bisect
+import difflib
+from flask import current_app
+from sqlalchemy import select, update, delete, func, case, bindparam
 from app import db
-from app.models import Roadmap, RoadmapNode, RoadmapVersion
+from app.models import Roadmap, RoadmapNode, RoadmapVersion, UserProgress, UserRoadmapStats
+from app.catalog import catalog
+from app.search import search_index
+from app.roadmap.related import rebuild_related_roadmaps
+from app.roadmap.clone import detach_custom_nodes
+from app.roadmap.links import NODE_LINKS, insert_node_links, delete_node_links
+from app.roadmap.progress import refresh_roadmap_totals
+from app.roadmap.version_store import encode_version, decode_chain, snapshot_cache, LRUCache, ROADMAP_FIELDS
+from app.roadmap.loader import hash_content, node_row, NODE_COLUMNS
 from flask_login import current_user
 
-def create_roadmap_version(roadmap_id, description=None):
+# Words and the whitespace between them, so joined segments rebuild the text
+TOKEN_RE = re.compile(r'\s+|[^\s]+')
+
+# Computed diffs keyed by (roadmap_id, from_version, to_version)
+diff_cache = LRUCache(64)
+
+def snapshot_roadmap(roadmap_id):
     """
-    Create a new version of a roadmap
+    Read the current state of a roadmap in the version snapshot format
 
     Args:
         roadmap_id (str): The ID of the roadmap
-        description (str, optional): A description of the changes
 
     Returns:
-        RoadmapVersion: The newly created version
+        dict: The roadmap fields and its nodes in order, or None
     """
-    # Get the roadmap and its nodes
-    roadmap = Roadmap.query.get(roadmap_id)
+    roadmap = db.session.get(Roadmap, roadmap_id)
     if not roadmap:
         return None
 
-    nodes = RoadmapNode.query.filter_by(roadmap_id=roadmap_id).all()
+    nodes = RoadmapNode.query.filter_by(roadmap_id=roadmap_id).options(NODE_LINKS).order_by(
+        RoadmapNode.position, RoadmapNode.id
+    ).all()
 
-    # Create a JSON representation of the roadmap and nodes
-    roadmap_data = {
+    return {
         'roadmap': {
             'id': roadmap.id,
             'title': roadmap.title,
@@ -31,28 +48,44 @@ def create_roadmap_version(roadmap_id, description=None):
             'difficulty': roadmap.difficulty,
             'tags': roadmap.tags
         },
-        'nodes': []
+        'nodes': [
+            {
+                'id': node.id,
+                'title': node.title,
+                'description': node.description,
+                'links': node.get_links()
+            }
+            for node in nodes
+        ]
     }
 
-    for node in nodes:
-        node_data = {
-            'id': node.id,
-            'title': node.title,
-            'description': node.description,
-            'links': node.get_links()
-        }
-        roadmap_data['nodes'].append(node_data)
+def _latest_versions(roadmap_id):
+    """Return the latest version number and latest keyframe number, or 0"""
+    latest_number, latest_keyframe = db.session.execute(
+        select(
+            func.max(RoadmapVersion.version_number),
+            func.max(case((RoadmapVersion.is_keyframe == True, RoadmapVersion.version_number)))
+        ).where(RoadmapVersion.roadmap_id == roadmap_id)
+    ).one()
+    return latest_number or 0, latest_keyframe or 0
 
-    # Get the next version number
-    latest_version = RoadmapVersion.query.filter_by(roadmap_id=roadmap_id).order_by(
-        RoadmapVersion.version_number.desc()
-    ).first()
+def _add_version(roadmap_id, snapshot, description, previous, latest_number, latest_keyframe):
+    """
+    Add a version row to the session without committing
 
-    version_number = 1
-    if latest_version:
-        version_number = latest_version.version_number + 1
+    Args:
+        roadmap_id (str): The ID of the roadmap
+        snapshot (dict): The state to store
+        description (str): A description of the changes
+        previous (dict): Snapshot of version latest_number, or None
+        latest_number (int): The current latest version, 0 if none
+        latest_keyframe (int): The current latest keyframe, 0 if none
+
+    Returns:
+        RoadmapVersion: The new, uncommitted version
+    """
+    is_keyframe, payload = encode_version(previous, snapshot, latest_number - latest_keyframe)
 
-    # Create the new version
     try:
         created_by = current_user.id if current_user.is_authenticated else None
     except:
@@ -61,15 +94,41 @@ def create_roadmap_version(roadmap_id, description=None):
 
     version = RoadmapVersion(
         roadmap_id=roadmap_id,
-        version_number=version_number,
-        data=json.dumps(roadmap_data),
+        version_number=latest_number + 1,
+        is_keyframe=is_keyframe,
+        payload=payload,
         created_by=created_by,
         description=description
     )
-
     db.session.add(version)
+    return version
+
+def create_roadmap_version(roadmap_id, description=None):
+    """
+    Create a new version of a roadmap
+
+    The version is stored as a delta against the previous one unless a new
+    keyframe is due, see app.roadmap.version_store.
+
+    Args:
+        roadmap_id (str): The ID of the roadmap
+        description (str, optional): A description of the changes
+
+    Returns:
+        RoadmapVersion: The newly created version
+    """
+    snapshot = snapshot_roadmap(roadmap_id)
+    if not snapshot:
+        return None
+
+    latest_number, latest_keyframe = _latest_versions(roadmap_id)
+    previous = get_roadmap_version(roadmap_id, latest_number) if latest_number else None
+
+    version = _add_version(roadmap_id, snapshot, description, previous, latest_number, latest_keyframe)
     db.session.commit()
 
+    snapshot_cache.put((roadmap_id, version.version_number), snapshot)
+
     return version
 
 def get_roadmap_versions(roadmap_id):
@@ -99,20 +158,46 @@ def get_roadmap_version(roadmap_id, version_number):
     Returns:
         dict: The roadmap data for the specified version
     """
-    version = RoadmapVersion.query.filter_by(
-        roadmap_id=roadmap_id,
-        version_number=version_number
-    ).first()
+    snapshot = snapshot_cache.get((roadmap_id, version_number))
+    if snapshot is not None:
+        return snapshot
 
-    if not version:
+    # The version and every delta back to the nearest keyframe, in one query
+    keyframe = (
+        select(func.max(RoadmapVersion.version_number))
+        .where(RoadmapVersion.roadmap_id == roadmap_id,
+               RoadmapVersion.is_keyframe == True,
+               RoadmapVersion.version_number <= version_number)
+        .scalar_subquery()
+    )
+    rows = db.session.execute(
+        select(RoadmapVersion.version_number, RoadmapVersion.is_keyframe, RoadmapVersion.payload)
+        .where(RoadmapVersion.roadmap_id == roadmap_id,
+               RoadmapVersion.version_number >= keyframe,
+               RoadmapVersion.version_number <= version_number)
+        .order_by(RoadmapVersion.version_number)
+    ).all()
+
+    if not rows or rows[-1].version_number != version_number:
         return None
 
-    return json.loads(version.data)
+    snapshot = decode_chain([(row.is_keyframe, row.payload) for row in rows])
+    snapshot_cache.put((roadmap_id, version_number), snapshot)
+    return snapshot
+
+def _node_row(roadmap_id, node, position):
+    """Turn a snapshot node into a roadmap_node row, hashed as the importer does"""
+    return node_row(roadmap_id, node['id'], node['title'], node['description'], node['links'], position)
 
 def restore_roadmap_version(roadmap_id, version_number):
     """
     Restore a roadmap to a previous version
 
+    Runs as a single transaction: a backup version of the current state is
+    recorded, only the nodes that differ from the target are inserted,
+    updated or deleted with bulk statements, and the "restored" version is
+    recorded, all in one commit. Nothing is changed if any step fails.
+
     Args:
         roadmap_id (str): The ID of the roadmap
         version_number (int): The version number to restore
@@ -121,39 +206,262 @@ def restore_roadmap_version(roadmap_id, version_number):
         bool: True if successful, False otherwise
     """
     # Get the version data
-    version_data = get_roadmap_version(roadmap_id, version_number)
-    if not version_data:
+    target = get_roadmap_version(roadmap_id, version_number)
+    current = snapshot_roadmap(roadmap_id)
+    if not target or not current:
         return False
 
-    # Create a new version before restoring (backup)
-    create_roadmap_version(roadmap_id, f"Backup before restoring to version {version_number}")
-
-    # Update the roadmap
-    roadmap = Roadmap.query.get(roadmap_id)
-    roadmap.title = version_data['roadmap']['title']
-    roadmap.description = version_data['roadmap']['description']
-    roadmap.category = version_data['roadmap']['category']
-    roadmap.difficulty = version_data['roadmap']['difficulty']
-    roadmap.tags = version_data['roadmap']['tags']
-
-    # Delete existing nodes
-    RoadmapNode.query.filter_by(roadmap_id=roadmap_id).delete()
-
-    # Create new nodes from the version data
-    for node_data in version_data['nodes']:
-        node = RoadmapNode(
-            id=node_data['id'],
-            roadmap_id=roadmap_id,
-            title=node_data['title'],
-            description=node_data['description'],
-            links=json.dumps(node_data['links'])
+    node_table = RoadmapNode.__table__
+
+    # Compare with the stored positions, which may have gaps after an import
+    positions = dict(db.session.execute(
+        select(RoadmapNode.id, RoadmapNode.position).where(RoadmapNode.roadmap_id == roadmap_id)
+    ).all())
+    current_nodes = {node['id']: (positions[node['id']], node) for node in current['nodes']}
+    target_rows = [_node_row(roadmap_id, node, position) for position, node in enumerate(target['nodes'])]
+    target_ids = {row['id'] for row in target_rows}
+
+    inserts, updates, new_links = [], [], {}
+    for row, node in zip(target_rows, target['nodes']):
+        existing = current_nodes.get(row['id'])
+        if existing is None:
+            inserts.append({column: row[column] for column in NODE_COLUMNS})
+            new_links[row['id']] = row['link_rows']
+        elif existing != (row['position'], node):
+            updates.append(dict({column: row[column] for column in NODE_COLUMNS}, _id=row['id']))
+            if existing[1]['links'] != node['links']:
+                new_links[row['id']] = row['link_rows']
+    deletes = [node_id for node_id in current_nodes if node_id not in target_ids]
+
+    roadmap_row = {field: target['roadmap'][field] for field in ROADMAP_FIELDS}
+    metadata_changed = any(current['roadmap'][field] != roadmap_row[field] for field in ROADMAP_FIELDS)
+    roadmap_row['content_hash'] = hash_content(
+        dict(roadmap_row, nodes=[row['content_hash'] for row in target_rows]),
+        ROADMAP_FIELDS + ('nodes',)
+    )
+
+    try:
+        latest_number, latest_keyframe = _latest_versions(roadmap_id)
+        previous = get_roadmap_version(roadmap_id, latest_number) if latest_number else None
+
+        # Back up the current state; usually a tiny delta against the latest version
+        backup = _add_version(roadmap_id, current, f"Backup before restoring to version {version_number}",
+                              previous, latest_number, latest_keyframe)
+        if backup.is_keyframe:
+            latest_keyframe = backup.version_number
+
+        db.session.execute(
+            update(Roadmap).where(Roadmap.id == roadmap_id).values(**roadmap_row)
         )
-        db.session.add(node)
 
-    # Commit changes
-    db.session.commit()
+        if deletes:
+            # Remove completed topics that no longer exist from the counters
+            removed_completed = (
+                select(func.count(UserProgress.id))
+                .where(UserProgress.user_id == UserRoadmapStats.user_id,
+                       UserProgress.node_id.in_(deletes),
+                       UserProgress.completed == True)
+                .scalar_subquery()
+            )
+            db.session.execute(
+                update(UserRoadmapStats)
+                .where(UserRoadmapStats.roadmap_id == roadmap_id)
+                .values(completed_count=UserRoadmapStats.completed_count - removed_completed)
+            )
+            db.session.execute(delete(UserProgress).where(UserProgress.node_id.in_(deletes)))
+            detach_custom_nodes(deletes)
+            delete_node_links(deletes)
+            db.session.execute(delete(RoadmapNode).where(RoadmapNode.id.in_(deletes)))
+        if updates:
+            db.session.execute(node_table.update().where(node_table.c.id == bindparam('_id')), updates)
+        if inserts:
+            db.session.execute(node_table.insert(), inserts)
+        if new_links:
+            # Only nodes whose links differ get their link rows replaced
+            delete_node_links([node_id for node_id in new_links if node_id in current_nodes])
+            insert_node_links(new_links)
+
+        # The restored state is the target snapshot, so no need to read it back
+        restored = _add_version(roadmap_id, target, f"Restored from version {version_number}",
+                                current, backup.version_number, latest_keyframe)
+
+        # Let every worker reload the catalog and re-index the restored content
+        catalog.bump()
+        search_index.index_roadmap(roadmap_id)
+        if metadata_changed:
+            rebuild_related_roadmaps([roadmap_id])
+        if inserts or deletes:
+            refresh_roadmap_totals(roadmap_id)
+
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        current_app.logger.exception(f"Restoring {roadmap_id} to version {version_number} failed")
+        return False
 
-    # Create a new version after restoring
-    create_roadmap_version(roadmap_id, f"Restored from version {version_number}")
+    snapshot_cache.put((roadmap_id, backup.version_number), current)
+    snapshot_cache.put((roadmap_id, restored.version_number), target)
 
     return True
+
+def _text_diff(old, new):
+    """Word-level diff as a list of [op, text] with op equal, insert or delete"""
+    old_tokens = TOKEN_RE.findall(old or '')
+    new_tokens = TOKEN_RE.findall(new or '')
+    matcher = difflib.SequenceMatcher(None, old_tokens, new_tokens, autojunk=False)
+
+    segments = []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            segments.append(['equal', ''.join(old_tokens[i1:i2])])
+            continue
+        if i1 != i2:
+            segments.append(['delete', ''.join(old_tokens[i1:i2])])
+        if j1 != j2:
+            segments.append(['insert', ''.join(new_tokens[j1:j2])])
+    return segments
+
+def _links_diff(old_links, new_links):
+    """Compare two link lists by URL"""
+    old_by_url = {link.get('url'): link for link in old_links or []}
+    new_by_url = {link.get('url'): link for link in new_links or []}
+
+    changes = {
+        'added': [link for url, link in new_by_url.items() if url not in old_by_url],
+        'removed': [link for url, link in old_by_url.items() if url not in new_by_url],
+        'changed': [
+            {'old': old_by_url[url], 'new': link}
+            for url, link in new_by_url.items()
+            if url in old_by_url and old_by_url[url] != link
+        ]
+    }
+    return changes if any(changes.values()) else None
+
+def _moved_ids(old_ids, new_ids):
+    """
+    Find the smallest set of kept nodes whose move explains the new order
+
+    The nodes outside a longest increasing subsequence of old positions,
+    found in O(n log n).
+    """
+    old_position = {node_id: index for index, node_id in enumerate(old_ids)}
+    kept = [node_id for node_id in new_ids if node_id in old_position]
+
+    tails, tail_index, previous = [], [], [None] * len(kept)
+    for index, node_id in enumerate(kept):
+        position = old_position[node_id]
+        slot = bisect.bisect_left(tails, position)
+        if slot == len(tails):
+            tails.append(position)
+            tail_index.append(index)
+        else:
+            tails[slot] = position
+            tail_index[slot] = index
+        previous[index] = tail_index[slot - 1] if slot else None
+
+    in_order = set()
+    index = tail_index[-1] if tail_index else None
+    while index is not None:
+        in_order.add(kept[index])
+        index = previous[index]
+    return [node_id for node_id in kept if node_id not in in_order]
+
+def diff_snapshots(old, new):
+    """
+    Compare two roadmap snapshots by node ID
+
+    Args:
+        old (dict): The older snapshot, as returned by get_roadmap_version
+        new (dict): The newer snapshot
+
+    Returns:
+        dict: roadmap (changed fields), added, removed, modified and moved
+            nodes, and a summary of the counts
+    """
+    roadmap_changes = {}
+    for field in ROADMAP_FIELDS:
+        before, after = old['roadmap'].get(field), new['roadmap'].get(field)
+        if before != after:
+            change = {'old': before, 'new': after}
+            if field == 'description':
+                change['diff'] = _text_diff(before, after)
+            roadmap_changes[field] = change
+
+    old_nodes = {node['id']: node for node in old['nodes']}
+    new_ids = set()
+    added, modified = [], []
+
+    for position, node in enumerate(new['nodes']):
+        new_ids.add(node['id'])
+        previous = old_nodes.get(node['id'])
+        if previous is None:
+            added.append({'id': node['id'], 'title': node['title'], 'position': position})
+            continue
+        if previous == node:
+            continue
+
+        changes = {}
+        if previous['title'] != node['title']:
+            changes['title'] = {'old': previous['title'], 'new': node['title']}
+        if previous['description'] != node['description']:
+            changes['description'] = _text_diff(previous['description'], node['description'])
+        links = _links_diff(previous.get('links'), node.get('links'))
+        if links:
+            changes['links'] = links
+        modified.append({'id': node['id'], 'title': node['title'], 'position': position, 'changes': changes})
+
+    removed = [
+        {'id': node['id'], 'title': node['title']}
+        for node in old['nodes'] if node['id'] not in new_ids
+    ]
+
+    moved = _moved_ids([node['id'] for node in old['nodes']], [node['id'] for node in new['nodes']])
+
+    return {
+        'roadmap': roadmap_changes,
+        'added': added,
+        'removed': removed,
+        'modified': modified,
+        'moved': moved,
+        'summary': {
+            'added': len(added),
+            'removed': len(removed),
+            'modified': len(modified),
+            'moved': len(moved),
+            'unchanged': len(new['nodes']) - len(added) - len(modified)
+        }
+    }
+
+def diff_roadmap_versions(roadmap_id, from_version, to_version=None):
+    """
+    Compare two versions of a roadmap, or a version with the live data
+
+    Results are cached per worker. Versions never change, and comparisons
+    with the live data are keyed by the catalog version, which every import
+    and restore bumps.
+
+    Args:
+        roadmap_id (str): The ID of the roadmap
+        from_version (int): The older version number
+        to_version (int, optional): The newer version number; None compares
+            with the current roadmap
+
+    Returns:
+        dict: See diff_snapshots, or None if a version does not exist
+    """
+    key = (roadmap_id, from_version, to_version if to_version is not None else ('current', catalog.version()))
+    diff = diff_cache.get(key)
+    if diff is not None:
+        return diff
+
+    old = get_roadmap_version(roadmap_id, from_version)
+    if to_version is None:
+        new = snapshot_roadmap(roadmap_id)
+    else:
+        new = get_roadmap_version(roadmap_id, to_version)
+    if old is None or new is None:
+        return None
+
+    diff = diff_snapshots(old, new)
+    diff_cache.put(key, diff)
+    return diff
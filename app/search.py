@@ -0,0 +1,479 @@
+"""
+Full-text search over roadmaps and their nodes.
+
+One document is indexed per roadmap (title, description and tags) and per
+node (title, description and resource link titles). The index lives in the
+database when it can: an FTS5 virtual table on SQLite and a tsvector column
+with a GIN index on PostgreSQL. Other databases, or SQLite builds without
+FTS5, fall back to an in-memory inverted index kept by each worker.
+
+The index is updated by the importers and the version restore path through
+``search_index.index_roadmap``; callers commit as usual. The index tables
+are created and filled by a migration or ``flask search-reindex``, never
+during a request. Until then searches use the in-memory index.
+"""
+
+import math
+import re
+import threading
+from collections import defaultdict, namedtuple
+from bisect import bisect_left
+from flask import current_app
+from markupsafe import Markup, escape
+from sqlalchemy import text, select
+from app import db
+from app.catalog import VersionCounter
+
+SearchHit = namedtuple('SearchHit', ['roadmap_id', 'node_id', 'title', 'snippet', 'score'])
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+# Markers used to highlight matches before the snippet is HTML-escaped
+HIGHLIGHT_START = '\x02'
+HIGHLIGHT_END = '\x03'
+
+def tokenize(value):
+    """Split text into lowercase search terms"""
+    return TOKEN_RE.findall(value.lower()) if value else []
+
+def highlight(snippet):
+    """Escape a snippet and turn the highlight markers into <mark> tags"""
+    escaped = str(escape(snippet or ''))
+    escaped = escaped.replace(HIGHLIGHT_START, '<mark>').replace(HIGHLIGHT_END, '</mark>')
+    return Markup(escaped)
+
+def iter_documents(roadmap_ids=None, connection=None):
+    """
+    Yield (roadmap_id, node_id, title, body) tuples for indexing
+
+    Args:
+        roadmap_ids (list, optional): Only yield documents for these roadmaps
+        connection (Connection, optional): Read through this connection
+            instead of the session
+
+    Yields:
+        tuple: One document per roadmap (node_id is None) and per node
+    """
+    from app.models import Roadmap, RoadmapNode, NodeLink
+
+    roadmap_query = select(Roadmap.id, Roadmap.title, Roadmap.description, Roadmap.tags)
+    node_query = select(RoadmapNode.roadmap_id, RoadmapNode.id, RoadmapNode.title,
+                        RoadmapNode.description)
+    link_query = (
+        select(NodeLink.node_id, NodeLink.title)
+        .join(RoadmapNode, RoadmapNode.id == NodeLink.node_id)
+        .where(NodeLink.title != '')
+        .order_by(NodeLink.node_id, NodeLink.position)
+    )
+    if roadmap_ids is not None:
+        roadmap_query = roadmap_query.where(Roadmap.id.in_(roadmap_ids))
+        node_query = node_query.where(RoadmapNode.roadmap_id.in_(roadmap_ids))
+        link_query = link_query.where(RoadmapNode.roadmap_id.in_(roadmap_ids))
+
+    executor = connection if connection is not None else db.session
+    for roadmap_id, title, description, tags in executor.execute(roadmap_query):
+        body = description or ''
+        if tags:
+            body = f"{body}\n{tags.replace(',', ', ')}"
+        yield roadmap_id, None, title, body
+
+    link_titles = {}
+    for node_id, link_title in executor.execute(link_query):
+        link_titles.setdefault(node_id, []).append(link_title)
+
+    for roadmap_id, node_id, title, description in executor.execute(node_query):
+        body = '\n'.join([description or ''] + link_titles.get(node_id, []))
+        yield roadmap_id, node_id, title, body
+
+
+class DatabaseBackend:
+    """
+    Index stored in the database
+
+    Statements run in the session, so index updates commit with the
+    caller's changes, or through a connection when one is given.
+    """
+
+    def __init__(self, connection=None):
+        self.connection = connection
+
+    def execute(self, statement, params=None):
+        executor = self.connection if self.connection is not None else db.session
+        return executor.execute(statement, params)
+
+    def is_supported(self):
+        return True
+
+
+class SQLiteBackend(DatabaseBackend):
+    """FTS5 virtual table ranked with bm25()"""
+
+    name = 'fts5'
+
+    def is_supported(self):
+        return bool(self.execute(text("SELECT sqlite_compileoption_used('ENABLE_FTS5')")).scalar())
+
+    def create_schema(self):
+        self.execute(text(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5("
+            "roadmap_id UNINDEXED, node_id UNINDEXED, title, body, "
+            "tokenize = 'porter unicode61')"
+        ))
+
+    def has_schema(self):
+        return self.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'search_index'"
+        )).first() is not None
+
+    def clear(self, roadmap_ids=None):
+        if roadmap_ids is None:
+            self.execute(text("DELETE FROM search_index"))
+        else:
+            for roadmap_id in roadmap_ids:
+                self.execute(text("DELETE FROM search_index WHERE roadmap_id = :roadmap_id"),
+                                   {'roadmap_id': roadmap_id})
+
+    def add(self, documents):
+        rows = [{'roadmap_id': r, 'node_id': n, 'title': t, 'body': b} for r, n, t, b in documents]
+        if rows:
+            self.execute(text(
+                "INSERT INTO search_index (roadmap_id, node_id, title, body) "
+                "VALUES (:roadmap_id, :node_id, :title, :body)"
+            ), rows)
+
+    def build_query(self, query):
+        # Quote every term so user input can't inject FTS5 syntax, and match
+        # on prefixes so results appear while a word is still being typed
+        terms = tokenize(query)
+        return ' '.join(f'"{term}"*' for term in terms)
+
+    def search(self, query, limit):
+        match = self.build_query(query)
+        if not match:
+            return []
+
+        rows = self.execute(text(
+            "SELECT roadmap_id, node_id, title, "
+            "snippet(search_index, 3, :start, :end, '…', 16) AS snippet, "
+            "bm25(search_index, 0, 0, 10.0, 1.0) AS rank "
+            "FROM search_index WHERE search_index MATCH :match "
+            "ORDER BY rank LIMIT :limit"
+        ), {'start': HIGHLIGHT_START, 'end': HIGHLIGHT_END, 'match': match, 'limit': limit})
+
+        # bm25() is lower-is-better; flip it so every backend sorts descending
+        return [SearchHit(r.roadmap_id, r.node_id, r.title, highlight(r.snippet), -r.rank)
+                for r in rows]
+
+
+class PostgresBackend(DatabaseBackend):
+    """Weighted tsvector column with a GIN index, ranked with ts_rank_cd()"""
+
+    name = 'postgres'
+
+    def create_schema(self):
+        self.execute(text(
+            "CREATE TABLE IF NOT EXISTS search_document ("
+            "id SERIAL PRIMARY KEY, "
+            "roadmap_id VARCHAR(50) NOT NULL, "
+            "node_id VARCHAR(50), "
+            "title TEXT NOT NULL, "
+            "body TEXT NOT NULL, "
+            "tsv tsvector GENERATED ALWAYS AS ("
+            "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+            "setweight(to_tsvector('english', coalesce(body, '')), 'B')) STORED)"
+        ))
+        self.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_search_document_tsv ON search_document USING GIN (tsv)"
+        ))
+        self.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_search_document_roadmap_id ON search_document (roadmap_id)"
+        ))
+
+    def has_schema(self):
+        return self.execute(text(
+            "SELECT to_regclass('search_document') IS NOT NULL"
+        )).scalar()
+
+    def clear(self, roadmap_ids=None):
+        if roadmap_ids is None:
+            self.execute(text("TRUNCATE search_document"))
+        else:
+            self.execute(text("DELETE FROM search_document WHERE roadmap_id = ANY(:roadmap_ids)"),
+                               {'roadmap_ids': list(roadmap_ids)})
+
+    def add(self, documents):
+        rows = [{'roadmap_id': r, 'node_id': n, 'title': t, 'body': b} for r, n, t, b in documents]
+        if rows:
+            self.execute(text(
+                "INSERT INTO search_document (roadmap_id, node_id, title, body) "
+                "VALUES (:roadmap_id, :node_id, :title, :body)"
+            ), rows)
+
+    def search(self, query, limit):
+        if not tokenize(query):
+            return []
+
+        options = f'StartSel={HIGHLIGHT_START}, StopSel={HIGHLIGHT_END}, MaxWords=30, MinWords=15'
+        rows = self.execute(text(
+            "SELECT roadmap_id, node_id, title, "
+            "ts_headline('english', body, q, :options) AS snippet, "
+            "ts_rank_cd(tsv, q) AS rank "
+            "FROM search_document, websearch_to_tsquery('english', :query) AS q "
+            "WHERE tsv @@ q ORDER BY rank DESC LIMIT :limit"
+        ), {'options': options, 'query': query, 'limit': limit})
+
+        return [SearchHit(r.roadmap_id, r.node_id, r.title, highlight(r.snippet), r.rank)
+                for r in rows]
+
+
+class PythonBackend:
+    """
+    In-memory BM25 inverted index
+
+    Each worker builds its own copy from the database and rebuilds it when
+    the shared 'search' version counter changes.
+    """
+
+    name = 'python'
+
+    k1 = 1.2
+    b = 0.75
+    title_weight = 3
+    snippet_words = 24
+
+    def __init__(self):
+        self.counter = VersionCounter('search')
+        self._lock = threading.Lock()
+        self._version = None
+        self._documents = []
+        self._postings = {}
+        self._vocabulary = []
+        self._lengths = []
+        self._average_length = 0
+
+    def create_schema(self):
+        pass
+
+    def has_schema(self):
+        return True
+
+    def clear(self, roadmap_ids=None):
+        self.counter.bump()
+
+    def add(self, documents):
+        # Documents are read back from the database on the next rebuild
+        pass
+
+    def _build(self):
+        documents = list(iter_documents())
+        postings = defaultdict(dict)
+        lengths = []
+
+        for doc_index, (_, _, title, body) in enumerate(documents):
+            frequencies = defaultdict(int)
+            for term in tokenize(title):
+                frequencies[term] += self.title_weight
+            for term in tokenize(body):
+                frequencies[term] += 1
+            for term, frequency in frequencies.items():
+                postings[term][doc_index] = frequency
+            lengths.append(sum(frequencies.values()))
+
+        return documents, dict(postings), lengths
+
+    def _ensure_fresh(self):
+        version = self.counter.current()
+        if version == self._version:
+            return
+
+        documents, postings, lengths = self._build()
+        with self._lock:
+            self._version = version
+            self._documents = documents
+            self._postings = postings
+            self._vocabulary = sorted(postings)
+            self._lengths = lengths
+            self._average_length = sum(lengths) / len(lengths) if lengths else 0
+
+    def _expand(self, term):
+        """Return every indexed term that starts with the given prefix"""
+        vocabulary = self._vocabulary
+        start = bisect_left(vocabulary, term)
+        matches = []
+        for candidate in vocabulary[start:]:
+            if not candidate.startswith(term):
+                break
+            matches.append(candidate)
+        return matches
+
+    def _snippet(self, body, pattern):
+        words = body.split()
+        if not words:
+            return Markup('')
+
+        hit = next((i for i, word in enumerate(words) if pattern.search(word)), 0)
+        start = max(hit - self.snippet_words // 3, 0)
+        snippet = ' '.join(words[start:start + self.snippet_words])
+        snippet = pattern.sub(lambda m: f'{HIGHLIGHT_START}{m.group(0)}{HIGHLIGHT_END}', snippet)
+
+        if start > 0:
+            snippet = '…' + snippet
+        if start + self.snippet_words < len(words):
+            snippet = snippet + '…'
+        return highlight(snippet)
+
+    def search(self, query, limit):
+        terms = tokenize(query)
+        if not terms:
+            return []
+
+        self._ensure_fresh()
+        total = len(self._documents)
+        scores = None
+
+        # Every query term (as a prefix) must match, as with FTS5
+        for term in terms:
+            term_scores = defaultdict(float)
+            for expanded in self._expand(term):
+                postings = self._postings[expanded]
+                idf = math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_index, frequency in postings.items():
+                    length_norm = 1 - self.b + self.b * self._lengths[doc_index] / self._average_length
+                    term_scores[doc_index] += idf * frequency * (self.k1 + 1) / (frequency + self.k1 * length_norm)
+
+            if scores is None:
+                scores = term_scores
+            else:
+                scores = {i: s + term_scores[i] for i, s in scores.items() if i in term_scores}
+            if not scores:
+                return []
+
+        pattern = re.compile(r'\b(?:%s)\w*' % '|'.join(re.escape(term) for term in terms), re.IGNORECASE)
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:limit]
+
+        hits = []
+        for doc_index, score in ranked:
+            roadmap_id, node_id, title, body = self._documents[doc_index]
+            hits.append(SearchHit(roadmap_id, node_id, title, self._snippet(body, pattern), score))
+        return hits
+
+
+class SearchIndex:
+    """Picks a backend for the current database and keeps it in sync"""
+
+    backends = {
+        'fts5': SQLiteBackend,
+        'postgres': PostgresBackend,
+        'python': PythonBackend,
+    }
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._backend = None
+
+    def _backend_name(self, dialect):
+        name = current_app.config.get('SEARCH_BACKEND')
+        if name:
+            return name
+        if dialect == 'sqlite':
+            return 'fts5'
+        if dialect == 'postgresql':
+            return 'postgres'
+        return 'python'
+
+    def _choose_backend(self):
+        # Only reads: this can run inside any request's transaction
+        name = self._backend_name(db.engine.dialect.name)
+        backend = self.backends[name]()
+        if backend.has_schema():
+            return backend
+
+        current_app.logger.warning(
+            f"The {name} search index does not exist; searching in memory until "
+            f"'flask db upgrade' or 'flask search-reindex' creates it"
+        )
+        return PythonBackend()
+
+    def build(self, connection):
+        """
+        Create the index tables if needed and fill them
+
+        Runs entirely through the given connection, e.g. a migration's, so
+        no session or request transaction is involved.
+
+        Args:
+            connection (Connection): Connection to the application database
+
+        Returns:
+            str: Name of the backend the index was built for; 'python' when
+                the database can't hold one
+        """
+        name = self._backend_name(connection.dialect.name)
+        if name == 'python':
+            return name
+
+        backend = self.backends[name](connection)
+        if not backend.is_supported():
+            # SQLite compiled without FTS5
+            return 'python'
+
+        backend.create_schema()
+        backend.clear()
+        backend.add(iter_documents(connection=connection))
+        return name
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            with self._lock:
+                if self._backend is None:
+                    self._backend = self._choose_backend()
+        return self._backend
+
+    def search(self, query, limit=50):
+        """
+        Search roadmaps and nodes
+
+        Args:
+            query (str): The user's search terms
+            limit (int, optional): Maximum number of hits
+
+        Returns:
+            list: SearchHit tuples, best match first
+        """
+        return self.backend.search(query, limit)
+
+    def index_roadmap(self, roadmap_id):
+        """
+        Re-index a single roadmap and its nodes in the current transaction
+
+        Args:
+            roadmap_id (str): The ID of the roadmap
+        """
+        self.index_roadmaps([roadmap_id])
+
+    def index_roadmaps(self, roadmap_ids):
+        """Re-index several roadmaps in the current transaction"""
+        roadmap_ids = list(roadmap_ids)
+        if not roadmap_ids:
+            return
+        backend = self.backend
+        backend.clear(roadmap_ids)
+        backend.add(iter_documents(roadmap_ids))
+
+    def rebuild(self):
+        """Create the index if needed and re-index every roadmap, in its own transaction"""
+        with db.engine.begin() as connection:
+            name = self.build(connection)
+
+        if name == 'python':
+            # Let every worker rebuild its in-memory index
+            PythonBackend().clear()
+            db.session.commit()
+
+        # Pick the backend again now that the index may exist
+        with self._lock:
+            self._backend = None
+
+# Create a singleton instance
+search_index = SearchIndex()
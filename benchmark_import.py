@@ -0,0 +1,79 @@
+"""
+Compare serial and parallel ingestion of roadmap_data.
+
+Parses the full data directory with one process and with a process pool,
+then imports it into a throwaway SQLite database both ways:
+
+    python benchmark_import.py --workers 4 --repeat 3
+"""
+
+import os
+import sys
+import time
+import argparse
+import shutil
+import tempfile
+
+def best_of(repeat, func):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - started)
+    return min(timings), result
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark roadmap_data ingestion')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='processes for the parallel runs (default: one per CPU)')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per measurement, best is reported')
+    parser.add_argument('--data-dir', default=None, help='directory holding the JSON files')
+    parser.add_argument('--no-orjson', action='store_true', help='parse with the standard json module')
+    args = parser.parse_args()
+
+    # Import into a scratch database, never the configured one
+    scratch = tempfile.mkdtemp(prefix='edgeroute-bench-')
+    os.environ['TEST_DATABASE_URL'] = 'sqlite:///' + os.path.join(scratch, 'bench.db')
+    sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+    from app import create_app, db
+    from app.roadmap import loader
+    from app.roadmap.importer import sync_roadmaps
+
+    if args.no_orjson:
+        loader.orjson = None
+
+    data_dir = args.data_dir or loader.default_data_dir()
+    files = [name for name in os.listdir(data_dir) if name.endswith('.json')]
+    workers = args.workers or loader.default_workers(len(files))
+    size = sum(os.path.getsize(os.path.join(data_dir, name)) for name in files)
+
+    print(f"{len(files)} files, {size / 1024 / 1024:.1f} MB, "
+          f"parser: {'orjson' if loader.orjson else 'json'}, {workers} workers")
+
+    serial, records = best_of(args.repeat, lambda: loader.load_roadmap_records(data_dir, workers=1))
+    parallel, _ = best_of(args.repeat, lambda: loader.load_roadmap_records(data_dir, workers=workers))
+    nodes = sum(len(record.nodes or []) for record in records)
+    print(f"Parse {len(records)} roadmaps / {nodes} nodes:")
+    print(f"  serial   {serial:.3f}s")
+    print(f"  parallel {parallel:.3f}s ({serial / parallel:.2f}x)")
+
+    app = create_app('testing')
+    with app.app_context():
+        def fresh_import(worker_count):
+            db.drop_all()
+            db.create_all()
+            return sync_roadmaps(data_dir, workers=worker_count)
+
+        serial, report = best_of(args.repeat, lambda: fresh_import(1))
+        parallel, _ = best_of(args.repeat, lambda: fresh_import(workers))
+        print(f"Full import into an empty database ({report.summary()}):")
+        print(f"  serial   {serial:.3f}s")
+        print(f"  parallel {parallel:.3f}s ({serial / parallel:.2f}x)")
+
+        db.session.remove()
+
+    shutil.rmtree(scratch, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+"""
+Measure login throughput, and how much a burst of logins slows other requests.
+
+Creates users in a throwaway SQLite database, then sends concurrent
+POST /auth/login requests from several threads, each with its own client,
+while one more thread keeps requesting a cheap page. This runs once with
+bcrypt in the request thread and once on the password hashing pool:
+
+    python benchmark_login.py --logins 64 --concurrency 8 --workers 2
+"""
+
+import os
+import sys
+import time
+import argparse
+import shutil
+import tempfile
+import threading
+
+def percentile(samples, fraction):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))] * 1000 if samples else 0.0
+
+def run_burst(app, emails, password, logins, concurrency, probe_path):
+    """
+    Send logins from concurrency threads while probing probe_path
+
+    Returns:
+        tuple: (seconds, login latencies, probe latencies, failed logins)
+    """
+    login_times, probe_times, failures = [], [], []
+    lock = threading.Lock()
+    done = threading.Event()
+    next_login = iter(range(logins))
+
+    def log_in():
+        while True:
+            with lock:
+                number = next(next_login, None)
+            if number is None:
+                return
+            # A new client per login, so every request starts logged out
+            client = app.test_client()
+            started = time.perf_counter()
+            response = client.post('/auth/login', data={
+                'email': emails[number % len(emails)], 'password': password
+            })
+            elapsed = time.perf_counter() - started
+            with lock:
+                login_times.append(elapsed)
+                if response.status_code != 302:
+                    failures.append(response.status_code)
+
+    def probe():
+        client = app.test_client()
+        while not done.is_set():
+            started = time.perf_counter()
+            client.get(probe_path)
+            probe_times.append(time.perf_counter() - started)
+            time.sleep(0.01)
+
+    prober = threading.Thread(target=probe)
+    prober.start()
+    threads = [threading.Thread(target=log_in) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - started
+    done.set()
+    prober.join()
+    return seconds, login_times, probe_times, failures
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark login throughput under concurrency')
+    parser.add_argument('--logins', type=int, default=64, help='logins per run')
+    parser.add_argument('--concurrency', type=int, default=8, help='threads sending logins')
+    parser.add_argument('--workers', type=int, default=2, help='hashing processes for the pooled run')
+    parser.add_argument('--rounds', type=int, default=12, help='bcrypt cost of the stored hashes')
+    parser.add_argument('--users', type=int, default=16, help='users to log in as')
+    parser.add_argument('--probe', default='/about', help='page requested during the burst')
+    args = parser.parse_args()
+
+    # Work in a scratch database, never the configured one
+    scratch = tempfile.mkdtemp(prefix='edgeroute-bench-')
+    os.environ['TEST_DATABASE_URL'] = 'sqlite:///' + os.path.join(scratch, 'bench.db')
+    sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+    from app import create_app, db
+    from app.models import User
+    from app.passwords import password_hasher
+
+    app = create_app('testing')
+    app.config.update(WTF_CSRF_ENABLED=False, BCRYPT_LOG_ROUNDS=args.rounds,
+                      PASSWORD_HASH_MAX_QUEUE=max(args.concurrency, 1) * 2)
+    password = 'correct horse battery staple'
+
+    with app.app_context():
+        db.create_all()
+        password_hasher.init_app(app)
+        emails = []
+        for number in range(args.users):
+            user = User(username=f'bench{number}', email=f'bench{number}@example.com')
+            user.password = password
+            db.session.add(user)
+            emails.append(user.email)
+        db.session.commit()
+        db.session.remove()
+
+    print(f"{args.logins} logins from {args.concurrency} threads, bcrypt cost {args.rounds}, "
+          f"{os.cpu_count()} CPUs, probing {args.probe}")
+    results = {}
+    for label, workers in (('inline', 0), (f'pool x{args.workers}', args.workers)):
+        app.config['PASSWORD_HASH_WORKERS'] = workers
+        password_hasher.init_app(app)
+        # Start the pool before timing
+        password_hasher.check(password_hasher.hash(password), password)
+        seconds, login_times, probe_times, failures = run_burst(
+            app, emails, password, args.logins, args.concurrency, args.probe)
+        results[label] = args.logins / seconds
+        print(f"  {label:<8} {args.logins / seconds:7.1f} logins/s  "
+              f"login p50 {percentile(login_times, 0.5):7.1f} ms  p95 {percentile(login_times, 0.95):7.1f} ms  "
+              f"{args.probe} p50 {percentile(probe_times, 0.5):6.1f} ms  p95 {percentile(probe_times, 0.95):6.1f} ms"
+              + (f"  ({len(failures)} failed: {sorted(set(failures))})" if failures else ''))
+
+    password_hasher.close()
+    shutil.rmtree(scratch, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
@@ -16,6 +16,19 @@ class Config:
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     REMEMBER_COOKIE_DURATION = timedelta(days=14)
 
+    # Seconds each worker may serve a logged-in user's identity from memory
+    # instead of loading it per request (0 disables the cache)
+    USER_CACHE_TTL = int(os.environ.get('USER_CACHE_TTL', 60))
+
+    # Password hashing: bcrypt cost (existing hashes are upgraded at login),
+    # hashing processes per worker (0 hashes inline), the most hashes allowed
+    # to wait or run at once, and the seconds one may take, before sign-ins
+    # get a 503
+    BCRYPT_LOG_ROUNDS = int(os.environ.get('BCRYPT_LOG_ROUNDS', 12))
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 2))
+    PASSWORD_HASH_MAX_QUEUE = int(os.environ.get('PASSWORD_HASH_MAX_QUEUE', 32))
+    PASSWORD_HASH_TIMEOUT = float(os.environ.get('PASSWORD_HASH_TIMEOUT', 30))
+
     # Auth0 configuration
     USE_AUTH0 = os.environ.get('USE_AUTH0', 'false').lower() == 'true'
     AUTH0_DOMAIN = os.environ.get('AUTH0_DOMAIN')
@@ -30,6 +43,31 @@ class Config:
     APPWRITE_API_KEY = os.environ.get('APPWRITE_API_KEY')
     APPWRITE_DATABASE_ID = os.environ.get('APPWRITE_DATABASE_ID', 'edgeroute')
 
+    # Appwrite document cache: 'memory' (per worker), 'none' or a redis:// URL.
+    # APPWRITE_CACHE_TTLS overrides the per-collection TTLs, e.g. 'users=30,roadmaps=600'
+    APPWRITE_CACHE = os.environ.get('APPWRITE_CACHE', 'memory')
+    APPWRITE_CACHE_SIZE = int(os.environ.get('APPWRITE_CACHE_SIZE', 10000))
+    APPWRITE_CACHE_TTLS = os.environ.get('APPWRITE_CACHE_TTLS')
+    APPWRITE_CACHE_NEGATIVE_TTL = int(os.environ.get('APPWRITE_CACHE_NEGATIVE_TTL', 30))
+
+    # Appwrite HTTP connections, pooled and kept alive per worker process
+    APPWRITE_POOL_SIZE = int(os.environ.get('APPWRITE_POOL_SIZE', 10))
+    APPWRITE_CONNECT_TIMEOUT = float(os.environ.get('APPWRITE_CONNECT_TIMEOUT', 3.05))
+    APPWRITE_READ_TIMEOUT = float(os.environ.get('APPWRITE_READ_TIMEOUT', 30))
+    APPWRITE_KEEP_ALIVE = os.environ.get('APPWRITE_KEEP_ALIVE', 'true').lower() == 'true'
+    APPWRITE_GZIP_REQUESTS = os.environ.get('APPWRITE_GZIP_REQUESTS', 'false').lower() == 'true'
+
+    # Seconds clients and CDNs may cache public API responses
+    API_CACHE_MAX_AGE = int(os.environ.get('API_CACHE_MAX_AGE', 300))
+
+    # Search backend: 'fts5', 'postgres' or 'python' (chosen from the database if unset)
+    SEARCH_BACKEND = os.environ.get('SEARCH_BACKEND')
+
+    # Per-request SQL profiling: Server-Timing header and a JSON log line
+    # listing statements run at least SQL_PROFILER_REPEAT_THRESHOLD times
+    SQL_PROFILER = os.environ.get('SQL_PROFILER', 'false').lower() == 'true'
+    SQL_PROFILER_REPEAT_THRESHOLD = int(os.environ.get('SQL_PROFILER_REPEAT_THRESHOLD', 3))
+
     # Security headers
     SECURITY_HEADERS = {
         'Content-Security-Policy': "default-src 'self'; script-src 'self' 'unsafe-inline' https://cdn.jsdelivr.net; style-src 'self' 'unsafe-inline' https://cdn.jsdelivr.net; font-src 'self' https://cdn.jsdelivr.net; img-src 'self' data:;",
@@ -1,5 +1,6 @@
 import os
 import sys
+import argparse
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -13,9 +14,12 @@ sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
 
 # Import Flask app and models
 from app import create_app
-from app.appwrite.utils import setup_appwrite_collections, import_roadmaps_to_appwrite
+from app.appwrite.utils import setup_appwrite_collections
+from app.appwrite.importer import import_roadmaps_to_appwrite
 
-def main():
+DEFAULT_CHECKPOINT = os.path.join(os.path.abspath(os.path.dirname(__file__)), '.appwrite-import-checkpoint.json')
+
+def main(workers=None, concurrency=8, checkpoint=DEFAULT_CHECKPOINT, retries=5):
     """Import data to Appwrite"""
     print("Starting import to Appwrite...")
     
@@ -33,13 +37,25 @@ def main():
         
         # Import roadmaps
         print("Importing roadmaps to Appwrite...")
-        if import_roadmaps_to_appwrite():
+        report = import_roadmaps_to_appwrite(workers=workers, concurrency=concurrency,
+                                             checkpoint=checkpoint, retries=retries)
+        if not report.failed:
             print("Roadmaps imported successfully")
         else:
-            print("Failed to import roadmaps")
+            print(f"Failed to import {len(report.failed)} documents; run again to resume")
             return
     
     print("Import to Appwrite completed successfully")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description='Import roadmap_data into Appwrite')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='processes used to parse the JSON files (default: one per CPU)')
+    parser.add_argument('--concurrency', type=int, default=8,
+                        help='Appwrite requests in flight at once (default: 8)')
+    parser.add_argument('--retries', type=int, default=5,
+                        help='retries per request on 429, 5xx and connection errors (default: 5)')
+    parser.add_argument('--checkpoint', default=DEFAULT_CHECKPOINT,
+                        help='file recording finished roadmaps, so an interrupted import can resume')
+    args = parser.parse_args()
+    main(workers=args.workers, concurrency=args.concurrency, checkpoint=args.checkpoint, retries=args.retries)
@@ -0,0 +1,59 @@
+"""Make progress rows unique per user and node
+
+Batch progress updates upsert on (user_id, node_id), which needs a unique
+constraint on those columns. Duplicated rows are removed first, keeping the
+newest row of each pair. Skipped when the constraint already exists, e.g. in
+databases created with db.create_all().
+
+Revision ID: 2a6f8d0c4e17
+Revises: 
+Create Date: 2026-10-18 09:58:14.603271
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2a6f8d0c4e17'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+user_progress = sa.table(
+    'user_progress',
+    sa.column('id', sa.Integer),
+    sa.column('user_id', sa.Integer),
+    sa.column('node_id', sa.String)
+)
+
+
+def _unique_names():
+    inspector = sa.inspect(op.get_bind())
+    if 'user_progress' not in inspector.get_table_names():
+        return None
+    return {constraint['name'] for constraint in inspector.get_unique_constraints('user_progress')}
+
+
+def upgrade():
+    unique_names = _unique_names()
+    if unique_names is None or 'uq_user_progress_user_node' in unique_names:
+        return
+
+    # Keep the newest row of any duplicated (user, node) pair
+    newest = (
+        sa.select(sa.func.max(user_progress.c.id))
+        .group_by(user_progress.c.user_id, user_progress.c.node_id)
+    )
+    op.get_bind().execute(user_progress.delete().where(user_progress.c.id.not_in(newest)))
+    with op.batch_alter_table('user_progress') as batch_op:
+        batch_op.create_unique_constraint('uq_user_progress_user_node', ['user_id', 'node_id'])
+
+
+def downgrade():
+    unique_names = _unique_names()
+    if unique_names is None or 'uq_user_progress_user_node' not in unique_names:
+        return
+
+    with op.batch_alter_table('user_progress') as batch_op:
+        batch_op.drop_constraint('uq_user_progress_user_node', type_='unique')
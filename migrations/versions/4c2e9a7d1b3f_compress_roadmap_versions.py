@@ -0,0 +1,109 @@
+"""Store roadmap versions as compressed keyframes and deltas
+
+Revision ID: 4c2e9a7d1b3f
+Revises: 2a6f8d0c4e17
+Create Date: 2026-10-18 10:12:41.318204
+
+"""
+import json
+from alembic import op
+import sqlalchemy as sa
+from app.roadmap.version_store import encode_version, decompress, apply_delta
+
+
+# revision identifiers, used by Alembic.
+revision = '4c2e9a7d1b3f'
+down_revision = '2a6f8d0c4e17'
+branch_labels = None
+depends_on = None
+
+roadmap_version = sa.table(
+    'roadmap_version',
+    sa.column('id', sa.Integer),
+    sa.column('roadmap_id', sa.String),
+    sa.column('version_number', sa.Integer),
+    sa.column('data', sa.Text),
+    sa.column('is_keyframe', sa.Boolean),
+    sa.column('payload', sa.LargeBinary)
+)
+
+
+def _columns():
+    inspector = sa.inspect(op.get_bind())
+    if 'roadmap_version' not in inspector.get_table_names():
+        return None
+    return {column['name'] for column in inspector.get_columns('roadmap_version')}
+
+
+def _update_rows(updates):
+    if updates:
+        op.get_bind().execute(
+            roadmap_version.update().where(roadmap_version.c.id == sa.bindparam('_id')),
+            updates
+        )
+
+
+def upgrade():
+    # Databases created with db.create_all() already have the new layout
+    columns = _columns()
+    if columns is None or 'payload' in columns:
+        return
+
+    with op.batch_alter_table('roadmap_version') as batch_op:
+        batch_op.add_column(sa.Column('is_keyframe', sa.Boolean(), nullable=True))
+        batch_op.add_column(sa.Column('payload', sa.LargeBinary(), nullable=True))
+
+    rows = op.get_bind().execute(
+        sa.select(roadmap_version.c.id, roadmap_version.c.roadmap_id, roadmap_version.c.data)
+        .order_by(roadmap_version.c.roadmap_id, roadmap_version.c.version_number)
+    ).all()
+
+    updates = []
+    current_roadmap = previous = None
+    deltas_since_keyframe = 0
+    for row in rows:
+        if row.roadmap_id != current_roadmap:
+            current_roadmap, previous, deltas_since_keyframe = row.roadmap_id, None, 0
+        snapshot = json.loads(row.data)
+        is_keyframe, payload = encode_version(previous, snapshot, deltas_since_keyframe)
+        deltas_since_keyframe = 0 if is_keyframe else deltas_since_keyframe + 1
+        updates.append({'_id': row.id, 'is_keyframe': is_keyframe, 'payload': payload})
+        previous = snapshot
+    _update_rows(updates)
+
+    with op.batch_alter_table('roadmap_version') as batch_op:
+        batch_op.alter_column('is_keyframe', existing_type=sa.Boolean(), nullable=False)
+        batch_op.alter_column('payload', existing_type=sa.LargeBinary(), nullable=False)
+        batch_op.drop_column('data')
+
+
+def downgrade():
+    columns = _columns()
+    if columns is None or 'data' in columns:
+        return
+
+    with op.batch_alter_table('roadmap_version') as batch_op:
+        batch_op.add_column(sa.Column('data', sa.Text(), nullable=True))
+
+    rows = op.get_bind().execute(
+        sa.select(roadmap_version.c.id, roadmap_version.c.roadmap_id,
+                  roadmap_version.c.is_keyframe, roadmap_version.c.payload)
+        .order_by(roadmap_version.c.roadmap_id, roadmap_version.c.version_number)
+    ).all()
+
+    updates = []
+    current_roadmap = snapshot = None
+    for row in rows:
+        value = decompress(row.payload)
+        if row.roadmap_id != current_roadmap or row.is_keyframe:
+            snapshot = value
+        else:
+            snapshot = apply_delta(snapshot, value)
+        current_roadmap = row.roadmap_id
+        updates.append({'_id': row.id, 'data': json.dumps(snapshot)})
+    _update_rows(updates)
+
+    with op.batch_alter_table('roadmap_version') as batch_op:
+        batch_op.alter_column('data', existing_type=sa.Text(), nullable=False)
+        batch_op.drop_column('payload')
+        batch_op.drop_column('is_keyframe')
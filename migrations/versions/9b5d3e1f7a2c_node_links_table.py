@@ -0,0 +1,117 @@
+"""Move node resource links from JSON columns into the node_link table
+
+Revision ID: 9b5d3e1f7a2c
+Revises: 4c2e9a7d1b3f
+Create Date: 2026-10-18 14:03:27.552190
+
+"""
+import json
+from alembic import op
+import sqlalchemy as sa
+from app.roadmap.loader import link_rows
+
+
+# revision identifiers, used by Alembic.
+revision = '9b5d3e1f7a2c'
+down_revision = '4c2e9a7d1b3f'
+branch_labels = None
+depends_on = None
+
+node_link = sa.table(
+    'node_link',
+    sa.column('node_id', sa.String),
+    sa.column('custom_node_id', sa.String),
+    sa.column('position', sa.Integer),
+    sa.column('title', sa.String),
+    sa.column('url', sa.Text),
+    sa.column('type', sa.String),
+    sa.column('domain', sa.String)
+)
+
+# Owner table -> node_link column pointing at it
+OWNERS = (('roadmap_node', 'node_id'), ('custom_roadmap_node', 'custom_node_id'))
+
+
+def _parse_links(value):
+    try:
+        links = json.loads(value or '[]')
+    except ValueError:
+        return []
+    if not isinstance(links, list):
+        return []
+    return [link for link in links if isinstance(link, dict) and isinstance(link.get('url'), str)]
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    tables = inspector.get_table_names()
+    # Databases created with db.create_all() already have the new layout
+    if 'node_link' in tables or 'roadmap_node' not in tables:
+        return
+
+    op.create_table(
+        'node_link',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('node_id', sa.String(length=50), nullable=True),
+        sa.Column('custom_node_id', sa.String(length=50), nullable=True),
+        sa.Column('position', sa.Integer(), nullable=False),
+        sa.Column('title', sa.String(length=200), nullable=False),
+        sa.Column('url', sa.Text(), nullable=False),
+        sa.Column('type', sa.String(length=20), nullable=False),
+        sa.Column('domain', sa.String(length=255), nullable=False),
+        sa.ForeignKeyConstraint(['node_id'], ['roadmap_node.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['custom_node_id'], ['custom_roadmap_node.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_node_link_node_position', 'node_link', ['node_id', 'position'])
+    op.create_index('ix_node_link_custom_node_position', 'node_link', ['custom_node_id', 'position'])
+    op.create_index('ix_node_link_type_node', 'node_link', ['type', 'node_id'])
+    op.create_index('ix_node_link_domain', 'node_link', ['domain'])
+
+    bind = op.get_bind()
+    for table_name, owner_column in OWNERS:
+        if table_name not in tables:
+            continue
+        if 'links' not in {column['name'] for column in inspector.get_columns(table_name)}:
+            continue
+
+        owner = sa.table(table_name, sa.column('id', sa.String), sa.column('links', sa.Text))
+        rows = []
+        for owner_id, links in bind.execute(sa.select(owner.c.id, owner.c.links).where(owner.c.links.is_not(None))):
+            rows.extend(dict(row, **{owner_column: owner_id}) for row in link_rows(_parse_links(links)))
+        if rows:
+            bind.execute(node_link.insert(), rows)
+
+        with op.batch_alter_table(table_name) as batch_op:
+            batch_op.drop_column('links')
+
+
+def downgrade():
+    inspector = sa.inspect(op.get_bind())
+    if 'node_link' not in inspector.get_table_names():
+        return
+
+    bind = op.get_bind()
+    for table_name, owner_column in OWNERS:
+        with op.batch_alter_table(table_name) as batch_op:
+            batch_op.add_column(sa.Column('links', sa.Text(), nullable=True))
+
+        links = {}
+        owner_id = node_link.c[owner_column]
+        for row in bind.execute(
+            sa.select(owner_id, node_link.c.title, node_link.c.url, node_link.c.type)
+            .where(owner_id.is_not(None))
+            .order_by(owner_id, node_link.c.position)
+        ):
+            links.setdefault(row[0], []).append({'title': row.title, 'url': row.url, 'type': row.type})
+
+        owner = sa.table(table_name, sa.column('id', sa.String), sa.column('links', sa.Text))
+        updates = [{'_id': key, 'links': json.dumps(value)} for key, value in links.items()]
+        if updates:
+            bind.execute(owner.update().where(owner.c.id == sa.bindparam('_id')), updates)
+
+    op.drop_index('ix_node_link_domain', table_name='node_link')
+    op.drop_index('ix_node_link_type_node', table_name='node_link')
+    op.drop_index('ix_node_link_custom_node_position', table_name='node_link')
+    op.drop_index('ix_node_link_node_position', table_name='node_link')
+    op.drop_table('node_link')
@@ -0,0 +1,266 @@
+"""Add the tables and columns introduced since the initial schema
+
+Brings databases created before content hashes, progress counters, related
+roadmaps, shared cache versions, copy-on-write clones and fractional node
+ordering up to date. Every step is skipped when it is already applied, so
+databases created with db.create_all() can be upgraded too.
+
+Revision ID: c3f8a2d6e4b1
+Revises: 9b5d3e1f7a2c
+Create Date: 2026-10-18 15:21:09.874412
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from app.roadmap.ordering import initial_key
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3f8a2d6e4b1'
+down_revision = '9b5d3e1f7a2c'
+branch_labels = None
+depends_on = None
+
+roadmap_node = sa.table(
+    'roadmap_node',
+    sa.column('id', sa.String),
+    sa.column('roadmap_id', sa.String),
+    sa.column('title', sa.String),
+    sa.column('description', sa.Text)
+)
+
+user_progress = sa.table(
+    'user_progress',
+    sa.column('id', sa.Integer),
+    sa.column('user_id', sa.Integer),
+    sa.column('roadmap_id', sa.String),
+    sa.column('node_id', sa.String),
+    sa.column('completed', sa.Boolean),
+    sa.column('date_completed', sa.DateTime)
+)
+
+user_roadmap_stats = sa.table(
+    'user_roadmap_stats',
+    sa.column('user_id', sa.Integer),
+    sa.column('roadmap_id', sa.String),
+    sa.column('completed_count', sa.Integer),
+    sa.column('total_nodes', sa.Integer),
+    sa.column('last_activity', sa.DateTime)
+)
+
+custom_roadmap_node = sa.table(
+    'custom_roadmap_node',
+    sa.column('id', sa.String),
+    sa.column('roadmap_id', sa.String),
+    sa.column('title', sa.String),
+    sa.column('description', sa.Text),
+    sa.column('position', sa.Integer),
+    sa.column('sort_key', sa.String),
+    sa.column('source_node_id', sa.String)
+)
+
+node_link = sa.table(
+    'node_link',
+    sa.column('node_id', sa.String),
+    sa.column('custom_node_id', sa.String),
+    sa.column('position', sa.Integer),
+    sa.column('title', sa.String),
+    sa.column('url', sa.Text),
+    sa.column('type', sa.String),
+    sa.column('domain', sa.String)
+)
+
+
+def _schema():
+    inspector = sa.inspect(op.get_bind())
+    tables = set(inspector.get_table_names())
+    columns = {table: {column['name'] for column in inspector.get_columns(table)} for table in tables}
+    return inspector, tables, columns
+
+
+def _fill_progress_stats():
+    """Same aggregation as app.roadmap.progress.rebuild_user_roadmap_stats"""
+    totals = (
+        sa.select(roadmap_node.c.roadmap_id, sa.func.count(roadmap_node.c.id).label('total_nodes'))
+        .group_by(roadmap_node.c.roadmap_id)
+        .subquery()
+    )
+    aggregate = (
+        sa.select(
+            user_progress.c.user_id,
+            user_progress.c.roadmap_id,
+            sa.func.sum(sa.case((user_progress.c.completed == sa.true(), 1), else_=0)),
+            sa.func.coalesce(sa.func.max(totals.c.total_nodes), 0),
+            sa.func.max(user_progress.c.date_completed)
+        )
+        .outerjoin(totals, totals.c.roadmap_id == user_progress.c.roadmap_id)
+        .group_by(user_progress.c.user_id, user_progress.c.roadmap_id)
+    )
+    op.get_bind().execute(user_roadmap_stats.insert().from_select(
+        ['user_id', 'roadmap_id', 'completed_count', 'total_nodes', 'last_activity'], aggregate
+    ))
+
+
+def upgrade():
+    inspector, tables, columns = _schema()
+    if 'roadmap_node' not in tables:
+        return
+    bind = op.get_bind()
+
+    if 'cache_version' not in tables:
+        op.create_table(
+            'cache_version',
+            sa.Column('name', sa.String(length=50), nullable=False),
+            sa.Column('version', sa.Integer(), nullable=False),
+            sa.PrimaryKeyConstraint('name')
+        )
+
+    if 'related_roadmap' not in tables:
+        op.create_table(
+            'related_roadmap',
+            sa.Column('roadmap_id', sa.String(length=50), nullable=False),
+            sa.Column('rank', sa.Integer(), nullable=False),
+            sa.Column('related_id', sa.String(length=50), nullable=False),
+            sa.Column('score', sa.Float(), nullable=False),
+            sa.ForeignKeyConstraint(['roadmap_id'], ['roadmap.id']),
+            sa.ForeignKeyConstraint(['related_id'], ['roadmap.id']),
+            sa.PrimaryKeyConstraint('roadmap_id', 'rank')
+        )
+
+    if 'content_hash' not in columns['roadmap']:
+        with op.batch_alter_table('roadmap') as batch_op:
+            batch_op.add_column(sa.Column('content_hash', sa.String(length=64), nullable=True))
+
+    # Existing nodes get position 0 and no hash, so the next import rewrites
+    # them in file order
+    with op.batch_alter_table('roadmap_node') as batch_op:
+        if 'position' not in columns['roadmap_node']:
+            batch_op.add_column(sa.Column('position', sa.Integer(), nullable=False, server_default='0'))
+        if 'content_hash' not in columns['roadmap_node']:
+            batch_op.add_column(sa.Column('content_hash', sa.String(length=64), nullable=True))
+
+    # Normally added by 2a6f8d0c4e17; repeated for databases upgraded before
+    # that revision existed
+    unique_names = {constraint['name'] for constraint in inspector.get_unique_constraints('user_progress')}
+    if 'uq_user_progress_user_node' not in unique_names:
+        # Keep the newest row of any duplicated (user, node) pair
+        newest = (
+            sa.select(sa.func.max(user_progress.c.id))
+            .group_by(user_progress.c.user_id, user_progress.c.node_id)
+        )
+        bind.execute(user_progress.delete().where(user_progress.c.id.not_in(newest)))
+        with op.batch_alter_table('user_progress') as batch_op:
+            batch_op.create_unique_constraint('uq_user_progress_user_node', ['user_id', 'node_id'])
+
+    if 'user_roadmap_stats' not in tables:
+        op.create_table(
+            'user_roadmap_stats',
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('roadmap_id', sa.String(length=50), nullable=False),
+            sa.Column('completed_count', sa.Integer(), nullable=False),
+            sa.Column('total_nodes', sa.Integer(), nullable=False),
+            sa.Column('last_activity', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(['user_id'], ['user.id']),
+            sa.ForeignKeyConstraint(['roadmap_id'], ['roadmap.id']),
+            sa.PrimaryKeyConstraint('user_id', 'roadmap_id')
+        )
+        _fill_progress_stats()
+
+    if 'sort_key' not in columns['custom_roadmap_node']:
+        with op.batch_alter_table('custom_roadmap_node') as batch_op:
+            batch_op.add_column(sa.Column('sort_key', sa.String(length=64), nullable=True))
+            batch_op.add_column(sa.Column('source_node_id', sa.String(length=50), nullable=True))
+            batch_op.create_foreign_key('fk_custom_roadmap_node_source_node', 'roadmap_node',
+                                        ['source_node_id'], ['id'])
+            batch_op.alter_column('title', existing_type=sa.String(length=100), nullable=True)
+            batch_op.alter_column('description', existing_type=sa.Text(), nullable=True)
+
+        # Evenly spaced keys in the old position order
+        rows = bind.execute(
+            sa.select(custom_roadmap_node.c.id, custom_roadmap_node.c.roadmap_id)
+            .order_by(custom_roadmap_node.c.roadmap_id, custom_roadmap_node.c.position,
+                      custom_roadmap_node.c.id)
+        ).all()
+        updates, current_roadmap, index = [], None, 0
+        for node_id, roadmap_id in rows:
+            index = index + 1 if roadmap_id == current_roadmap else 0
+            current_roadmap = roadmap_id
+            updates.append({'_id': node_id, 'sort_key': initial_key(index)})
+        if updates:
+            bind.execute(
+                custom_roadmap_node.update().where(custom_roadmap_node.c.id == sa.bindparam('_id')),
+                updates
+            )
+
+        with op.batch_alter_table('custom_roadmap_node') as batch_op:
+            batch_op.alter_column('sort_key', existing_type=sa.String(length=64), nullable=False)
+            batch_op.drop_column('position')
+
+
+def downgrade():
+    inspector, tables, columns = _schema()
+    if 'roadmap_node' not in tables:
+        return
+    bind = op.get_bind()
+
+    if 'sort_key' in columns.get('custom_roadmap_node', ()):
+        with op.batch_alter_table('custom_roadmap_node') as batch_op:
+            batch_op.add_column(sa.Column('position', sa.Integer(), nullable=False, server_default='0'))
+
+        # Copy-on-write clones need their own content again
+        linked = sa.and_(custom_roadmap_node.c.title.is_(None), custom_roadmap_node.c.source_node_id.is_not(None))
+        if 'node_link' in tables:
+            link_columns = ('position', 'title', 'url', 'type', 'domain')
+            bind.execute(node_link.insert().from_select(
+                ('custom_node_id',) + link_columns,
+                sa.select(custom_roadmap_node.c.id, *[node_link.c[column] for column in link_columns])
+                .join(node_link, node_link.c.node_id == custom_roadmap_node.c.source_node_id)
+                .where(linked)
+            ))
+
+        def source_value(column):
+            return (
+                sa.select(roadmap_node.c[column])
+                .where(roadmap_node.c.id == custom_roadmap_node.c.source_node_id)
+                .scalar_subquery()
+            )
+        bind.execute(custom_roadmap_node.update().where(linked).values(
+            title=source_value('title'), description=source_value('description')
+        ))
+
+        rows = bind.execute(
+            sa.select(custom_roadmap_node.c.id, custom_roadmap_node.c.roadmap_id)
+            .order_by(custom_roadmap_node.c.roadmap_id, custom_roadmap_node.c.sort_key,
+                      custom_roadmap_node.c.id)
+        ).all()
+        updates, current_roadmap, index = [], None, 0
+        for node_id, roadmap_id in rows:
+            index = index + 1 if roadmap_id == current_roadmap else 0
+            current_roadmap = roadmap_id
+            updates.append({'_id': node_id, 'position': index})
+        if updates:
+            bind.execute(
+                custom_roadmap_node.update().where(custom_roadmap_node.c.id == sa.bindparam('_id')),
+                updates
+            )
+
+        with op.batch_alter_table('custom_roadmap_node') as batch_op:
+            batch_op.alter_column('title', existing_type=sa.String(length=100), nullable=False)
+            batch_op.alter_column('description', existing_type=sa.Text(), nullable=False)
+            batch_op.drop_constraint('fk_custom_roadmap_node_source_node', type_='foreignkey')
+            batch_op.drop_column('source_node_id')
+            batch_op.drop_column('sort_key')
+
+    for table in ('user_roadmap_stats', 'related_roadmap', 'cache_version'):
+        if table in tables:
+            op.drop_table(table)
+
+    with op.batch_alter_table('roadmap_node') as batch_op:
+        if 'content_hash' in columns['roadmap_node']:
+            batch_op.drop_column('content_hash')
+        if 'position' in columns['roadmap_node']:
+            batch_op.drop_column('position')
+
+    if 'content_hash' in columns['roadmap']:
+        with op.batch_alter_table('roadmap') as batch_op:
+            batch_op.drop_column('content_hash')
@@ -0,0 +1,94 @@
+"""Add composite indexes and unique constraints for the hot query paths
+
+Revision ID: d7e2b5a9c1f3
+Revises: c3f8a2d6e4b1
+Create Date: 2026-10-18 15:48:52.106733
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd7e2b5a9c1f3'
+down_revision = 'c3f8a2d6e4b1'
+branch_labels = None
+depends_on = None
+
+# (index name, table, columns)
+INDEXES = (
+    ('ix_roadmap_node_roadmap_position', 'roadmap_node', ['roadmap_id', 'position', 'id']),
+    ('ix_user_progress_user_roadmap', 'user_progress', ['user_id', 'roadmap_id']),
+    ('ix_user_progress_user_completed', 'user_progress', ['user_id', 'completed', 'date_completed']),
+    ('ix_user_progress_node', 'user_progress', ['node_id']),
+    ('ix_comment_roadmap_date', 'comment', ['roadmap_id', 'date_posted']),
+    ('ix_custom_roadmap_public_user', 'custom_roadmap', ['is_public', 'user_id']),
+    ('ix_custom_roadmap_user', 'custom_roadmap', ['user_id']),
+    ('ix_custom_roadmap_node_roadmap_sort', 'custom_roadmap_node', ['roadmap_id', 'sort_key']),
+    ('ix_custom_roadmap_node_source', 'custom_roadmap_node', ['source_node_id']),
+)
+
+roadmap_version = sa.table(
+    'roadmap_version',
+    sa.column('id', sa.Integer),
+    sa.column('roadmap_id', sa.String),
+    sa.column('version_number', sa.Integer)
+)
+
+
+def _renumber_duplicate_versions():
+    """Give versions that share a number consecutive numbers, keeping their order"""
+    bind = op.get_bind()
+    duplicated = (
+        sa.select(roadmap_version.c.roadmap_id)
+        .group_by(roadmap_version.c.roadmap_id, roadmap_version.c.version_number)
+        .having(sa.func.count() > 1)
+    )
+    rows = bind.execute(
+        sa.select(roadmap_version.c.id, roadmap_version.c.roadmap_id)
+        .where(roadmap_version.c.roadmap_id.in_(duplicated))
+        .order_by(roadmap_version.c.roadmap_id, roadmap_version.c.version_number, roadmap_version.c.id)
+    ).all()
+
+    updates, current_roadmap, number = [], None, 0
+    for version_id, roadmap_id in rows:
+        number = number + 1 if roadmap_id == current_roadmap else 1
+        current_roadmap = roadmap_id
+        updates.append({'_id': version_id, 'version_number': number})
+    if updates:
+        bind.execute(
+            roadmap_version.update().where(roadmap_version.c.id == sa.bindparam('_id')),
+            updates
+        )
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    tables = set(inspector.get_table_names())
+
+    for name, table, columns in INDEXES:
+        if table in tables and name not in {index['name'] for index in inspector.get_indexes(table)}:
+            op.create_index(name, table, columns)
+
+    if 'roadmap_version' in tables:
+        unique_names = {constraint['name'] for constraint in inspector.get_unique_constraints('roadmap_version')}
+        if 'uq_roadmap_version_roadmap_number' not in unique_names:
+            _renumber_duplicate_versions()
+            with op.batch_alter_table('roadmap_version') as batch_op:
+                batch_op.create_unique_constraint('uq_roadmap_version_roadmap_number',
+                                                  ['roadmap_id', 'version_number'])
+
+
+def downgrade():
+    inspector = sa.inspect(op.get_bind())
+    tables = set(inspector.get_table_names())
+
+    if 'roadmap_version' in tables:
+        unique_names = {constraint['name'] for constraint in inspector.get_unique_constraints('roadmap_version')}
+        if 'uq_roadmap_version_roadmap_number' in unique_names:
+            with op.batch_alter_table('roadmap_version') as batch_op:
+                batch_op.drop_constraint('uq_roadmap_version_roadmap_number', type_='unique')
+
+    for name, table, columns in reversed(INDEXES):
+        if table in tables and name in {index['name'] for index in inspector.get_indexes(table)}:
+            op.drop_index(name, table_name=table)
@@ -0,0 +1,37 @@
+"""Create and fill the full-text search index
+
+The index tables are not models; app.search creates them for the database
+in use (an FTS5 table on SQLite, a tsvector table on PostgreSQL) and fills
+them from the roadmaps already imported. Other databases keep searching
+with the in-memory index and need nothing here.
+
+Revision ID: e1b7c4a9d2f6
+Revises: d7e2b5a9c1f3
+Create Date: 2026-10-18 19:02:37.540913
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from app.search import search_index
+
+
+# revision identifiers, used by Alembic.
+revision = 'e1b7c4a9d2f6'
+down_revision = 'd7e2b5a9c1f3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    if 'roadmap' not in sa.inspect(bind).get_table_names():
+        return
+    search_index.build(bind)
+
+
+def downgrade():
+    bind = op.get_bind()
+    tables = set(sa.inspect(bind).get_table_names())
+    for table in ('search_index', 'search_document'):
+        if table in tables:
+            op.execute(f'DROP TABLE {table}')
@@ -0,0 +1,37 @@
+"""Index the progress counters by roadmap
+
+Imports and restores update the counters of every user of a roadmap, which
+the (user_id, roadmap_id) primary key cannot find without a full scan.
+
+Revision ID: f4a1c8e2b7d9
+Revises: e1b7c4a9d2f6
+Create Date: 2026-10-18 21:14:09.318274
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f4a1c8e2b7d9'
+down_revision = 'e1b7c4a9d2f6'
+branch_labels = None
+depends_on = None
+
+
+def _index_names(inspector):
+    return {index['name'] for index in inspector.get_indexes('user_roadmap_stats')}
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    if 'user_roadmap_stats' in inspector.get_table_names() and \
+            'ix_user_roadmap_stats_roadmap' not in _index_names(inspector):
+        op.create_index('ix_user_roadmap_stats_roadmap', 'user_roadmap_stats', ['roadmap_id'])
+
+
+def downgrade():
+    inspector = sa.inspect(op.get_bind())
+    if 'user_roadmap_stats' in inspector.get_table_names() and \
+            'ix_user_roadmap_stats_roadmap' in _index_names(inspector):
+        op.drop_index('ix_user_roadmap_stats_roadmap', table_name='user_roadmap_stats')
@@ -14,6 +14,35 @@ def make_shell_context():
                 Comment=Comment, CustomRoadmap=CustomRoadmap,
                 CustomRoadmapNode=CustomRoadmapNode)
 
+@app.cli.command('search-reindex')
+def search_reindex():
+    """Rebuild the full-text search index"""
+    from app.search import search_index
+    search_index.rebuild()
+    print(f"Search index rebuilt using the {search_index.backend.name} backend")
+
+@app.cli.command('related-rebuild')
+def related_rebuild():
+    """Recompute the related-roadmaps table"""
+    from app.roadmap.related import rebuild_related_roadmaps
+    changed = rebuild_related_roadmaps()
+    db.session.commit()
+    print(f"Related roadmaps updated for {changed} roadmaps")
+
+@app.cli.command('progress-stats-rebuild')
+def progress_stats_rebuild():
+    """Rebuild the per-user roadmap progress counters from UserProgress"""
+    from app.roadmap.progress import rebuild_user_roadmap_stats
+    rows = rebuild_user_roadmap_stats()
+    print(f"Rebuilt {rows} progress counter rows")
+
+@app.cli.command('custom-order-rebalance')
+def custom_order_rebalance():
+    """Renumber custom roadmaps whose node sort keys have grown long"""
+    from app.roadmap.ordering import rebalance_long_keys
+    count = rebalance_long_keys()
+    print(f"Rebalanced node order keys in {count} custom roadmaps")
+
 # Create necessary directories
 def create_directories():
     # Create profile pictures directory
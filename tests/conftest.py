@@ -0,0 +1,92 @@
+import os
+import sys
+import json
+import shutil
+import tempfile
+import pytest
+from flask import Flask
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# The testing config reads the database URL at import time, so the scratch
+# database is chosen before the app is imported
+_scratch = tempfile.mkdtemp(prefix='edgeroute-tests-')
+os.environ['TEST_DATABASE_URL'] = 'sqlite:///' + os.path.join(_scratch, 'tests.db')
+
+from app import create_app, db
+from app.appwrite import appwrite
+from app.models import User
+from app.passwords import password_hasher
+from fake_appwrite import DATABASE_ID, start_server
+
+# Roadmap ID -> node IDs of the roadmap_data written by the data_dir fixture
+ROADMAPS = {'frontend': ['f1', 'f2'], 'backend': ['b1', 'b2', 'b3']}
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(_scratch, ignore_errors=True)
+
+def write_roadmap_data(path, roadmaps=ROADMAPS):
+    """Write roadmaps.json and one file per roadmap with the given node IDs"""
+    index = {'roadmaps': [
+        {'id': roadmap_id, 'title': roadmap_id.title(), 'description': f'{roadmap_id} roadmap',
+         'category': 'Web Development', 'difficulty': 'Beginner', 'tags': ['web']}
+        for roadmap_id in roadmaps
+    ]}
+    with open(os.path.join(path, 'roadmaps.json'), 'w', encoding='utf-8') as f:
+        json.dump(index, f)
+    for roadmap_id, node_ids in roadmaps.items():
+        nodes = {node_id: {'title': f'Topic {node_id}', 'description': '', 'links': []} for node_id in node_ids}
+        with open(os.path.join(path, f'{roadmap_id}.json'), 'w', encoding='utf-8') as f:
+            json.dump(nodes, f)
+    return str(path)
+
+@pytest.fixture
+def data_dir(tmp_path):
+    """A roadmap_data directory with the roadmaps in ROADMAPS"""
+    return write_roadmap_data(tmp_path)
+
+@pytest.fixture
+def app():
+    """The app on an empty scratch database, inside an app context"""
+    app = create_app('testing')
+    app.config.update(WTF_CSRF_ENABLED=False, BCRYPT_LOG_ROUNDS=4, PASSWORD_HASH_WORKERS=0)
+    password_hasher.init_app(app)
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+def add_user(email='user@example.com', password='password', **kwargs):
+    """Create and commit a user"""
+    user = User(username=email.split('@')[0], email=email, **kwargs)
+    user.password = password
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+def log_in(app, email='user@example.com', password='password'):
+    """Return a test client logged in as email"""
+    client = app.test_client()
+    response = client.post('/auth/login', data={'email': email, 'password': password})
+    assert response.status_code == 302
+    return client
+
+@pytest.fixture
+def fake_appwrite():
+    """A fake Appwrite server, with the app.appwrite singleton pointed at it"""
+    server, fake, endpoint = start_server()
+    app = Flask(__name__)
+    app.config.update(
+        APPWRITE_ENDPOINT=endpoint,
+        APPWRITE_PROJECT_ID='test',
+        APPWRITE_API_KEY='test-key',
+        APPWRITE_DATABASE_ID=DATABASE_ID,
+        APPWRITE_CACHE='memory'
+    )
+    appwrite.init_app(app)
+    yield fake
+    appwrite.client.close()
+    server.shutdown()
+    server.server_close()
@@ -0,0 +1,159 @@
+"""
+A local fake of the Appwrite databases API, enough for the document calls
+made by app.appwrite.
+
+Documents live in memory per (database, collection). Every request is
+recorded, and failures can be queued per request so the retry paths can be
+exercised.
+"""
+
+import re
+import json
+import random
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+# Database ID the tests configure
+DATABASE_ID = 'edgeroute'
+
+_DOCUMENTS_RE = re.compile(r'^/v1/databases/([^/]+)/collections/([^/]+)/documents(?:/([^/]+))?$')
+_QUERY_RE = re.compile(r'^(\w+)\((.*)\)$')
+
+class FakeAppwrite:
+    """
+    In-memory documents and request log of one fake server
+
+    Args:
+        documents (dict): (database ID, collection ID) -> {document ID: document}
+        requests (list): (method, path) of every request received
+        failures (dict): 'METHOD path' -> status codes returned, one per
+            request, before the request is served
+        lose_responses (set): 'POST path/document ID' of creates that are
+            stored but answered with a 503 once, like a response lost on
+            the way back
+    """
+
+    def __init__(self):
+        self.documents = {}
+        self.requests = []
+        self.failures = {}
+        self.lose_responses = set()
+        self.lock = threading.Lock()
+
+    def collection(self, database_id, collection_id):
+        return self.documents.setdefault((database_id, collection_id), {})
+
+    def add(self, database_id, collection_id, document):
+        """Store a document directly, as if created by an earlier run"""
+        with self.lock:
+            stored = dict(document, **{'$id': document['id']})
+            self.collection(database_id, collection_id)[document['id']] = stored
+
+    def fail(self, method, path, *codes):
+        """Answer the next requests to path with the given status codes"""
+        with self.lock:
+            self.failures.setdefault(f'{method} {path}', []).extend(codes)
+
+    def count(self, method, path_prefix=''):
+        """Return the number of requests with method whose path starts with path_prefix"""
+        with self.lock:
+            return sum(1 for m, path in self.requests if m == method and path.startswith(path_prefix))
+
+    def _list(self, documents, query_string):
+        queries = [value for key, values in sorted(parse_qs(query_string).items())
+                   if key.startswith('queries') for value in values]
+        items = list(documents.values())
+        limit = 25
+        for query in queries:
+            name, args = _QUERY_RE.match(query).groups()
+            args = json.loads(f'[{args}]') if args else []
+            if name == 'equal':
+                field, values = args
+                items = [document for document in items if document.get(field) in values]
+            elif name == 'limit':
+                limit = args[0]
+            elif name == 'cursorAfter':
+                ids = [document['$id'] for document in items]
+                if args[0] not in ids:
+                    return 400, {'message': 'Invalid cursor', 'code': 400, 'type': 'general_cursor_not_found'}
+                items = items[ids.index(args[0]) + 1:]
+        return 200, {'total': len(items), 'documents': items[:limit]}
+
+    def handle(self, method, url, body):
+        """Return (status, JSON body or None) for one request"""
+        with self.lock:
+            self.requests.append((method, url.path))
+            codes = self.failures.get(f'{method} {url.path}')
+            if codes:
+                code = codes.pop(0)
+                return code, {'message': f'Injected {code}', 'code': code, 'type': 'injected'}
+
+            match = _DOCUMENTS_RE.match(url.path)
+            if match is None:
+                return 404, {'message': 'Route not found', 'code': 404, 'type': 'general_route_not_found'}
+            database_id, collection_id, document_id = match.groups()
+            documents = self.collection(database_id, collection_id)
+            not_found = (404, {'message': 'Document not found', 'code': 404, 'type': 'document_not_found'})
+
+            if method == 'GET' and document_id is None:
+                return self._list(documents, url.query)
+            if method == 'GET':
+                return (200, documents[document_id]) if document_id in documents else not_found
+            if method == 'POST':
+                document_id = body['documentId']
+                if document_id == 'unique()':
+                    document_id = f'{random.getrandbits(64):016x}'
+                if document_id in documents:
+                    return 409, {'message': 'Document already exists', 'code': 409,
+                                 'type': 'document_already_exists'}
+                documents[document_id] = dict(body['data'], **{'$id': document_id})
+                key = f'{method} {url.path}/{document_id}'
+                if key in self.lose_responses:
+                    self.lose_responses.discard(key)
+                    return 503, {'message': 'Service unavailable', 'code': 503, 'type': 'injected'}
+                return 201, documents[document_id]
+            if document_id not in documents:
+                return not_found
+            if method == 'PATCH':
+                documents[document_id].update(body.get('data') or {})
+                return 200, documents[document_id]
+            if method == 'DELETE':
+                del documents[document_id]
+                return 204, None
+        return 405, {'message': 'Method not allowed', 'code': 405, 'type': 'general_not_allowed'}
+
+def _handler(fake):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, format, *args):
+            pass
+
+        def _serve(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            raw = self.rfile.read(length) if length else b''
+            status, body = fake.handle(self.command, urlparse(self.path), json.loads(raw) if raw else {})
+            data = json.dumps(body).encode() if body is not None else b''
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json' if body is not None else 'text/plain')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        do_GET = do_POST = do_PATCH = do_DELETE = _serve
+
+    return Handler
+
+def start_server():
+    """
+    Serve a new FakeAppwrite on a free local port
+
+    Returns:
+        tuple: (server, FakeAppwrite, endpoint URL ending in /v1)
+    """
+    fake = FakeAppwrite()
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _handler(fake))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, fake, f'http://127.0.0.1:{server.server_address[1]}/v1'
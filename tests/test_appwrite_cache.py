@@ -0,0 +1,103 @@
+from flask import Flask
+from appwrite.query import Query
+from app.appwrite import appwrite
+from app.appwrite.cache import MemoryCache
+from app.appwrite.models import Roadmap, RoadmapNode
+from fake_appwrite import DATABASE_ID
+
+ROADMAPS = f'/v1/databases/{DATABASE_ID}/collections/roadmaps/documents'
+NODES = f'/v1/databases/{DATABASE_ID}/collections/roadmap_nodes/documents'
+
+def add_roadmap(fake, roadmap_id, title):
+    fake.add(DATABASE_ID, 'roadmaps', {'id': roadmap_id, 'title': title, 'tags': 'a,b'})
+
+def test_get_reads_through_the_cache(fake_appwrite):
+    add_roadmap(fake_appwrite, 'backend', 'Backend')
+
+    assert Roadmap.get('backend').title == 'Backend'
+    assert Roadmap.get('backend').title == 'Backend'
+    assert fake_appwrite.count('GET', ROADMAPS) == 1
+
+def test_misses_are_cached(fake_appwrite):
+    assert Roadmap.get('missing') is None
+    assert Roadmap.get('missing') is None
+    assert fake_appwrite.count('GET', ROADMAPS) == 1
+
+def test_ttl_zero_disables_caching(fake_appwrite):
+    add_roadmap(fake_appwrite, 'backend', 'Backend')
+    appwrite.cache_ttls = {'roadmaps': 0}
+
+    Roadmap.get('backend')
+    Roadmap.get('backend')
+    assert fake_appwrite.count('GET', ROADMAPS) == 2
+
+def test_update_replaces_the_cached_document(fake_appwrite):
+    add_roadmap(fake_appwrite, 'backend', 'Backend')
+    Roadmap.get('backend')
+
+    Roadmap.update('backend', {'title': 'Backend Development'})
+
+    assert Roadmap.get('backend').title == 'Backend Development'
+    assert fake_appwrite.count('GET', ROADMAPS) == 1
+
+def test_create_replaces_a_cached_miss(fake_appwrite):
+    assert Roadmap.get('devops') is None
+
+    Roadmap.create({'id': 'devops', 'title': 'DevOps'})
+
+    assert Roadmap.get('devops').title == 'DevOps'
+
+def test_delete_drops_the_cached_document(fake_appwrite):
+    add_roadmap(fake_appwrite, 'backend', 'Backend')
+    Roadmap.get('backend')
+
+    assert Roadmap.delete('backend')
+
+    assert Roadmap.get('backend') is None
+    assert fake_appwrite.count('GET', ROADMAPS) == 2
+
+def test_writes_invalidate_cached_lists(fake_appwrite):
+    def titles():
+        return [node.title for node in RoadmapNode.list(queries=[Query.equal('roadmap_id', 'backend')])]
+
+    RoadmapNode.create({'id': 'backend-1', 'roadmap_id': 'backend', 'title': 'HTTP', 'links': '[]'})
+    assert titles() == ['HTTP']
+    assert titles() == ['HTTP']
+    assert fake_appwrite.count('GET', NODES) == 1
+
+    RoadmapNode.create({'id': 'backend-2', 'roadmap_id': 'backend', 'title': 'SQL', 'links': '[]'})
+    assert titles() == ['HTTP', 'SQL']
+    RoadmapNode.update('backend-1', {'title': 'HTTP basics'})
+    assert titles() == ['HTTP basics', 'SQL']
+    RoadmapNode.delete('backend-2')
+    assert titles() == ['HTTP basics']
+    assert fake_appwrite.count('GET', NODES) == 4
+
+def test_memory_cache_evicts_the_least_recently_used():
+    cache = MemoryCache(max_entries=2)
+    cache.set('a', 1, 60)
+    cache.set('b', 2, 60)
+    cache.get('a')
+    cache.set('c', 3, 60)
+
+    assert cache.get('a') == 1
+    assert cache.get('b') is None
+    assert cache.get('c') == 3
+
+def test_memory_cache_expires_entries():
+    cache = MemoryCache()
+    cache.set('a', 1, -1)
+
+    assert cache.get('a') is None
+
+def test_a_request_reads_each_document_once(fake_appwrite):
+    add_roadmap(fake_appwrite, 'backend', 'Backend')
+    appwrite.cache_ttls = {'roadmaps': 0}
+
+    with Flask(__name__).test_request_context():
+        first = Roadmap.get('backend')
+        assert Roadmap.get('backend') is first
+        assert Roadmap.get('missing') is None
+        assert Roadmap.get('missing') is None
+
+    assert fake_appwrite.count('GET', ROADMAPS) == 2
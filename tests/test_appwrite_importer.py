@@ -0,0 +1,88 @@
+import os
+import json
+from app.appwrite.importer import AppwriteImportReport, create_document, import_roadmaps_to_appwrite
+from app.appwrite.models import RoadmapNode
+from fake_appwrite import DATABASE_ID
+
+ROADMAPS = f'/v1/databases/{DATABASE_ID}/collections/roadmaps/documents'
+NODES = f'/v1/databases/{DATABASE_ID}/collections/roadmap_nodes/documents'
+
+def run_import(data_dir, **kwargs):
+    kwargs.setdefault('backoff', 0)
+    return import_roadmaps_to_appwrite(data_dir, workers=1, **kwargs)
+
+def stored_ids(fake, collection_id):
+    return set(fake.collection(DATABASE_ID, collection_id))
+
+def test_import_creates_only_missing_documents(fake_appwrite, data_dir, tmp_path):
+    fake_appwrite.add(DATABASE_ID, 'roadmaps', {'id': 'frontend', 'title': 'Frontend'})
+    fake_appwrite.add(DATABASE_ID, 'roadmap_nodes', {'id': 'f1', 'roadmap_id': 'frontend'})
+    checkpoint = str(tmp_path / 'checkpoint.json')
+
+    report = run_import(data_dir, checkpoint=checkpoint)
+
+    assert not report.failed
+    assert (report.created, report.existing) == (5, 2)
+    assert fake_appwrite.count('POST') == 5
+    assert stored_ids(fake_appwrite, 'roadmaps') == {'frontend', 'backend'}
+    assert stored_ids(fake_appwrite, 'roadmap_nodes') == {'f1', 'f2', 'b1', 'b2', 'b3'}
+    assert not os.path.exists(checkpoint)
+
+def test_import_retries_throttled_and_failed_requests(fake_appwrite, data_dir):
+    fake_appwrite.fail('POST', NODES, 429, 503, 502)
+
+    report = run_import(data_dir)
+
+    assert not report.failed
+    assert (report.created, report.retries) == (7, 3)
+    assert len(stored_ids(fake_appwrite, 'roadmap_nodes')) == 5
+
+def test_import_gives_up_after_the_last_retry(fake_appwrite, data_dir):
+    fake_appwrite.fail('POST', ROADMAPS, 503, 503, 503)
+
+    report = run_import(data_dir, concurrency=1, retries=2)
+
+    assert list(report.failed) == ['frontend']
+    assert report.retries == 2
+    assert stored_ids(fake_appwrite, 'roadmaps') == {'backend'}
+
+def test_import_counts_a_conflict_as_done(fake_appwrite, data_dir):
+    # The first attempt is stored but its response lost, so the retry gets a 409
+    fake_appwrite.lose_responses.add(f'POST {NODES}/b2')
+
+    report = run_import(data_dir)
+
+    assert not report.failed
+    assert (report.created, report.existing, report.retries) == (6, 1, 1)
+    assert len(stored_ids(fake_appwrite, 'roadmap_nodes')) == 5
+
+def test_create_document_conflict_invalidates_the_cache(fake_appwrite):
+    assert RoadmapNode.get('f1') is None
+    fake_appwrite.add(DATABASE_ID, 'roadmap_nodes', {'id': 'f1', 'roadmap_id': 'frontend', 'title': 'HTML'})
+
+    created = create_document(RoadmapNode, {'id': 'f1', 'roadmap_id': 'frontend', 'title': 'HTML'},
+                              AppwriteImportReport(), backoff=0)
+
+    assert created is False
+    assert RoadmapNode.get('f1').title == 'HTML'
+
+def test_import_resumes_from_the_checkpoint(fake_appwrite, data_dir, tmp_path):
+    checkpoint = str(tmp_path / 'checkpoint.json')
+    # 400 is not retried, so the first node of frontend fails
+    fake_appwrite.fail('POST', NODES, 400)
+
+    report = run_import(data_dir, concurrency=1, checkpoint=checkpoint)
+
+    assert list(report.failed) == ['f1']
+    with open(checkpoint, encoding='utf-8') as f:
+        assert json.load(f) == {'completed': ['backend']}
+
+    posts = fake_appwrite.count('POST')
+    report = run_import(data_dir, concurrency=1, checkpoint=checkpoint)
+
+    assert not report.failed
+    assert report.resumed_roadmaps == 1
+    assert (report.created, report.existing) == (1, 2)
+    assert fake_appwrite.count('POST') == posts + 1
+    assert stored_ids(fake_appwrite, 'roadmap_nodes') == {'f1', 'f2', 'b1', 'b2', 'b3'}
+    assert not os.path.exists(checkpoint)
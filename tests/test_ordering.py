@@ -0,0 +1,58 @@
+import pytest
+from app import db
+from app.models import CustomRoadmap, CustomRoadmapNode
+from app.roadmap.ordering import MAX_KEY_LENGTH, append_key, initial_key, key_between, move_node
+from conftest import add_user
+
+@pytest.fixture
+def roadmap_id(app):
+    user = add_user()
+    roadmap = CustomRoadmap(title='Mine', description='', category='Other', difficulty='Beginner', user_id=user.id)
+    db.session.add(roadmap)
+    db.session.commit()
+    return roadmap.id
+
+def append(roadmap_id, title):
+    node = CustomRoadmapNode(roadmap_id=roadmap_id, title=title, description='', sort_key=append_key(roadmap_id))
+    db.session.add(node)
+    db.session.commit()
+    return node
+
+def titles(roadmap_id):
+    return [node.title for node in CustomRoadmapNode.query.filter_by(roadmap_id=roadmap_id)
+            .order_by(CustomRoadmapNode.sort_key)]
+
+def test_key_between_orders_keys():
+    assert 'a' < key_between('a', 'b') < 'b'
+    assert 'a' < key_between('a', 'a1') < 'a1'
+    assert key_between(None, 'a') < 'a'
+    assert key_between('zz', None) > 'zz'
+    with pytest.raises(ValueError):
+        key_between('b', 'a')
+
+def test_appended_keys_keep_their_length(roadmap_id):
+    for number in range(500):
+        append(roadmap_id, f'node {number}')
+
+    keys = [key for (key,) in db.session.query(CustomRoadmapNode.sort_key).filter_by(roadmap_id=roadmap_id)]
+    assert {len(key) for key in keys} == {len(initial_key(0))}
+    assert titles(roadmap_id) == [f'node {number}' for number in range(500)]
+
+def test_append_after_a_move_to_the_end(roadmap_id):
+    first, second = append(roadmap_id, 'first'), append(roadmap_id, 'second')
+    move_node(roadmap_id, first.id, second.id)
+    db.session.commit()
+
+    append(roadmap_id, 'third')
+
+    assert titles(roadmap_id) == ['second', 'first', 'third']
+
+def test_append_rebalances_when_the_key_is_full(roadmap_id):
+    node = append(roadmap_id, 'first')
+    node.sort_key = 'z' * MAX_KEY_LENGTH
+    db.session.commit()
+
+    key = append(roadmap_id, 'second').sort_key
+
+    assert len(key) <= len(initial_key(0))
+    assert titles(roadmap_id) == ['first', 'second']
@@ -0,0 +1,64 @@
+import os
+import time
+import threading
+import pytest
+from flask import Flask
+from app.passwords import PasswordHasher, PasswordHasherBusy
+
+def exit_once(flag):
+    """Kill the pool process the first time, succeed afterwards"""
+    if not os.path.exists(flag):
+        open(flag, 'w').close()
+        os._exit(1)
+    return 'done'
+
+def always_exit():
+    os._exit(1)
+
+@pytest.fixture
+def hasher():
+    app = Flask(__name__)
+    app.config.update(BCRYPT_LOG_ROUNDS=4, PASSWORD_HASH_WORKERS=1,
+                      PASSWORD_HASH_MAX_QUEUE=1, PASSWORD_HASH_TIMEOUT=5)
+    hasher = PasswordHasher()
+    hasher.init_app(app)
+    yield hasher
+    hasher.close()
+
+def test_hash_and_check(hasher):
+    pw_hash = hasher.hash('secret')
+
+    assert hasher.check(pw_hash, 'secret')
+    assert not hasher.check(pw_hash, 'wrong')
+    assert not hasher.needs_rehash(pw_hash)
+
+def test_a_full_queue_is_busy(hasher):
+    hasher.hash('warm up the pool')
+    started = threading.Thread(target=hasher._run, args=(time.sleep, 0.5))
+    started.start()
+    time.sleep(0.1)
+
+    with pytest.raises(PasswordHasherBusy):
+        hasher.hash('secret')
+    started.join()
+
+def test_a_slow_hash_is_busy(hasher):
+    hasher.hash('warm up the pool')
+    hasher.timeout = 0.1
+
+    with pytest.raises(PasswordHasherBusy):
+        hasher._run(time.sleep, 1)
+
+def test_a_broken_pool_is_replaced_and_retried(hasher, tmp_path):
+    hasher.hash('warm up the pool')
+    broken = hasher._executor
+
+    assert hasher._run(exit_once, str(tmp_path / 'exited')) == 'done'
+    assert hasher._executor is not broken
+    assert broken._shutdown_thread
+
+def test_a_pool_that_keeps_breaking_is_busy(hasher):
+    with pytest.raises(PasswordHasherBusy):
+        hasher._run(always_exit)
+    # The slot was released, so the next hash runs
+    assert hasher.check(hasher.hash('secret'), 'secret')
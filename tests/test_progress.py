@@ -0,0 +1,94 @@
+import threading
+from app import db
+from app.models import UserProgress, UserRoadmapStats
+from app.roadmap import progress
+from app.roadmap.importer import sync_roadmaps
+from conftest import add_user, log_in
+
+def stats(user_id, roadmap_id):
+    db.session.expire_all()
+    entry = db.session.get(UserRoadmapStats, (user_id, roadmap_id))
+    return (entry.completed_count, entry.total_nodes) if entry else None
+
+def completed(user_id, roadmap_id):
+    return UserProgress.query.filter_by(user_id=user_id, roadmap_id=roadmap_id, completed=True).count()
+
+def apply_at_once(app, monkeypatch, user_id, roadmap_id, batches):
+    """Apply each batch in its own thread, all validated before any writes"""
+    barrier = threading.Barrier(len(batches), timeout=10)
+    lock_progress_stats = progress._lock_progress_stats
+
+    def lock_together(*args):
+        barrier.wait()
+        lock_progress_stats(*args)
+
+    monkeypatch.setattr(progress, '_lock_progress_stats', lock_together)
+    errors = []
+
+    def apply(updates):
+        with app.app_context():
+            try:
+                progress.apply_progress_updates(user_id, roadmap_id, updates)
+                db.session.commit()
+            except Exception as e:
+                errors.append(e)
+            finally:
+                db.session.remove()
+
+    threads = [threading.Thread(target=apply, args=(updates,)) for updates in batches]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+
+def test_progress_updates_keep_the_counter(app, data_dir):
+    sync_roadmaps(data_dir, workers=1)
+    user_id = add_user().id
+
+    progress.apply_progress_updates(user_id, 'backend', {'b1': True, 'b2': True})
+    db.session.commit()
+    assert stats(user_id, 'backend') == (2, 3)
+
+    progress.apply_progress_updates(user_id, 'backend', {'b1': False, 'b3': True})
+    db.session.commit()
+    assert stats(user_id, 'backend') == (2, 3)
+
+def test_unknown_nodes_write_nothing(app, data_dir):
+    sync_roadmaps(data_dir, workers=1)
+    user_id = add_user().id
+
+    applied, unknown = progress.apply_progress_updates(user_id, 'backend', {'b1': True, 'f1': True})
+
+    assert (applied, unknown) == ({}, ['f1'])
+    assert stats(user_id, 'backend') is None
+
+def test_concurrent_completes_count_once(app, data_dir, monkeypatch):
+    sync_roadmaps(data_dir, workers=1)
+    user_id = add_user().id
+
+    apply_at_once(app, monkeypatch, user_id, 'backend', [{'b1': True}, {'b1': True}])
+
+    assert completed(user_id, 'backend') == 1
+    assert stats(user_id, 'backend') == (1, 3)
+
+def test_concurrent_double_submit_counts_once(app, data_dir, monkeypatch):
+    sync_roadmaps(data_dir, workers=1)
+    user_id = add_user().id
+    batch = {'b1': True, 'b2': True, 'b3': False}
+
+    apply_at_once(app, monkeypatch, user_id, 'backend', [batch, batch, {'b2': True}])
+
+    assert completed(user_id, 'backend') == 2
+    assert stats(user_id, 'backend') == (2, 3)
+
+def test_batch_endpoint_submitted_twice(app, data_dir):
+    sync_roadmaps(data_dir, workers=1)
+    user_id = add_user().id
+    client = log_in(app)
+    body = {'updates': [{'node_id': 'b1', 'completed': True}, {'node_id': 'b2', 'completed': True}]}
+
+    for _ in range(2):
+        assert client.post('/roadmap/backend/progress', json=body).status_code == 200
+
+    assert stats(user_id, 'backend') == (2, 3)
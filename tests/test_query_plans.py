@@ -0,0 +1,143 @@
+"""
+Check that the hot routes' queries use indexes.
+
+Imports the roadmap data into the scratch SQLite database, adds a user with
+some progress, a comment, a public custom roadmap and a few versions, then
+requests each hot route while recording its SQL. EXPLAIN QUERY PLAN runs on
+every SELECT, INSERT, UPDATE and DELETE, and a statement that scans one of
+the large tables without an index fails the test:
+
+    python -m pytest tests/test_query_plans.py
+"""
+
+import re
+import pytest
+from sqlalchemy import event
+from app import create_app, db
+from app.models import Comment, CustomRoadmap, CustomRoadmapNode, NodeLink, RoadmapNode
+from app.passwords import password_hasher
+from app.roadmap.importer import sync_roadmaps
+from app.roadmap.version_utils import create_roadmap_version
+from conftest import add_user, log_in
+
+# Tables that grow with content or users; a full scan of these is a bug
+LARGE_TABLES = {
+    'roadmap_node', 'node_link', 'user_progress', 'user_roadmap_stats', 'comment',
+    'roadmap_version', 'custom_roadmap', 'custom_roadmap_node', 'related_roadmap'
+}
+
+SCAN_RE = re.compile(r'^SCAN (?:TABLE )?(\w+)(?: AS \w+)?(.*)$')
+
+RECORDED = ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'WITH')
+
+ROADMAP_ID = 'backend'
+
+def unindexed_scans(plan):
+    """Return the plan lines that scan a large table without an index"""
+    problems = []
+    for detail in plan:
+        match = SCAN_RE.match(detail)
+        if match and match.group(1) in LARGE_TABLES and 'INDEX' not in match.group(2):
+            problems.append(detail)
+    return problems
+
+@pytest.fixture(scope='module')
+def client():
+    """A client logged in as an admin with progress, a comment, versions and a custom roadmap"""
+    app = create_app('testing')
+    app.config.update(WTF_CSRF_ENABLED=False, BCRYPT_LOG_ROUNDS=4, PASSWORD_HASH_WORKERS=0)
+    password_hasher.init_app(app)
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        sync_roadmaps(workers=1)
+
+        user = add_user('plans@example.com', is_admin=True)
+        db.session.add(Comment(content='Nice roadmap', user_id=user.id, roadmap_id=ROADMAP_ID))
+        db.session.commit()
+        create_roadmap_version(ROADMAP_ID, 'First')
+        # Restoring version 1 deletes this node, its link and its progress
+        db.session.add(RoadmapNode(id='plans-extra', roadmap_id=ROADMAP_ID, title='Extra', description='',
+                                   position=10000, content_hash='extra'))
+        db.session.add(NodeLink(node_id='plans-extra', position=0, title='Docs', url='https://example.com/',
+                                type='article', domain='example.com'))
+        db.session.commit()
+        create_roadmap_version(ROADMAP_ID, 'Second')
+
+        client = log_in(app, 'plans@example.com')
+        client.post(f'/roadmap/{ROADMAP_ID}/progress', json={
+            'updates': [{'node_id': node_id, 'completed': True} for node_id in node_ids() + ['plans-extra']]
+        })
+        client.post(f'/roadmap/custom/clone/{ROADMAP_ID}', data={
+            'title': 'Plans', 'description': 'Plans', 'category': 'Other',
+            'difficulty': 'Beginner', 'tags': '', 'is_public': 'y'
+        })
+        yield client
+        db.session.remove()
+        db.drop_all()
+
+def node_ids(limit=5):
+    return [node.id for node in RoadmapNode.query.filter_by(roadmap_id=ROADMAP_ID)
+            .order_by(RoadmapNode.position).limit(limit)]
+
+def custom_node_ids(custom_id):
+    return [node.id for node in CustomRoadmapNode.query.filter_by(roadmap_id=custom_id)
+            .order_by(CustomRoadmapNode.sort_key)]
+
+def routes(client):
+    """Yield (method, url, JSON body) of the hot routes, reads first"""
+    custom_id = CustomRoadmap.query.filter_by(title='Plans').one().id
+    cursor = client.get(f'/roadmap/{ROADMAP_ID}/load-more?limit=5').get_json()['next_cursor']
+    nodes = node_ids()
+
+    yield 'GET', f'/roadmap/{ROADMAP_ID}', None
+    yield 'GET', f'/roadmap/{ROADMAP_ID}/load-more?cursor={cursor}', None
+    yield 'GET', f'/roadmap/{ROADMAP_ID}/versions', None
+    yield 'GET', f'/roadmap/{ROADMAP_ID}/versions/2/view', None
+    yield 'GET', f'/api/roadmaps/{ROADMAP_ID}', None
+    yield 'GET', f'/api/roadmaps/{ROADMAP_ID}/resources?type=video', None
+    yield 'GET', '/api/resources/nodes?domain=youtube.com', None
+    yield 'GET', f'/api/user/progress/{ROADMAP_ID}', None
+    yield 'GET', '/auth/dashboard', None
+    yield 'GET', '/auth/profile', None
+    yield 'GET', '/roadmap/custom', None
+    yield 'GET', f'/roadmap/custom/{custom_id}', None
+    yield 'GET', f'/roadmap/custom/{custom_id}/edit', None
+
+    yield 'POST', f'/roadmap/{ROADMAP_ID}/progress/{nodes[0]}', {'completed': False}
+    yield 'POST', f'/roadmap/{ROADMAP_ID}/progress', {
+        'updates': [{'node_id': node_id, 'completed': True} for node_id in nodes]
+    }
+    custom_nodes = custom_node_ids(custom_id)
+    yield 'POST', f'/roadmap/custom/{custom_id}/reorder', {'nodes': custom_nodes[::-1]}
+    yield 'POST', f'/roadmap/custom/{custom_id}/reorder', {'node_id': custom_nodes[0], 'previous_id': None}
+    yield 'POST', f'/roadmap/custom/{custom_id}/node/{custom_nodes[1]}/links/delete/0', None
+    yield 'POST', f'/roadmap/custom/{custom_id}/node/{custom_nodes[2]}/delete', None
+    yield 'POST', f'/roadmap/{ROADMAP_ID}/versions/1/restore', None
+
+def test_hot_routes_use_indexes(client):
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(RECORDED):
+            # An executemany statement has the same plan for every row
+            statements.append((statement, parameters[0] if executemany else parameters))
+
+    failures = []
+    for method, url, body in routes(client):
+        statements.clear()
+        event.listen(db.engine, 'before_cursor_execute', record)
+        try:
+            response = client.open(url, method=method, json=body)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', record)
+
+        if response.status_code >= 400:
+            failures.append(f"{method} {url}: status {response.status_code}")
+        with db.engine.connect() as conn:
+            for statement, parameters in statements:
+                plan = [row[-1] for row in conn.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters)]
+                for detail in unindexed_scans(plan):
+                    failures.append(f"{method} {url}: {' '.join(statement.split())[:200]} -> {detail}")
+
+    assert not failures, '\n'.join(failures)